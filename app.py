@@ -1,13 +1,40 @@
 import streamlit as st
 import os
-import re
-import shutil
-import tempfile
-import zipfile
-from pathlib import Path
-from collections import defaultdict
-from datetime import datetime
-from io import BytesIO
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from catalog import DEFAULT_CATALOG_PATH, build_stats, open_catalog, query_groups, query_runs
+from jobs import cancel_job, discard_job, find_jobs, get_job, run_local_job, run_upload_job, start_job
+from pipeline import (
+    DEFAULT_JPEG_QUALITY,
+    DEFAULT_MAX_WORKERS,
+    LARGE_GROUP_RULE_LABELS,
+    MANIFEST_FILENAME,
+    NUMPY_AVAILABLE,
+    OUTPUT_FORMATS,
+    OUTPUT_MODES,
+    PIL_AVAILABLE,
+    PYARROW_AVAILABLE,
+    RUN_MANIFEST_FORMATS,
+    WATCH_IDLE_TIMEOUT,
+    WATCH_SETTLE_TIME,
+    analysis_groups,
+    analyze_input_folders,
+    build_plan,
+    count_missing,
+    diff_plan,
+    folder_state_key,
+    format_ranges,
+    format_run_record,
+    get_cached_analysis,
+    is_archive,
+    iter_run_records,
+    split_input_folders,
+    store_analysis,
+    watch_and_process,
+)
+from thumbnails import abnormal_groups, get_thumbnails, review_entries
 
 # tkinter는 로컬 환경에서만 사용 가능
 try:
@@ -24,6 +51,12 @@ if 'input_folder' not in st.session_state:
     st.session_state.input_folder = ""
 if 'output_folder' not in st.session_state:
     st.session_state.output_folder = ""
+# 입력 폴더 상태별 분석 결과 (다시 실행되어도 폴더가 바뀌지 않았으면 재사용)
+if 'analysis_cache' not in st.session_state:
+    st.session_state.analysis_cache = {}
+# 로컬 폴더 모드 실행을 기록하고 카탈로그 화면에서 조회하는 카탈로그 파일
+if 'catalog_path' not in st.session_state:
+    st.session_state.catalog_path = DEFAULT_CATALOG_PATH
 
 def select_folder(folder_type):
     """폴더 선택 대화상자 열기 (로컬 환경에서만 작동)"""
@@ -48,245 +81,392 @@ def select_folder(folder_type):
         st.error(f"❌ 폴더 선택 중 오류 발생: {str(e)}")
         return None
 
-def parse_filename(filename):
+def expected_range_inputs(key_prefix):
+    """예상 레이어 범위 입력 (0이면 지정하지 않음), (처음, 마지막) 또는 None 반환"""
+    col1, col2 = st.columns(2)
+    with col1:
+        first_layer = st.number_input("예상 첫 레이어 번호", min_value=0, value=0, step=1, key=f"{key_prefix}_first_layer", help="0이면 1부터 확인합니다.")
+    with col2:
+        last_layer = st.number_input("예상 마지막 레이어 번호", min_value=0, value=0, step=1, key=f"{key_prefix}_last_layer", help="0이면 발견한 가장 큰 번호까지 확인합니다. 이 값보다 큰 번호는 이상값으로 표시됩니다.")
+    if not first_layer and not last_layer:
+        return None
+    return (int(first_layer) or None, int(last_layer) or None)
+
+def output_format_inputs(key_prefix):
+    """BMP/TIFF 출력 변환 형식과 JPEG 품질 입력, (형식 또는 None, 품질) 반환"""
+    col1, col2 = st.columns(2)
+    with col1:
+        output_format = st.selectbox(
+            "**🗜️ BMP/TIFF 변환 형식**",
+            [None] + list(OUTPUT_FORMATS),
+            format_func=lambda key: "변환하지 않음" if key is None else OUTPUT_FORMATS[key],
+            disabled=not PIL_AVAILABLE,
+            key=f"{key_prefix}_output_format",
+            help="압축하지 않은 BMP/TIFF 원본을 선택한 형식으로 변환하여 저장합니다. 다른 형식은 그대로 저장합니다." if PIL_AVAILABLE else "pillow가 설치되어 있지 않습니다. (pip install pillow)"
+        )
+    with col2:
+        quality = st.slider("JPEG 품질", min_value=50, max_value=95, value=DEFAULT_JPEG_QUALITY, key=f"{key_prefix}_jpeg_quality", disabled=output_format != 'jpeg')
+    return output_format, quality
+
+def large_group_rule_input(key_prefix):
+    """5개 이상 그룹 처리 규칙 선택, 규칙 이름 반환"""
+    return st.selectbox(
+        "**🧩 5개 이상 그룹 처리**",
+        list(LARGE_GROUP_RULE_LABELS),
+        format_func=lambda key: LARGE_GROUP_RULE_LABELS[key],
+        key=f"{key_prefix}_large_group_rule",
+        help="한 레이어에 5장 이상 촬영된 그룹의 처리 방법입니다. 기본값은 저장하지 않고 처리 로그에 미사용으로 기록합니다."
+    )
+
+def show_missing_analysis(missing_ranges, outlier_numbers):
+    """누락 구간과 범위 밖 번호 표시"""
+    st.subheader("📋 누락된 숫자 분석")
+    if missing_ranges:
+        st.warning(f"누락된 숫자 ({count_missing(missing_ranges)}개, {len(missing_ranges)}개 구간): {format_ranges(missing_ranges, limit=50)}")
+    else:
+        st.success("✅ 누락된 숫자가 없습니다.")
+    if outlier_numbers:
+        st.warning(f"⚠️ 예상 레이어 범위 밖의 번호 ({len(outlier_numbers)}개, 누락 계산에서 제외): {', '.join(map(str, outlier_numbers[:50]))}")
+
+# 처리 로그 화면에 한 번에 표시하는 그룹 수
+LOG_PAGE_SIZE = 100
+
+# 비정상 그룹 이미지 검토에서 한 번에 더 불러오는 그룹 수
+REVIEW_PAGE_SIZE = 10
+
+# 백그라운드 작업 진행 상황 갱신 간격 (초)
+JOB_POLL_INTERVAL = 0.5
+
+# 단계 이름 표시용
+STAGE_LABELS = {
+    'analysis': "폴더 분석",
+    'listing': "파일 탐색",
+    'parse': "파일명 파싱",
+    'missing': "누락 분석",
+    'grouping': "그룹 분석",
+    'plan': "분류 계획",
+    'copy': "파일 저장",
+    'fingerprint': "동일 파일 확인",
+    'transcode': "이미지 변환 (인코딩 시간 합계)",
+    'volume': "볼륨 내보내기",
+    'save_log': "로그 저장",
+    'zip': "ZIP 작성",
+    'catalog': "카탈로그 기록",
+}
+
+def format_size(size):
+    """바이트 수를 KB/MB/GB 단위 문자열로 변환"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def show_run_metrics(metrics):
+    """단계별 소요 시간과 처리량 표시 (파일 저장/ZIP 작성 단계는 상단 지표로 강조)"""
+    st.subheader("⏱️ 단계별 성능")
+    output_stage = metrics['stages'].get('copy') or metrics['stages'].get('zip')
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("전체 소요 시간", f"{metrics['total_seconds']:.2f}초")
+    with col2:
+        st.metric("초당 파일", f"{output_stage['files_per_second'] or 0:,.0f}개" if output_stage else "-")
+    with col3:
+        st.metric("초당 용량", f"{format_size(output_stage['bytes_per_second'] or 0)}/s" if output_stage else "-")
+    with col4:
+        peak_memory = metrics.get('peak_rss_bytes')
+        st.metric("최대 메모리", format_size(peak_memory) if peak_memory else "-")
+    
+    rows = []
+    for name, stage in metrics['stages'].items():
+        rows.append({
+            '단계': STAGE_LABELS.get(name, name),
+            '시간 (초)': stage['seconds'],
+            '파일 수': stage.get('files'),
+            '초당 파일': stage.get('files_per_second'),
+            '초당 용량': format_size(stage['bytes_per_second']) + "/s" if stage.get('bytes_per_second') else None,
+            '최대 추가 메모리': format_size(stage['peak_memory_bytes']) if 'peak_memory_bytes' in stage else None,
+        })
+    with st.expander("단계별 상세 보기"):
+        st.table(rows)
+    
+    transcode_stage = metrics['stages'].get('transcode')
+    if transcode_stage and transcode_stage['files']:
+        st.info(
+            f"🗜️ {transcode_stage['files']}개 이미지 변환: {format_size(transcode_stage['bytes'])} → {format_size(transcode_stage['output_bytes'])} "
+            f"({format_size(transcode_stage['bytes_saved'])} 절약, 이미지당 인코딩 {transcode_stage['encode_seconds_per_image'] * 1000:.1f}ms)"
+        )
+
+def show_log_pages(key):
     """
-    파일명을 파싱하여 (앞_숫자, 뒤_숫자) 형태로 반환
-    예: "90-Layer Shot_215-trigger_count.jpg" -> ("90", "215")
+    마지막 실행의 처리 로그를 페이지 단위로 표시
+    로컬 모드는 실행 매니페스트 파일에서 해당 페이지만 읽고, 업로드 모드는 세션에 보관한 항목 사용
     """
-    # 확장자 제거
-    name_without_ext = os.path.splitext(filename)[0]
-    
-    # 패턴: 숫자-Layer Shot_숫자-trigger_count
-    pattern = r'(\d+)-Layer Shot_(\d+)-trigger_count'
-    match = re.match(pattern, name_without_ext)
-    
-    if match:
-        first_num = match.group(1)
-        second_num = match.group(2)
-        return (int(first_num), int(second_num))
-    return None
-
-def get_image_files(folder_path):
-    """이미지 폴더에서 이미지 파일만 가져오기"""
-    image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif'}
-    image_files = []
-    
-    for file in os.listdir(folder_path):
-        if os.path.splitext(file)[1].lower() in image_extensions:
-            image_files.append(file)
-    
-    return image_files
-
-def find_missing_numbers(numbers):
-    """최대값을 기준으로 누락된 숫자 찾기"""
-    if not numbers:
-        return []
-    
-    max_num = max(numbers)
-    all_numbers = set(range(1, max_num + 1))
-    existing_numbers = set(numbers)
-    missing = sorted(all_numbers - existing_numbers)
-    
-    return missing
-
-def group_by_first_number(parsed_files):
-    """앞 숫자를 기준으로 그룹핑"""
-    groups = defaultdict(list)
-    
-    for filename, (first_num, second_num) in parsed_files.items():
-        groups[first_num].append((second_num, filename))
-    
-    # 각 그룹 내에서 두번째 숫자로 정렬
-    for key in groups:
-        groups[key].sort()
-    
-    return groups
-
-def analyze_groups(groups):
-    """그룹별 개수 분석"""
-    group_analysis = {
-        1: [],
-        2: [],
-        3: [],
-        4: [],
-        'other': []
-    }
+    log_view = st.session_state.get(f"{key}_log_view")
+    if not log_view or not log_view['count']:
+        return
     
-    for first_num, items in groups.items():
-        count = len(items)
-        if count in [1, 2, 3, 4]:
-            group_analysis[count].append(first_num)
+    page_count = (log_view['count'] + LOG_PAGE_SIZE - 1) // LOG_PAGE_SIZE
+    with st.expander("처리 로그 보기", expanded=True):
+        page = st.number_input(
+            f"페이지 (전체 {page_count}쪽, {log_view['count']}개 그룹)",
+            min_value=1,
+            max_value=page_count,
+            value=1,
+            step=1,
+            key=f"{key}_log_page"
+        )
+        offset = (int(page) - 1) * LOG_PAGE_SIZE
+        if log_view.get('records') is not None:
+            run_records = log_view['records'][offset:offset + LOG_PAGE_SIZE]
         else:
-            group_analysis['other'].append(first_num)
+            run_records = iter_run_records(log_view['path'], offset, LOG_PAGE_SIZE)
+        st.text('\n'.join(format_run_record(record, log_view['show_modes']) for record in run_records))
+
+def show_review_gallery():
+    """
+    마지막 분석 결과의 비정상 그룹(2개가 아닌 그룹) 이미지를 썸네일로 표시
+    보이는 그룹의 썸네일만 만들며, 더 보기를 누를 때마다 REVIEW_PAGE_SIZE개 그룹씩 더 불러옴
+    """
+    analysis = st.session_state.get('review_analysis')
+    if analysis is None:
+        return
+    groups = abnormal_groups(analysis_groups(analysis))
+    if not groups:
+        return
+    
+    st.subheader("🖼️ 비정상 그룹 이미지 검토")
+    if analysis.get('source_archive'):
+        st.info("압축 파일 입력은 이미지 미리보기를 지원하지 않습니다. 처리 로그에서 그룹별 분류 결과를 확인하세요.")
+        return
+    if not PIL_AVAILABLE:
+        st.info("이미지 미리보기에는 Pillow가 필요합니다. (pip install pillow)")
+        return
+    if not st.checkbox(f"비정상 그룹 {len(groups)}개의 이미지 보기", key="review_open", help="그룹의 각 이미지가 어느 폴더로 저장되는지 썸네일로 확인합니다. 썸네일은 캐시에 저장되어 다시 열 때는 바로 표시됩니다."):
+        return
+    
+    group_sizes = sorted({len(items) for _, items in groups})
+    selected_sizes = st.multiselect("그룹 개수", group_sizes, default=group_sizes, format_func=lambda size: f"{size}개", key="review_sizes")
+    filtered = [(first_num, items) for first_num, items in groups if len(items) in selected_sizes]
+    shown = st.session_state.get('review_shown', REVIEW_PAGE_SIZE)
+    visible = filtered[:shown]
     
-    return group_analysis
+    input_base = analysis['input_base']
+    paths = [os.path.join(input_base, filename) for _, items in visible for _, filename in items]
+    with st.spinner("썸네일 생성 중..."):
+        thumbnails = get_thumbnails(paths)
+    
+    for first_num, items in visible:
+        st.markdown(f"**{first_num}** ({len(items)}개)")
+        columns = st.columns(max(len(items), 4))
+        for column, (second_num, filename, folder, reason) in zip(columns, review_entries(first_num, items, st.session_state.get('review_rule'))):
+            with column:
+                thumbnail = thumbnails.get(os.path.join(input_base, filename))
+                if thumbnail:
+                    st.image(thumbnail, use_container_width=True)
+                else:
+                    st.caption("미리보기 없음")
+                st.caption(f"{second_num} → {folder or '미사용'}", help=reason)
+    
+    if shown < len(filtered):
+        if st.button(f"더 보기 ({shown}/{len(filtered)}개 그룹)", use_container_width=True, key="review_more"):
+            st.session_state.review_shown = shown + REVIEW_PAGE_SIZE
+            st.rerun()
 
-def process_images(input_folder, output_folder, groups):
-    """그룹별 규칙에 따라 이미지 처리"""
-    # 출력 폴더 생성
-    deposition_folder = os.path.join(output_folder, "Deposition")
-    scanning_folder = os.path.join(output_folder, "Scanning")
-    unknown_folder = os.path.join(output_folder, "Unknown")
+def show_group_summary(failed_files, missing_ranges, outlier_numbers, group_sizes, abnormal_log):
+    """제외된 파일, 누락 분석, 그룹 개수별 분석과 비정상 그룹 표시 (group_sizes는 '1'~'4' 문자열 키)"""
+    if failed_files:
+        st.warning(f"⚠️ {len(failed_files)}개의 파일은 파일명 규칙에 맞지 않아 제외되었습니다.")
+        with st.expander("제외된 파일 목록 보기"):
+            st.write(failed_files)
     
-    os.makedirs(deposition_folder, exist_ok=True)
-    os.makedirs(scanning_folder, exist_ok=True)
-    os.makedirs(unknown_folder, exist_ok=True)
+    show_missing_analysis(missing_ranges, outlier_numbers)
     
-    processing_log = []
+    st.subheader("📊 그룹별 분석")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("1개 그룹", group_sizes['1'])
+    with col2:
+        st.metric("2개 그룹 (정상)", group_sizes['2'])
+    with col3:
+        st.metric("3개 그룹", group_sizes['3'])
+    with col4:
+        st.metric("4개 그룹", group_sizes['4'])
     
-    for first_num, items in groups.items():
-        count = len(items)
-        
-        # 원본 파일의 확장자 가져오기
-        sample_filename = items[0][1]
-        ext = os.path.splitext(sample_filename)[1]
-        new_filename = f"{first_num}{ext}"
-        
-        if count == 1:
-            # Unknown 폴더에 저장
-            src = os.path.join(input_folder, items[0][1])
-            dst = os.path.join(unknown_folder, new_filename)
-            shutil.copy2(src, dst)
-            processing_log.append(f"[1개] {first_num}: {items[0][1]} -> Unknown/{new_filename}")
-            
-        elif count == 2:
-            # 낮은 숫자 -> Deposition, 높은 숫자 -> Scanning
-            src_dep = os.path.join(input_folder, items[0][1])
-            dst_dep = os.path.join(deposition_folder, new_filename)
-            shutil.copy2(src_dep, dst_dep)
-            
-            src_scan = os.path.join(input_folder, items[1][1])
-            dst_scan = os.path.join(scanning_folder, new_filename)
-            shutil.copy2(src_scan, dst_scan)
-            
-            processing_log.append(f"[2개] {first_num}: {items[0][1]} -> Deposition/{new_filename}, {items[1][1]} -> Scanning/{new_filename}")
-            
-        elif count == 3:
-            # 2번째로 높은 숫자 -> Deposition, 가장 높은 숫자 -> Scanning
-            src_dep = os.path.join(input_folder, items[1][1])
-            dst_dep = os.path.join(deposition_folder, new_filename)
-            shutil.copy2(src_dep, dst_dep)
-            
-            src_scan = os.path.join(input_folder, items[2][1])
-            dst_scan = os.path.join(scanning_folder, new_filename)
-            shutil.copy2(src_scan, dst_scan)
-            
-            processing_log.append(f"[3개] {first_num}: {items[1][1]} -> Deposition/{new_filename}, {items[2][1]} -> Scanning/{new_filename} (미사용: {items[0][1]})")
-            
-        elif count == 4:
-            # 2번째로 높은 숫자 -> Deposition, 가장 높은 숫자 -> Scanning
-            src_dep = os.path.join(input_folder, items[2][1])
-            dst_dep = os.path.join(deposition_folder, new_filename)
-            shutil.copy2(src_dep, dst_dep)
-            
-            src_scan = os.path.join(input_folder, items[3][1])
-            dst_scan = os.path.join(scanning_folder, new_filename)
-            shutil.copy2(src_scan, dst_scan)
-            
-            processing_log.append(f"[4개] {first_num}: {items[2][1]} -> Deposition/{new_filename}, {items[3][1]} -> Scanning/{new_filename} (미사용: {items[0][1]}, {items[1][1]})")
-            
+    if abnormal_log:
+        st.warning("⚠️ 개수가 2개가 아닌 그룹이 발견되었습니다.")
+        with st.expander("비정상 그룹 상세 정보"):
+            st.text('\n'.join(abnormal_log))
+
+def show_output_summary(deposition_count, scanning_count, unknown_count):
+    """출력 폴더별 저장 개수 표시"""
+    st.subheader("📈 처리 결과 요약")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Deposition 폴더", f"{deposition_count}개")
+    with col2:
+        st.metric("Scanning 폴더", f"{scanning_count}개")
+    with col3:
+        st.metric("Unknown 폴더", f"{unknown_count}개")
+
+def session_token():
+    """
+    브라우저 세션 토큰 (주소의 ?session= 값, 화면을 새로 고쳐도 유지)
+    작업 목록은 다른 사용자와 공유되므로 작업은 이 토큰으로 구분
+    """
+    token = st.query_params.get("session")
+    if not token:
+        token = uuid.uuid4().hex
+        st.query_params["session"] = token
+    return token
+
+def session_job(kind):
+    """
+    이 세션에서 시작한 마지막 백그라운드 작업 (없으면 None)
+    화면을 새로 고쳐 세션이 바뀌었으면 같은 토큰으로 시작한 같은 종류의 실행 중인 작업에 다시 연결
+    """
+    token = session_token()
+    job_id = st.session_state.get(f"{kind}_job_id")
+    job = get_job(job_id, owner=token) if job_id else None
+    if job is None:
+        running_jobs = find_jobs(kind, running_only=True, owner=token)
+        if running_jobs:
+            job = running_jobs[0]
+            st.session_state[f"{kind}_job_id"] = job['id']
+    return job
+
+def wait_for_job(job):
+    """
+    실행 중인 작업의 진행 상황을 끝날 때까지 주기적으로 갱신
+    다른 위젯을 누르면 스크립트가 다시 실행되면서 화면 갱신만 멈추고 작업은 계속됨
+    """
+    if job['status'] != 'running':
+        return
+    
+    if st.button("⏹️ 처리 취소", use_container_width=True, key=f"{job['kind']}_cancel", disabled=job['cancel_event'].is_set()):
+        cancel_job(job['id'])
+    status_placeholder = st.empty()
+    progress_bar = st.progress(0.0)
+    
+    while job['status'] == 'running':
+        stage_label = STAGE_LABELS.get(job['stage'], "준비")
+        elapsed = int(time.time() - job['started_at'])
+        if job['cancel_event'].is_set():
+            status_placeholder.warning(f"⏹️ 취소 요청됨 - 진행 중인 묶음이 끝나면 멈춥니다. ({stage_label}, {elapsed}초)")
         else:
-            # 5개 이상인 경우
-            processing_log.append(f"[{count}개] {first_num}: 처리 규칙 없음 - {', '.join([item[1] for item in items])}")
+            status_placeholder.info(f"🔄 {job['description']} 처리 중 - {stage_label} ({elapsed}초)")
+        if job['total']:
+            progress_bar.progress(min(job['done'] / job['total'], 1.0), text=f"{stage_label}: {job['done']}/{job['total']}")
+        else:
+            progress_bar.progress(0.0, text=f"{stage_label}: {job['done']}개" if job['done'] else stage_label)
+        time.sleep(JOB_POLL_INTERVAL)
     
-    return processing_log
+    status_placeholder.empty()
+    progress_bar.empty()
+
+def show_job_error(job):
+    """실패한 작업의 오류 표시"""
+    st.error(f"❌ 오류가 발생했습니다: {job['error']}")
+    with st.expander("오류 상세 보기"):
+        st.code(job['traceback'])
 
-def save_log(log_content, output_folder, log_name):
-    """로그 파일 저장"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_filename = f"{log_name}_{timestamp}.txt"
-    log_path = os.path.join(output_folder, log_filename)
+def show_local_job_result(job):
+    """끝난 로컬 폴더 처리 작업의 결과 표시"""
+    if job['status'] == 'failed':
+        show_job_error(job)
+        return
+    
+    summary = job['result']
+    # 다른 위젯을 눌러 다시 실행되어도 로그 페이지를 넘길 수 있도록 세션에 보관
+    st.session_state.local_log_view = {
+        'path': summary['run_manifest_path'],
+        'count': summary['run_record_count'],
+        'show_modes': summary['output_mode'] != 'copy' or summary['fingerprint'] or bool(summary['output_format']),
+    }
+    
+    show_group_summary(summary['failed_files'], summary['missing_ranges'], summary['outlier_numbers'], summary['group_sizes'], summary['abnormal_log'])
+    if summary['abnormal_log_path']:
+        st.info(f"📝 비정상 그룹 로그 저장: {summary['abnormal_log_path']}")
     
-    with open(log_path, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(log_content))
+    # 증분 처리의 매니페스트에는 건너뛴 그룹도 이전 결과로 기록되므로 이번에 처리한 그룹 수는 그만큼 뺌
+    processed_groups = summary['run_record_count'] - summary['skipped_groups']
+    if summary['cancelled']:
+        st.warning(f"⏹️ 처리가 취소되었습니다. 저장이 끝난 {processed_groups}개 그룹까지만 로그에 기록했습니다.")
+    else:
+        st.success("✅ 모든 처리가 완료되었습니다!")
+    if summary['skipped_groups']:
+        st.info(f"⏭️ 변경 없는 {summary['skipped_groups']}개 그룹을 건너뛰고 {processed_groups}개 그룹을 처리했습니다.")
+    if summary['unchanged_file_count']:
+        st.info(f"⏭️ 출력 폴더에 이미 같은 내용이 있는 {summary['unchanged_file_count']}개 파일은 다시 쓰지 않았습니다.")
+    if summary['duplicate_group_count']:
+        st.warning(f"⚠️ 같은 내용의 파일이 있는 그룹 (중복 촬영) {summary['duplicate_group_count']}개를 비정상 그룹 로그에 기록했습니다.")
+    st.info(f"📝 처리 로그 저장: {summary['processing_log_path']}")
+    st.info(f"📝 실행 매니페스트 ({RUN_MANIFEST_FORMATS['jsonl']}) 저장: {summary['run_manifest_path']}")
+    for manifest_format, manifest_path in summary['run_manifest_exports'].items():
+        st.info(f"📝 실행 매니페스트 ({RUN_MANIFEST_FORMATS[manifest_format]}) 저장: {manifest_path}")
+    st.info(f"📝 성능 기록 저장: {summary['run_metrics_path']}")
+    if summary.get('catalog_error'):
+        st.warning(f"⚠️ 카탈로그 기록에 실패했습니다 (처리 결과는 정상 저장): {summary['catalog_error']}")
+    elif summary.get('catalog_run_id'):
+        st.info(f"📚 카탈로그에 기록: {summary['catalog_path']} (실행 #{summary['catalog_run_id']})")
+    if summary['volume_index_path']:
+        st.info(f"🧊 볼륨 스택 색인 저장: {summary['volume_index_path']}")
     
-    return log_path
+    show_output_summary(summary['deposition_count'], summary['scanning_count'], summary['unknown_count'])
+    show_run_metrics(summary['metrics'])
+
+def set_upload_download(job_id):
+    """업로드 결과 ZIP을 다운로드 버튼에 올릴 작업 id 설정 (None이면 버튼을 내려 메모리에서 해제)"""
+    st.session_state.upload_download_job = job_id
 
-def process_uploaded_files(uploaded_files):
-    """업로드된 파일들을 처리"""
-    # 임시 디렉토리 생성
-    temp_input = tempfile.mkdtemp(prefix="input_")
-    temp_output = tempfile.mkdtemp(prefix="output_")
+def show_upload_job_result(job):
+    """끝난 업로드 처리 작업의 결과와 ZIP 다운로드 버튼 표시"""
+    if job['status'] == 'failed':
+        show_job_error(job)
+        return
+    if job['status'] == 'cancelled':
+        st.warning("⏹️ 처리가 취소되었습니다.")
+        return
     
-    try:
-        # 업로드된 파일을 임시 폴더에 저장
-        for uploaded_file in uploaded_files:
-            file_path = os.path.join(temp_input, uploaded_file.name)
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-        
-        # 처리 로직 실행
-        image_files = get_image_files(temp_input)
-        
-        if not image_files:
-            return None, None, "업로드된 이미지 파일이 없습니다."
-        
-        # 파일명 파싱
-        parsed_files = {}
-        failed_files = []
-        
-        for filename in image_files:
-            result = parse_filename(filename)
-            if result:
-                parsed_files[filename] = result
-            else:
-                failed_files.append(filename)
-        
-        if not parsed_files:
-            return None, None, "규칙에 맞는 파일명이 없습니다."
-        
-        # 그룹핑 및 분석
-        first_numbers = [first_num for first_num, _ in parsed_files.values()]
-        missing_numbers = find_missing_numbers(first_numbers)
-        groups = group_by_first_number(parsed_files)
-        group_analysis = analyze_groups(groups)
-        
-        # 비정상 그룹 로그
-        abnormal_log = []
-        if group_analysis[1]:
-            abnormal_log.append(f"1개: {', '.join(map(str, group_analysis[1]))}")
-        if group_analysis[3]:
-            abnormal_log.append(f"3개: {', '.join(map(str, group_analysis[3]))}")
-        if group_analysis[4]:
-            abnormal_log.append(f"4개: {', '.join(map(str, group_analysis[4]))}")
-        
-        # 이미지 처리
-        processing_log = process_images(temp_input, temp_output, groups)
-        
-        # 로그 저장
-        if abnormal_log:
-            save_log(abnormal_log, temp_output, "abnormal_groups_log")
-        save_log(processing_log, temp_output, "processing_log")
-        
-        # ZIP 파일 생성
-        zip_buffer = BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for root, dirs, files in os.walk(temp_output):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, temp_output)
-                    zip_file.write(file_path, arcname)
-        
-        zip_buffer.seek(0)
-        
-        return zip_buffer, {
-            'parsed_files': parsed_files,
-            'failed_files': failed_files,
-            'missing_numbers': missing_numbers,
-            'group_analysis': group_analysis,
-            'abnormal_log': abnormal_log,
-            'processing_log': processing_log
-        }, None
-        
-    except Exception as e:
-        return None, None, str(e)
-    finally:
-        # 임시 폴더 정리
-        try:
-            shutil.rmtree(temp_input)
-            shutil.rmtree(temp_output)
-        except:
-            pass
+    results = job['result']
+    group_analysis = results['group_analysis']
+    st.session_state.upload_log_view = {
+        'records': results['run_records'],
+        'count': len(results['run_records']),
+        'show_modes': False,
+    }
+    
+    group_sizes = {str(key): len(value) for key, value in group_analysis.items()}
+    show_group_summary(results['failed_files'], results['missing_ranges'], results['outlier_numbers'], group_sizes, results['abnormal_log'])
+    
+    st.success("✅ 모든 처리가 완료되었습니다!")
+    
+    # ZIP에 실제로 저장한 항목 기준 (5개 이상 그룹 규칙으로 저장한 파일 포함)
+    show_output_summary(results['deposition_count'], results['scanning_count'], results['unknown_count'])
+    show_run_metrics(results['metrics'])
+    
+    # 다운로드 버튼
+    # st.download_button은 ZIP 전체를 메모리에 올리므로 다시 실행될 때마다 읽지 않도록 요청한 경우에만 올리고, 받은 뒤에는 내림
+    st.markdown("---")
+    if st.session_state.get('upload_download_job') != job['id']:
+        st.button(
+            f"📦 다운로드 준비 (ZIP {format_size(os.path.getsize(results['zip_path']))})",
+            use_container_width=True,
+            key="prepare_upload_download",
+            on_click=set_upload_download,
+            args=(job['id'],),
+        )
+        return
+    with open(results['zip_path'], 'rb') as zip_file:
+        st.download_button(
+            label="📥 처리된 파일 다운로드 (ZIP)",
+            data=zip_file,
+            file_name=f"processed_images_{datetime.fromtimestamp(job['finished_at']).strftime('%Y%m%d_%H%M%S')}.zip",
+            mime="application/zip",
+            use_container_width=True,
+            on_click=set_upload_download,
+            args=(None,),
+        )
 
 # Streamlit UI
 st.title("📁 HBNU M160 Vision Image 분류 Tool")
@@ -295,9 +475,9 @@ st.markdown("---")
 # 모드 선택
 mode = st.radio(
     "**처리 모드 선택**",
-    ["📁 로컬 폴더 모드", "📤 파일 업로드 모드"],
+    ["📁 로컬 폴더 모드", "📤 파일 업로드 모드", "👀 실시간 감시 모드", "📚 빌드 카탈로그"],
     horizontal=True,
-    help="로컬 모드: 컴퓨터의 폴더에서 직접 처리 | 업로드 모드: 파일을 업로드하여 처리 후 다운로드"
+    help="로컬 모드: 컴퓨터의 폴더에서 직접 처리 | 업로드 모드: 파일을 업로드하여 처리 후 다운로드 | 감시 모드: 프린터가 쓰는 중인 폴더를 감시하며 완료된 레이어부터 처리 | 카탈로그: 처리한 빌드들의 그룹 통계 조회"
 )
 
 st.markdown("---")
@@ -311,13 +491,13 @@ if mode == "📁 로컬 폴더 모드":
         if TKINTER_AVAILABLE:
             col1_1, col1_2 = st.columns([3, 1])
             with col1_1:
-                input_folder = st.text_input("입력 폴더", value=st.session_state.input_folder, placeholder="예: C:/images/input", label_visibility="collapsed", key="input_text")
+                input_folder = st.text_input("입력 폴더", value=st.session_state.input_folder, placeholder="예: C:/images/input (여러 폴더는 ;로 구분, ZIP/TAR 압축 파일도 가능)", label_visibility="collapsed", key="input_text")
             with col1_2:
                 if st.button("📁 선택", key="input_btn", use_container_width=True):
                     select_folder("input")
                     st.rerun()
         else:
-            input_folder = st.text_input("입력 폴더", value=st.session_state.input_folder, placeholder="예: C:/images/input", label_visibility="collapsed", key="input_text")
+            input_folder = st.text_input("입력 폴더", value=st.session_state.input_folder, placeholder="예: C:/images/input (여러 폴더는 ;로 구분, ZIP/TAR 압축 파일도 가능)", label_visibility="collapsed", key="input_text")
         # 텍스트 입력으로 변경된 경우 세션 상태 업데이트
         if input_folder != st.session_state.input_folder:
             st.session_state.input_folder = input_folder
@@ -338,218 +518,423 @@ if mode == "📁 로컬 폴더 모드":
         if output_folder != st.session_state.output_folder:
             st.session_state.output_folder = output_folder
 
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        recursive = st.checkbox(
+            "하위 폴더 포함",
+            value=False,
+            help="입력 폴더 안의 하위 폴더(세션별 폴더 등)까지 모두 탐색합니다."
+        )
+    
+    with col2:
+        incremental = st.checkbox(
+            "변경된 그룹만 처리 (증분 처리)",
+            value=False,
+            help=f"출력 폴더의 {MANIFEST_FILENAME}와 비교하여 파일 구성이나 크기/수정 시각이 바뀐 그룹만 다시 처리합니다."
+        )
+
+    fingerprint = st.checkbox(
+        "같은 파일 건너뛰기 및 중복 촬영 확인 (내용 지문)",
+        value=False,
+        help="파일 크기와 해시로 출력 폴더에 이미 같은 내용이 있으면 다시 쓰지 않고, 그룹 안에서 내용이 같은 파일(카메라 중복 촬영)을 비정상 그룹 로그에 기록합니다."
+    )
+    
+    large_group_rule = large_group_rule_input("local")
+
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        output_mode = st.selectbox(
+            "**📦 출력 방식**",
+            list(OUTPUT_MODES.keys()),
+            format_func=lambda key: OUTPUT_MODES[key],
+            help="복사: 원본과 별개의 파일 생성 | 하드링크/리플링크: 디스크 공간을 추가로 쓰지 않음 (다른 장치이거나 지원하지 않으면 자동으로 복사) | 심볼릭 링크: 원본을 가리키는 링크 생성"
+        )
+    
+    with col2:
+        max_workers = st.number_input(
+            "**⚙️ 복사 작업자 수**",
+            min_value=1,
+            max_value=64,
+            value=DEFAULT_MAX_WORKERS,
+            help="동시에 복사할 파일 수 | 1이면 순차 처리 (NAS 등 네트워크 저장소에서는 값을 높이면 빨라집니다)"
+        )
+
+    expected_range = expected_range_inputs("local")
+    output_format, jpeg_quality = output_format_inputs("local")
+    
+    export_volume = st.checkbox(
+        "볼륨 스택 내보내기 (학습용 .npy)",
+        value=False,
+        disabled=not (NUMPY_AVAILABLE and PIL_AVAILABLE),
+        help="처리 후 Deposition/Scanning 이미지를 레이어 번호 순의 메모리 맵 배열로 저장합니다. 이미지가 없는 레이어는 마스크로 표시합니다." if NUMPY_AVAILABLE and PIL_AVAILABLE else "numpy와 pillow가 필요합니다. (pip install numpy pillow)"
+    )
+
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        use_numpy = st.checkbox(
+            "배열 기반 그룹 분석 (NumPy)",
+            value=False,
+            disabled=not NUMPY_AVAILABLE,
+            help="파일이 매우 많은 빌드에서 정렬과 그룹 분석을 NumPy 배열 연산으로 처리합니다. 결과는 같습니다." if NUMPY_AVAILABLE else "numpy가 설치되어 있지 않습니다. (pip install numpy)"
+        )
+    
+    with col2:
+        manifest_formats = st.multiselect(
+            "**🗂️ 실행 매니페스트 추가 형식**",
+            ['csv', 'parquet'] if PYARROW_AVAILABLE else ['csv'],
+            format_func=lambda key: RUN_MANIFEST_FORMATS[key],
+            help="그룹별 처리 결과는 항상 JSON Lines(run_manifest_*.jsonl)로 저장되며, 선택한 형식으로도 함께 저장합니다." + ("" if PYARROW_AVAILABLE else " (Parquet은 pyarrow 설치 필요)")
+        )
+
+    record_catalog = st.checkbox(
+        "📚 빌드 카탈로그에 기록",
+        value=True,
+        help=f"처리가 끝나면 그룹별/파일별 결과를 카탈로그({st.session_state.catalog_path})에 기록하여 빌드 카탈로그 화면에서 다른 빌드와 함께 조회합니다. 취소한 실행은 기록하지 않습니다."
+    )
+
     st.markdown("---")
 
-    if st.button("🚀 처리 시작", type="primary", use_container_width=True, key="process_local"):
-        if not input_folder:
+    # 이 세션의 백그라운드 처리 작업 (실행 중에는 새 작업을 시작하지 않음)
+    local_job = session_job("local")
+    local_job_running = local_job is not None and local_job['status'] == 'running'
+
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        analyze_clicked = st.button("🔍 분석", use_container_width=True, key="analyze_local", disabled=local_job_running, help="파일을 저장하지 않고 분석 결과만 확인합니다. 폴더가 바뀌지 않았으면 처리 시작 시 분석 결과를 그대로 사용합니다.")
+    
+    with col2:
+        process_clicked = st.button("🚀 처리 시작", type="primary", use_container_width=True, key="process_local", disabled=local_job_running, help="백그라운드에서 처리하므로 화면을 새로 고치거나 다른 설정을 바꿔도 처리는 계속됩니다.")
+
+    if analyze_clicked or process_clicked:
+        input_folders = split_input_folders(input_folder)
+        missing_folders = [path for path in input_folders if not (os.path.isdir(path) or (os.path.isfile(path) and is_archive(path)))]
+        archive_inputs = [path for path in input_folders if is_archive(path)]
+        if not input_folders:
             st.error("❌ 입력 폴더 경로를 입력해주세요.")
-        elif not os.path.exists(input_folder):
-            st.error(f"❌ 입력 폴더를 찾을 수 없습니다: {input_folder}")
+        elif missing_folders:
+            st.error(f"❌ 입력 폴더 또는 압축 파일을 찾을 수 없습니다: {', '.join(missing_folders)}")
+        elif archive_inputs and len(input_folders) > 1:
+            st.error("❌ 압축 파일 입력은 하나만 지정할 수 있으며 다른 입력 폴더와 함께 사용할 수 없습니다.")
+        elif archive_inputs and process_clicked and (incremental or fingerprint):
+            st.error("❌ 압축 파일 입력에는 증분 처리와 내용 지문을 사용할 수 없습니다.")
         elif not output_folder:
             st.error("❌ 출력 폴더 경로를 입력해주세요.")
         else:
             try:
-                with st.spinner("처리 중..."):
-                    # 1. 이미지 파일 가져오기
-                    image_files = get_image_files(input_folder)
-                    st.info(f"📊 총 {len(image_files)}개의 이미지 파일을 발견했습니다.")
-                    
-                    # 2. 파일명 파싱
-                    parsed_files = {}
-                    failed_files = []
-                    
-                    for filename in image_files:
-                        result = parse_filename(filename)
-                        if result:
-                            parsed_files[filename] = result
+                # 1~4. 탐색, 파싱, 그룹 분석, 누락 값 탐지 (폴더 상태가 같으면 이전 분석 결과 사용)
+                analysis_key = (
+                    folder_state_key(input_folders, recursive, [output_folder]),
+                    tuple(input_folders),
+                    recursive,
+                    os.path.abspath(output_folder),
+                    expected_range,
+                    use_numpy,
+                )
+                analysis = get_cached_analysis(st.session_state.analysis_cache, analysis_key)
+                
+                if analyze_clicked:
+                    with st.spinner("분석 중..."):
+                        discovery_placeholder = st.empty()
+                        if analysis is None:
+                            def update_discovery(file_count, group_count):
+                                # 탐색이 끝나기 전에도 중간 결과 표시
+                                discovery_placeholder.info(f"🔍 탐색 중... {file_count}개 발견, {group_count}개 그룹")
+                            
+                            analysis = analyze_input_folders(input_folders, recursive, [output_folder], expected_range, use_numpy, progress_callback=update_discovery)
+                            store_analysis(st.session_state.analysis_cache, analysis_key, analysis)
+                            discovery_placeholder.info(f"📊 총 {analysis['file_count']}개의 이미지 파일을 발견했습니다.")
                         else:
-                            failed_files.append(filename)
-                    
-                    if failed_files:
-                        st.warning(f"⚠️ {len(failed_files)}개의 파일은 파일명 규칙에 맞지 않아 제외되었습니다.")
-                        with st.expander("제외된 파일 목록 보기"):
-                            st.write(failed_files)
+                            discovery_placeholder.info(f"📊 총 {analysis['file_count']}개의 이미지 파일 (폴더가 바뀌지 않아 이전 분석 결과 사용)")
+                    # 비정상 그룹 이미지 검토는 마지막 분석 결과로 표시
+                    st.session_state.review_analysis = analysis
+                    st.session_state.review_rule = large_group_rule
+                    st.session_state.review_shown = REVIEW_PAGE_SIZE
                     
-                    # 3. 누락된 값 찾기
-                    first_numbers = [first_num for first_num, _ in parsed_files.values()]
-                    missing_numbers = find_missing_numbers(first_numbers)
+                    group_sizes = {str(key): len(value) for key, value in analysis['group_analysis'].items()}
+                    show_group_summary(analysis['failed_files'], analysis['missing_ranges'], analysis['outlier_numbers'], group_sizes, analysis['abnormal_log'])
                     
-                    st.subheader("📋 누락된 숫자 분석")
-                    if missing_numbers:
-                        st.warning(f"누락된 숫자 ({len(missing_numbers)}개): {', '.join(map(str, missing_numbers[:50]))}")
-                        if len(missing_numbers) > 50:
-                            st.info(f"... 외 {len(missing_numbers) - 50}개 더")
+                    # 분류 계획과 기존 출력 폴더 비교 (원본은 읽지 않고 출력 폴더 목록만 확인)
+                    plan_diff = diff_plan(build_plan(analysis_groups(analysis), output_format, large_group_rule), output_folder)
+                    if plan_diff['existing'] or plan_diff['stale']:
+                        st.info(f"📂 출력 폴더 비교: 새 파일 {len(plan_diff['new'])}개, 덮어쓸 파일 {len(plan_diff['existing'])}개, 계획에 없는 기존 파일 {len(plan_diff['stale'])}개")
+                        if plan_diff['stale']:
+                            with st.expander("계획에 없는 기존 출력 파일"):
+                                st.text('\n'.join(plan_diff['stale'][:1000]))
+                    st.info("🔍 분석만 실행했습니다. 처리 시작을 누르면 이 분석 결과로 바로 저장합니다.")
+                else:
+                    # 5~6. 이미지 처리와 로그 저장은 백그라운드 작업으로 실행
+                    if local_job is not None:
+                        discard_job(local_job['id'], owner=session_token())
+                    local_job = start_job(
+                        "local",
+                        input_folder,
+                        run_local_job,
+                        input_folders,
+                        output_folder,
+                        catalog_path=st.session_state.catalog_path if record_catalog else None,
+                        recursive=recursive,
+                        max_workers=int(max_workers),
+                        output_mode=output_mode,
+                        incremental=incremental,
+                        fingerprint=fingerprint,
+                        output_format=output_format,
+                        quality=jpeg_quality,
+                        export_volume=export_volume,
+                        large_group_rule=large_group_rule,
+                        expected_range=expected_range,
+                        use_numpy=use_numpy,
+                        manifest_formats=manifest_formats,
+                        analysis=analysis,
+                        owner=session_token(),
+                    )
+                    st.session_state.local_job_id = local_job['id']
+                    st.session_state.local_log_view = None
+                    if analysis is not None:
+                        st.info(f"📊 총 {analysis['file_count']}개의 이미지 파일 (폴더가 바뀌지 않아 이전 분석 결과 사용)")
+                            
+            except Exception as e:
+                st.error(f"❌ 오류가 발생했습니다: {str(e)}")
+                st.exception(e)
+    
+    if local_job is not None:
+        wait_for_job(local_job)
+        show_local_job_result(local_job)
+    
+    show_log_pages("local")
+    show_review_gallery()
+
+elif mode == "👀 실시간 감시 모드":
+    # 실시간 감시 모드
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.write("**🔍 감시할 입력 폴더 경로**")
+        watch_input_folder = st.text_input("감시 입력 폴더", value=st.session_state.input_folder, placeholder="예: C:/images/input", label_visibility="collapsed", key="watch_input_text")
+        if watch_input_folder != st.session_state.input_folder:
+            st.session_state.input_folder = watch_input_folder
+    
+    with col2:
+        st.write("**💾 출력 폴더 경로**")
+        watch_output_folder = st.text_input("감시 출력 폴더", value=st.session_state.output_folder, placeholder="예: C:/images/output", label_visibility="collapsed", key="watch_output_text")
+        if watch_output_folder != st.session_state.output_folder:
+            st.session_state.output_folder = watch_output_folder
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        watch_output_mode = st.selectbox(
+            "**📦 출력 방식**",
+            list(OUTPUT_MODES.keys()),
+            format_func=lambda key: OUTPUT_MODES[key],
+            key="watch_output_mode"
+        )
+    
+    with col2:
+        settle_time = st.number_input(
+            "**⏱️ 쓰기 완료 대기 (초)**",
+            min_value=0.5,
+            max_value=60.0,
+            value=WATCH_SETTLE_TIME,
+            help="파일 크기와 수정 시각이 이 시간 동안 바뀌지 않으면 쓰기가 끝난 것으로 판단합니다."
+        )
+    
+    with col3:
+        idle_minutes = st.number_input(
+            "**🛑 자동 종료 (분)**",
+            min_value=1,
+            max_value=24 * 60,
+            value=WATCH_IDLE_TIMEOUT // 60,
+            help="이 시간 동안 새 파일이 없으면 빌드가 끝난 것으로 보고 마지막 그룹까지 처리한 뒤 감시를 종료합니다."
+        )
+    
+    watch_large_group_rule = large_group_rule_input("watch")
+    
+    st.markdown("---")
+    
+    if st.button("👀 감시 시작", type="primary", use_container_width=True, key="watch_start"):
+        if not watch_input_folder or not os.path.isdir(watch_input_folder):
+            st.error(f"❌ 입력 폴더를 찾을 수 없습니다: {watch_input_folder}")
+        elif not watch_output_folder:
+            st.error("❌ 출력 폴더 경로를 입력해주세요.")
+        else:
+            # 다른 위젯을 누르면 스크립트가 다시 실행되면서 감시가 중지됨
+            st.button("⏹️ 감시 중지", use_container_width=True, key="watch_stop")
+            status_placeholder = st.empty()
+            metrics_placeholder = st.empty()
+            log_placeholder = st.empty()
+            
+            try:
+                for status in watch_and_process(watch_input_folder, watch_output_folder, output_mode=watch_output_mode, settle_time=settle_time, idle_timeout=idle_minutes * 60, large_group_rule=watch_large_group_rule):
+                    if status['finished']:
+                        status_placeholder.success("✅ 새 파일이 없어 남은 그룹까지 처리하고 감시를 종료했습니다.")
                     else:
-                        st.success("✅ 누락된 숫자가 없습니다.")
-                    
-                    # 4. 그룹핑 및 분석
-                    groups = group_by_first_number(parsed_files)
-                    group_analysis = analyze_groups(groups)
-                    
-                    st.subheader("📊 그룹별 분석")
+                        status_placeholder.info(f"👀 감시 중 ({status['backend']}) - 마지막 새 파일 이후 {int(status['idle_seconds'])}초")
                     
-                    col1, col2, col3, col4 = st.columns(4)
-                    with col1:
-                        st.metric("1개 그룹", len(group_analysis[1]))
-                    with col2:
-                        st.metric("2개 그룹 (정상)", len(group_analysis[2]))
-                    with col3:
-                        st.metric("3개 그룹", len(group_analysis[3]))
-                    with col4:
-                        st.metric("4개 그룹", len(group_analysis[4]))
+                    with metrics_placeholder.container():
+                        col1, col2, col3, col4 = st.columns(4)
+                        with col1:
+                            st.metric("발견한 파일", status['file_count'])
+                        with col2:
+                            st.metric("처리한 그룹", status['routed_count'])
+                        with col3:
+                            st.metric("완료 대기 그룹", status['waiting_count'])
+                        with col4:
+                            st.metric("비정상 그룹", status['abnormal_count'])
                     
-                    # 비정상 그룹 로그 생성
-                    abnormal_log = []
-                    if group_analysis[1]:
-                        abnormal_log.append(f"1개: {', '.join(map(str, group_analysis[1]))}")
-                    if group_analysis[3]:
-                        abnormal_log.append(f"3개: {', '.join(map(str, group_analysis[3]))}")
-                    if group_analysis[4]:
-                        abnormal_log.append(f"4개: {', '.join(map(str, group_analysis[4]))}")
-                    if group_analysis['other']:
-                        for first_num in group_analysis['other']:
-                            count = len(groups[first_num])
-                            abnormal_log.append(f"{count}개: {first_num}")
-                    
-                    if abnormal_log:
-                        st.warning("⚠️ 개수가 2개가 아닌 그룹이 발견되었습니다.")
-                        with st.expander("비정상 그룹 상세 정보"):
-                            st.text('\n'.join(abnormal_log))
-                        
-                        # 비정상 그룹 로그 저장
-                        os.makedirs(output_folder, exist_ok=True)
-                        abnormal_log_path = save_log(abnormal_log, output_folder, "abnormal_groups_log")
-                        st.info(f"📝 비정상 그룹 로그 저장: {abnormal_log_path}")
-                    
-                    # 5. 이미지 처리
-                    status_placeholder = st.empty()
-                    status_placeholder.subheader("🔄 이미지 처리 중...")
-                    processing_log = process_images(input_folder, output_folder, groups)
-                    status_placeholder.subheader("✅ 이미지 처리 완료")
-                    
-                    # 6. 처리 로그 저장
-                    processing_log_path = save_log(processing_log, output_folder, "processing_log")
-                    
-                    st.success("✅ 모든 처리가 완료되었습니다!")
-                    st.info(f"📝 처리 로그 저장: {processing_log_path}")
-                    
-                    # 처리 결과 요약
-                    st.subheader("📈 처리 결과 요약")
-                    deposition_count = len(group_analysis[2]) + len(group_analysis[3]) + len(group_analysis[4])
-                    scanning_count = len(group_analysis[2]) + len(group_analysis[3]) + len(group_analysis[4])
-                    unknown_count = len(group_analysis[1])
-                    
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("Deposition 폴더", f"{deposition_count}개")
-                    with col2:
-                        st.metric("Scanning 폴더", f"{scanning_count}개")
-                    with col3:
-                        st.metric("Unknown 폴더", f"{unknown_count}개")
-                    
-                    with st.expander("처리 로그 보기"):
-                        for log in processing_log[:100]:
-                            st.text(log)
-                        if len(processing_log) > 100:
-                            st.info(f"... 외 {len(processing_log) - 100}개 더 (전체 로그는 파일을 확인하세요)")
-                            
+                    log_placeholder.text('\n'.join(status['recent_log']))
+                
+                st.info(f"📝 처리 로그 저장: {status['processing_log_path']}")
+                st.info(f"📝 실행 매니페스트 저장: {status['run_manifest_path']}")
+                if status['abnormal_count']:
+                    st.info(f"📝 비정상 그룹 로그 저장: {status['abnormal_log_path']}")
+                if status['failed_files']:
+                    st.warning(f"⚠️ {len(status['failed_files'])}개의 파일은 파일명 규칙에 맞지 않아 제외되었습니다.")
             except Exception as e:
                 st.error(f"❌ 오류가 발생했습니다: {str(e)}")
                 st.exception(e)
 
+elif mode == "📚 빌드 카탈로그":
+    # 빌드 카탈로그 (로컬 폴더 모드, cli.py, batch.py 실행 결과를 빌드 간에 조회)
+    catalog_path = st.text_input("**📚 카탈로그 파일**", value=st.session_state.catalog_path, help="cli.py와 batch.py도 기본값으로 같은 카탈로그에 기록합니다 (--catalog로 변경, --no-catalog로 끔).")
+    if catalog_path != st.session_state.catalog_path:
+        st.session_state.catalog_path = catalog_path
+    
+    if not os.path.exists(catalog_path):
+        st.info("📭 아직 기록된 실행이 없습니다. 로컬 폴더 모드에서 **빌드 카탈로그에 기록**을 켠 채로 처리하거나 cli.py/batch.py로 처리하면 카탈로그에 기록됩니다.")
+    else:
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            today = datetime.now().date()
+            period = st.date_input("**기간**", value=(today - timedelta(days=30), today), key="catalog_period")
+        with col2:
+            build_filter = st.text_input("**빌드 이름 (일부)**", key="catalog_build")
+        with col3:
+            catalog_group_size = st.selectbox(
+                "**비율을 볼 그룹 개수**",
+                [3, 1, 4, 5],
+                format_func=lambda size: "5개 이상" if size == 5 else f"{size}개",
+                key="catalog_group_size",
+            )
+        with col4:
+            min_ratio = st.number_input("**최소 비율 (%)**", min_value=0.0, max_value=100.0, value=0.0, step=0.5, key="catalog_min_ratio", help="0보다 크면 전체 그룹 중 선택한 개수 그룹의 비율이 이 값보다 큰 실행만 표시합니다.")
+        
+        # 날짜를 하나만 고른 중에는 그 날짜부터 조회
+        since = period[0].isoformat() if period else None
+        until = (period[1] + timedelta(days=1)).isoformat() if len(period) > 1 else None
+        try:
+            connection = open_catalog(catalog_path)
+            try:
+                runs = query_runs(connection, since, until, build_filter or None, catalog_group_size, min_ratio or None)
+                stats = build_stats(connection, since, until, build_filter or None)
+                groups = query_groups(connection, catalog_group_size, since, until, build_filter or None, limit=1000)
+            finally:
+                connection.close()
+        except Exception as e:
+            st.error(f"❌ 카탈로그를 읽을 수 없습니다: {str(e)}")
+        else:
+            size_label = "5개 이상" if catalog_group_size == 5 else f"{catalog_group_size}개"
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("실행", len(runs))
+            with col2:
+                st.metric("빌드", len({run['build'] for run in runs}))
+            with col3:
+                st.metric(f"{size_label} 그룹 비율 평균", f"{sum(run['ratio'] for run in runs) / len(runs):.2f}%" if runs else "-")
+            
+            st.subheader("🗂️ 실행 목록")
+            st.dataframe(
+                [
+                    {
+                        '실행': run['id'],
+                        '시작': run['started_at'],
+                        '빌드': run['build'],
+                        '파일 수': run['file_count'],
+                        '그룹 수': run['group_count'],
+                        f'{size_label} 그룹 비율 (%)': run['ratio'],
+                        '1개': run['size_1'],
+                        '3개': run['size_3'],
+                        '4개': run['size_4'],
+                        '5개 이상': run['size_other'],
+                        '누락 수': run['missing_count'],
+                        '누락 구간': run['missing_ranges'],
+                        '비정상 그룹': run['abnormal_count'],
+                        '중복 촬영 그룹': run['duplicate_group_count'],
+                        '출력 폴더': run['output_folder'],
+                    }
+                    for run in runs
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+            
+            st.subheader("📊 빌드별 통계 (그룹 비율은 마지막 실행 기준)")
+            st.dataframe(
+                [
+                    {
+                        '빌드': row['build'],
+                        '실행 수': row['run_count'],
+                        '마지막 실행': row['last_started_at'],
+                        '그룹 수': row['group_count'],
+                        '1개 (%)': row['ratio_1'],
+                        '2개 (%)': row['ratio_2'],
+                        '3개 (%)': row['ratio_3'],
+                        '4개 (%)': row['ratio_4'],
+                        '5개 이상 (%)': row['ratio_other'],
+                        '평균 누락 수': row['avg_missing_count'],
+                        '평균 비정상 그룹': row['avg_abnormal_count'],
+                        '중복 촬영 그룹': row['duplicate_group_count'],
+                    }
+                    for row in stats
+                ],
+                use_container_width=True,
+                hide_index=True,
+            )
+            
+            with st.expander(f"{size_label} 그룹 목록 (최대 1000개)"):
+                st.dataframe(groups, use_container_width=True, hide_index=True)
+
 else:
     # 파일 업로드 모드
     st.write("**📤 이미지 파일 업로드**")
     uploaded_files = st.file_uploader(
         "이미지 파일들을 선택하세요 (여러 파일 선택 가능)",
-        type=['jpg', 'jpeg', 'png', 'bmp', 'tiff', 'gif'],
+        type=['jpg', 'jpeg', 'png', 'bmp', 'tiff', 'gif', 'zip', 'tar', 'gz', 'tgz', 'bz2', 'tbz2', 'xz', 'txz'],
         accept_multiple_files=True,
-        help="Ctrl 또는 Shift를 눌러 여러 파일을 선택할 수 있습니다."
+        help="Ctrl 또는 Shift를 눌러 여러 파일을 선택할 수 있습니다. ZIP/TAR 압축 파일은 풀지 않고 안의 이미지를 바로 처리합니다."
     )
     
     if uploaded_files:
         st.info(f"📊 {len(uploaded_files)}개의 파일이 업로드되었습니다.")
     
+    expected_range = expected_range_inputs("upload")
+    upload_output_format, upload_jpeg_quality = output_format_inputs("upload")
+    upload_large_group_rule = large_group_rule_input("upload")
+    
     st.markdown("---")
     
-    if st.button("🚀 처리 시작", type="primary", use_container_width=True, key="process_upload"):
+    # 이 세션의 백그라운드 처리 작업 (결과 ZIP은 다음 작업을 시작하거나 작업 기록이 정리될 때 삭제)
+    upload_job = session_job("upload")
+    upload_job_running = upload_job is not None and upload_job['status'] == 'running'
+    
+    if st.button("🚀 처리 시작", type="primary", use_container_width=True, key="process_upload", disabled=upload_job_running):
         if not uploaded_files:
             st.error("❌ 파일을 업로드해주세요.")
         else:
-            with st.spinner("처리 중..."):
-                zip_buffer, results, error = process_uploaded_files(uploaded_files)
-                
-                if error:
-                    st.error(f"❌ 오류가 발생했습니다: {error}")
-                elif zip_buffer and results:
-                    # 결과 표시
-                    parsed_files = results['parsed_files']
-                    failed_files = results['failed_files']
-                    missing_numbers = results['missing_numbers']
-                    group_analysis = results['group_analysis']
-                    abnormal_log = results['abnormal_log']
-                    processing_log = results['processing_log']
-                    
-                    if failed_files:
-                        st.warning(f"⚠️ {len(failed_files)}개의 파일은 파일명 규칙에 맞지 않아 제외되었습니다.")
-                        with st.expander("제외된 파일 목록 보기"):
-                            st.write(failed_files)
-                    
-                    st.subheader("📋 누락된 숫자 분석")
-                    if missing_numbers:
-                        st.warning(f"누락된 숫자 ({len(missing_numbers)}개): {', '.join(map(str, missing_numbers[:50]))}")
-                        if len(missing_numbers) > 50:
-                            st.info(f"... 외 {len(missing_numbers) - 50}개 더")
-                    else:
-                        st.success("✅ 누락된 숫자가 없습니다.")
-                    
-                    st.subheader("📊 그룹별 분석")
-                    col1, col2, col3, col4 = st.columns(4)
-                    with col1:
-                        st.metric("1개 그룹", len(group_analysis[1]))
-                    with col2:
-                        st.metric("2개 그룹 (정상)", len(group_analysis[2]))
-                    with col3:
-                        st.metric("3개 그룹", len(group_analysis[3]))
-                    with col4:
-                        st.metric("4개 그룹", len(group_analysis[4]))
-                    
-                    if abnormal_log:
-                        st.warning("⚠️ 개수가 2개가 아닌 그룹이 발견되었습니다.")
-                        with st.expander("비정상 그룹 상세 정보"):
-                            st.text('\n'.join(abnormal_log))
-                    
-                    st.success("✅ 모든 처리가 완료되었습니다!")
-                    
-                    # 처리 결과 요약
-                    st.subheader("📈 처리 결과 요약")
-                    deposition_count = len(group_analysis[2]) + len(group_analysis[3]) + len(group_analysis[4])
-                    scanning_count = len(group_analysis[2]) + len(group_analysis[3]) + len(group_analysis[4])
-                    unknown_count = len(group_analysis[1])
-                    
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("Deposition 폴더", f"{deposition_count}개")
-                    with col2:
-                        st.metric("Scanning 폴더", f"{scanning_count}개")
-                    with col3:
-                        st.metric("Unknown 폴더", f"{unknown_count}개")
-                    
-                    # 다운로드 버튼
-                    st.markdown("---")
-                    st.download_button(
-                        label="📥 처리된 파일 다운로드 (ZIP)",
-                        data=zip_buffer,
-                        file_name=f"processed_images_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
-                        mime="application/zip",
-                        use_container_width=True
-                    )
-                    
-                    with st.expander("처리 로그 보기"):
-                        for log in processing_log[:100]:
-                            st.text(log)
-                        if len(processing_log) > 100:
-                            st.info(f"... 외 {len(processing_log) - 100}개 더")
+            if upload_job is not None:
+                discard_job(upload_job['id'], owner=session_token())
+            upload_job = start_job("upload", f"업로드 파일 {len(uploaded_files)}개", run_upload_job, list(uploaded_files), expected_range, upload_output_format, upload_jpeg_quality, upload_large_group_rule, owner=session_token())
+            st.session_state.upload_job_id = upload_job['id']
+            st.session_state.upload_log_view = None
+    
+    if upload_job is not None:
+        wait_for_job(upload_job)
+        show_upload_job_result(upload_job)
+    
+    show_log_pages("upload")
 
 st.markdown("---")
 st.markdown("""
@@ -558,12 +943,22 @@ st.markdown("""
 #### 📁 로컬 폴더 모드 (로컬 환경 권장)
 1. **입력 폴더 경로**: 처리할 이미지가 들어있는 폴더 경로를 입력하거나 선택하세요.
 2. **출력 폴더 경로**: 분류된 이미지를 저장할 폴더 경로를 입력하거나 선택하세요.
-3. **처리 시작** 버튼을 클릭하여 처리를 시작합니다.
+3. **분석** 버튼으로 분석 결과를 먼저 확인하거나, **처리 시작** 버튼을 클릭하여 처리를 시작합니다. (폴더가 바뀌지 않았으면 분석 결과를 다시 사용)
+4. 처리는 백그라운드에서 진행되므로 화면을 새로 고쳐도 계속되며, **처리 취소** 버튼으로 멈출 수 있습니다.
+
+#### 👀 실시간 감시 모드 (빌드 중 사용)
+1. **감시할 입력 폴더**와 **출력 폴더** 경로를 입력하세요.
+2. **감시 시작** 버튼을 클릭하면 더 높은 레이어 번호가 나타난 그룹부터 바로 분류합니다.
+3. 설정한 시간 동안 새 파일이 없으면 마지막 그룹까지 처리하고 자동으로 종료합니다.
 
 #### 📤 파일 업로드 모드 (배포 환경 권장)
 1. **이미지 파일 업로드**: 처리할 이미지 파일들을 선택하세요 (여러 파일 선택 가능).
 2. **처리 시작** 버튼을 클릭하여 처리를 시작합니다.
-3. 처리가 완료되면 **다운로드 버튼**을 클릭하여 결과 파일을 다운로드하세요.
+3. 처리가 완료되면 **다운로드 준비** 버튼을 누른 뒤 **다운로드 버튼**을 클릭하여 결과 파일을 다운로드하세요.
+
+#### 📚 빌드 카탈로그
+1. 로컬 폴더 모드(**빌드 카탈로그에 기록**, 기본 선택), `cli.py`, `batch.py`(`--no-catalog`로 끔)로 처리한 빌드의 그룹별 결과가 카탈로그에 기록됩니다.
+2. **기간**, **빌드 이름**, **그룹 개수**와 **최소 비율**을 지정하여 조건에 맞는 실행과 빌드별 통계를 확인하세요.
 
 ### 📝 파일명 규칙
 - 입력 형식: `숫자-Layer Shot_숫자-trigger_count.확장자`
@@ -0,0 +1,242 @@
+"""
+여러 빌드 폴더 일괄 처리 (빌드 하나당 프로세스 하나)
+
+예:
+    python batch.py D:/archive -o D:/processed --processes 8
+    python batch.py D:/archive/build_001 D:/archive/build_002 -o D:/processed
+    python batch.py D:/dumps -o D:/processed   (build_001.zip, build_002.tar.gz ... 압축 파일도 빌드로 처리)
+    python batch.py D:/archive -o D:/processed --catalog D:/catalog.sqlite3   (기본값은 ~/.image_sorter/catalog.sqlite3, --no-catalog로 끔, 빌드 간 조회는 catalog.py)
+"""
+import argparse
+import json
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from catalog import DEFAULT_CATALOG_PATH, record_run
+from pipeline import DEFAULT_JPEG_QUALITY, LARGE_GROUP_RULES, NUMPY_AVAILABLE, OUTPUT_FORMATS, OUTPUT_MODES, PIL_AVAILABLE, PYARROW_AVAILABLE, archive_stem, format_ranges, is_archive, is_image_file, parse_layer_range, run_pipeline
+
+# 프로세스 수 기본값 (빌드별 파싱/그룹핑은 CPU, 복사는 I/O 위주)
+DEFAULT_PROCESSES = os.cpu_count() or 1
+
+# 빌드별 복사 작업자 수 기본값 (프로세스 수만큼 곱해지므로 단일 실행보다 작게)
+DEFAULT_BUILD_WORKERS = 4
+
+# 빌드별 이미지 변환 프로세스 수 기본값 (빌드 자체를 프로세스별로 처리하므로 빌드 안에서는 순차 변환)
+DEFAULT_BUILD_TRANSCODE_PROCESSES = 1
+
+def has_image_files(folder_path):
+    """폴더 바로 아래에 이미지 파일이 있는지 확인"""
+    with os.scandir(folder_path) as entries:
+        return any(entry.is_file() and is_image_file(entry.name) for entry in entries)
+
+def find_build_folders(paths):
+    """
+    빌드 폴더 목록 만들기
+    이미지가 바로 들어있는 폴더와 ZIP/TAR 압축 파일은 빌드로, 그렇지 않은 폴더는 상위 폴더로 보고 하위 폴더와 압축 파일을 빌드로 사용
+    """
+    build_folders = []
+    for path in paths:
+        if os.path.isfile(path) or has_image_files(path):
+            build_folders.append(path)
+            continue
+        with os.scandir(path) as entries:
+            build_folders.extend(sorted(entry.path for entry in entries if entry.is_dir() or (entry.is_file() and is_archive(entry.name))))
+    return build_folders
+
+def assign_output_folders(build_folders, output_root):
+    """빌드 폴더별 출력 폴더 (출력 루트/빌드 폴더명 또는 압축 확장자를 뺀 압축 파일명, 이름이 겹치면 _2, _3 ... 추가)"""
+    output_folders = []
+    used_names = set()
+    for build_folder in build_folders:
+        base_name = archive_stem(build_folder)
+        name = base_name
+        suffix = 2
+        while name in used_names:
+            name = f"{base_name}_{suffix}"
+            suffix += 1
+        used_names.add(name)
+        output_folders.append(os.path.join(output_root, name))
+    return output_folders
+
+def run_build(build_folder, output_folder, options):
+    """
+    빌드 하나 처리 (프로세스 풀 작업 단위)
+    실패해도 예외를 올리지 않고 오류 내용을 결과에 담아 다른 빌드에 영향을 주지 않음
+    """
+    result = {'build_folder': build_folder, 'output_folder': output_folder, 'summary': None, 'error': None}
+    try:
+        result['summary'] = run_pipeline([build_folder], output_folder, **options)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+    return result
+
+def summarize_batch(results):
+    """빌드별 결과를 합쳐 전체 요약 생성"""
+    group_sizes = {}
+    totals = {'file_count': 0, 'parsed_count': 0, 'failed_file_count': 0, 'group_count': 0, 'missing_number_count': 0, 'duplicate_group_count': 0, 'transcode_bytes_saved': 0}
+    builds_with_missing = []
+    builds_with_outliers = []
+    builds_with_abnormal = []
+    failed_builds = []
+    
+    for result in results:
+        summary = result['summary']
+        if summary is None:
+            failed_builds.append({'build_folder': result['build_folder'], 'error': result['error']})
+            continue
+        
+        totals['file_count'] += summary['file_count']
+        totals['parsed_count'] += summary['parsed_count']
+        totals['failed_file_count'] += len(summary['failed_files'])
+        totals['group_count'] += summary['group_count']
+        totals['missing_number_count'] += summary['missing_count']
+        totals['duplicate_group_count'] += summary['duplicate_group_count']
+        totals['transcode_bytes_saved'] += summary['transcode_bytes_saved']
+        for key, count in summary['group_sizes'].items():
+            group_sizes[key] = group_sizes.get(key, 0) + count
+        
+        if summary['missing_count']:
+            builds_with_missing.append({
+                'build_folder': result['build_folder'],
+                'missing_count': summary['missing_count'],
+                'missing_ranges': format_ranges(summary['missing_ranges']),
+            })
+        if summary['outlier_numbers']:
+            builds_with_outliers.append({'build_folder': result['build_folder'], 'outlier_numbers': summary['outlier_numbers']})
+        if summary['abnormal_log']:
+            builds_with_abnormal.append(result['build_folder'])
+    
+    return {
+        'build_count': len(results),
+        'succeeded_count': len(results) - len(failed_builds),
+        'failed_count': len(failed_builds),
+        **totals,
+        'group_sizes': group_sizes,
+        'builds_with_missing': builds_with_missing,
+        'builds_with_outliers': builds_with_outliers,
+        'builds_with_abnormal': builds_with_abnormal,
+        'failed_builds': failed_builds,
+    }
+
+def run_batch(build_folders, output_root, processes=DEFAULT_PROCESSES, progress_callback=None, catalog_path=None, **options):
+    """
+    여러 빌드를 프로세스 풀로 처리하고 (빌드별 결과 목록, 전체 요약) 반환
+    options는 run_pipeline에 그대로 전달 (recursive, max_workers, output_mode, incremental, fingerprint, output_format, quality, transcode_processes, export_volume, dry_run, expected_range, use_numpy, manifest_formats)
+    progress_callback(완료 수, 전체 수, 빌드 결과)는 완료될 때마다 호출
+    catalog_path를 지정하면 끝난 빌드를 출력 폴더명으로 카탈로그에 기록 (기록은 이 프로세스에서만 하므로 작업 프로세스끼리 잠금을 기다리지 않음)
+    """
+    options.setdefault('max_workers', DEFAULT_BUILD_WORKERS)
+    options.setdefault('transcode_processes', DEFAULT_BUILD_TRANSCODE_PROCESSES)
+    output_folders = assign_output_folders(build_folders, output_root)
+    results = [None] * len(build_folders)
+    
+    def finish_build(done, index):
+        if catalog_path and results[index]['summary'] is not None:
+            record_run(results[index]['summary'], catalog_path, os.path.basename(output_folders[index]))
+        if progress_callback:
+            progress_callback(done, len(build_folders), results[index])
+    
+    if processes <= 1:
+        for index, (build_folder, output_folder) in enumerate(zip(build_folders, output_folders)):
+            results[index] = run_build(build_folder, output_folder, options)
+            finish_build(index + 1, index)
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = {
+                executor.submit(run_build, build_folder, output_folder, options): index
+                for index, (build_folder, output_folder) in enumerate(zip(build_folders, output_folders))
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    # 작업 프로세스 자체가 비정상 종료된 경우
+                    results[index] = {'build_folder': build_folders[index], 'output_folder': output_folders[index], 'summary': None, 'error': f"{type(e).__name__}: {e}"}
+                finish_build(done, index)
+    
+    return results, summarize_batch(results)
+
+def print_progress(done, total, result):
+    """빌드 완료 상황을 표준 오류에 출력 (표준 출력은 JSON 전용)"""
+    status = "실패: " + result['error'] if result['error'] else "완료"
+    sys.stderr.write(f"[{done}/{total}] {result['build_folder']} - {status}\n")
+    sys.stderr.flush()
+
+def main(argv=None):
+    """명령줄 실행: 전체 요약과 빌드별 결과를 JSON으로 표준 출력에 기록"""
+    parser = argparse.ArgumentParser(description="여러 빌드 폴더를 병렬로 분류합니다.")
+    parser.add_argument("paths", nargs="+", help="빌드 폴더, 빌드 압축 파일(ZIP/TAR) 또는 이들이 들어있는 상위 폴더")
+    parser.add_argument("-o", "--output", required=True, help="출력 루트 폴더 (빌드별 하위 폴더에 저장)")
+    parser.add_argument("-p", "--processes", type=int, default=DEFAULT_PROCESSES, help=f"동시에 처리할 빌드 수 (기본값: {DEFAULT_PROCESSES})")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_BUILD_WORKERS, help=f"빌드별 복사 작업자 수 (기본값: {DEFAULT_BUILD_WORKERS})")
+    parser.add_argument("-r", "--recursive", action="store_true", help="빌드 폴더의 하위 폴더까지 탐색")
+    parser.add_argument("-m", "--mode", choices=list(OUTPUT_MODES), default="copy", help="출력 방식 (기본값: copy)")
+    parser.add_argument("--incremental", action="store_true", help="빌드별로 변경된 그룹만 처리")
+    parser.add_argument("--fingerprint", action="store_true", help="내용 지문(크기+해시)으로 출력 폴더에 이미 같은 파일은 다시 쓰지 않고, 그룹 안 동일 파일(중복 촬영)을 비정상 그룹 로그에 기록")
+    parser.add_argument("--output-format", choices=list(OUTPUT_FORMATS), help="BMP/TIFF 원본을 변환하여 저장할 형식 (png/webp는 무손실, jpeg은 --jpeg-quality 품질, pillow 필요)")
+    parser.add_argument("--jpeg-quality", type=int, default=DEFAULT_JPEG_QUALITY, help=f"JPEG 변환 품질 1~95 (기본값: {DEFAULT_JPEG_QUALITY})")
+    parser.add_argument("--transcode-processes", type=int, default=DEFAULT_BUILD_TRANSCODE_PROCESSES, help=f"빌드별 이미지 변환 프로세스 수 (기본값: {DEFAULT_BUILD_TRANSCODE_PROCESSES})")
+    parser.add_argument("--export-volume", action="store_true", help="처리 후 Deposition/Scanning을 레이어 번호 순 메모리 맵 배열(.npy)과 누락 레이어 마스크로 내보냄 (numpy, pillow 필요)")
+    parser.add_argument("--large-group-rule", choices=list(LARGE_GROUP_RULES), default="skip", help="5개 이상 그룹 처리 규칙 (skip: 저장하지 않고 미사용으로 기록, highest_pair: 가장 높은 두 숫자를 Deposition/Scanning으로 저장)")
+    parser.add_argument("--dry-run", action="store_true", help="분석만 하고 파일은 저장하지 않음")
+    parser.add_argument("--numpy", action="store_true", help="NumPy 배열로 그룹 분석 (파일이 매우 많은 빌드용, numpy 필요)")
+    parser.add_argument("--layer-range", type=parse_layer_range, help="예상 레이어 범위 (예: 1-5000, 상한만은 -5000). 범위 밖 번호는 누락 계산에서 제외하고 이상값으로 표시")
+    parser.add_argument("--manifest-format", action="append", choices=["csv", "parquet"], default=[], help="실행 매니페스트(JSON Lines)를 CSV/Parquet으로도 저장 (여러 번 지정 가능, parquet은 pyarrow 필요)")
+    parser.add_argument("--catalog", metavar="PATH", default=DEFAULT_CATALOG_PATH, help=f"빌드별 실행 결과를 기록할 SQLite 카탈로그 (기본값: {DEFAULT_CATALOG_PATH}, 빌드 이름은 출력 폴더명, 조회는 catalog.py)")
+    parser.add_argument("--no-catalog", action="store_true", help="카탈로그에 기록하지 않음")
+    args = parser.parse_args(argv)
+    
+    missing_folders = [path for path in args.paths if not (os.path.isdir(path) or (os.path.isfile(path) and is_archive(path)))]
+    if missing_folders:
+        parser.error(f"폴더 또는 압축 파일을 찾을 수 없습니다: {', '.join(missing_folders)}")
+    if args.processes < 1 or args.workers < 1:
+        parser.error("프로세스 수와 작업자 수는 1 이상이어야 합니다.")
+    if args.numpy and not NUMPY_AVAILABLE:
+        parser.error("--numpy에는 numpy가 필요합니다. (pip install numpy)")
+    if "parquet" in args.manifest_format and not PYARROW_AVAILABLE:
+        parser.error("--manifest-format parquet에는 pyarrow가 필요합니다. (pip install pyarrow)")
+    if args.output_format and not PIL_AVAILABLE:
+        parser.error("--output-format에는 pillow가 필요합니다. (pip install pillow)")
+    if not 1 <= args.jpeg_quality <= 95:
+        parser.error("JPEG 품질은 1~95 사이여야 합니다.")
+    if args.transcode_processes < 1:
+        parser.error("변환 프로세스 수는 1 이상이어야 합니다.")
+    if args.export_volume and not (NUMPY_AVAILABLE and PIL_AVAILABLE):
+        parser.error("--export-volume에는 numpy와 pillow가 필요합니다. (pip install numpy pillow)")
+    
+    build_folders = find_build_folders(args.paths)
+    if not build_folders:
+        parser.error("처리할 빌드 폴더가 없습니다.")
+    
+    results, batch_summary = run_batch(
+        build_folders,
+        args.output,
+        processes=args.processes,
+        progress_callback=print_progress,
+        catalog_path=None if args.no_catalog else args.catalog,
+        recursive=args.recursive,
+        max_workers=args.workers,
+        output_mode=args.mode,
+        incremental=args.incremental,
+        fingerprint=args.fingerprint,
+        output_format=args.output_format,
+        quality=args.jpeg_quality,
+        transcode_processes=args.transcode_processes,
+        export_volume=args.export_volume,
+        large_group_rule=args.large_group_rule,
+        dry_run=args.dry_run,
+        expected_range=args.layer_range,
+        use_numpy=args.numpy,
+        manifest_formats=args.manifest_format,
+    )
+    
+    json.dump({'summary': batch_summary, 'builds': results}, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 1 if batch_summary['failed_count'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""
+파이프라인 벤치마크 (가상 프린터 이미지 폴더 생성 후 단계별 시간 측정)
+
+예:
+    python benchmark.py --files 10000 --output bench_10k.json
+    python benchmark.py --files 100000 --group-mix 1:2,2:90,3:5,4:2,5:1 --compare bench_10k.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from pipeline import (
+    DEFAULT_MAX_WORKERS,
+    NUMPY_AVAILABLE,
+    OUTPUT_MODES,
+    analyze_group_arrays,
+    analyze_groups,
+    build_abnormal_log,
+    build_group_arrays,
+    find_missing_ranges,
+    get_image_files,
+    group_by_first_number,
+    make_log_filename,
+    parse_filename,
+    process_images,
+    save_log,
+    write_zip_archive,
+)
+
+# 그룹 개수 분포 기본값 (그룹 개수: 비율), 5는 5개 이상 그룹
+DEFAULT_GROUP_MIX = "1:2,2:90,3:5,4:2,5:1"
+
+# 규칙에 맞지 않는 파일명 예시 (생성 시 번호를 채움)
+MALFORMED_PATTERNS = [
+    "{layer}-Layer_Shot_{trigger}.jpg",
+    "Layer Shot_{trigger}-trigger_count.jpg",
+    "{layer}-Layer Shot_{trigger}-trigger.jpg",
+    "capture_{trigger}.jpg",
+]
+
+def parse_group_mix(text):
+    """'1:2,2:90,3:5' 형식의 그룹 개수 분포를 [(그룹 개수, 비율)]로 변환"""
+    mix = []
+    for part in text.split(','):
+        size_text, _, weight_text = part.partition(':')
+        size = int(size_text)
+        weight = float(weight_text)
+        if size < 1 or weight < 0:
+            raise ValueError(f"그룹 분포 형식이 올바르지 않습니다: {part}")
+        mix.append((size, weight))
+    if not mix or sum(weight for _, weight in mix) <= 0:
+        raise ValueError(f"그룹 분포 형식이 올바르지 않습니다: {text}")
+    return mix
+
+def generate_build(folder_path, file_count=1000, group_mix=DEFAULT_GROUP_MIX, missing_rate=0.01, malformed_rate=0.005, file_size=4096, extension=".jpg", seed=0):
+    """
+    숫자-Layer Shot_숫자-trigger_count 형식의 가상 빌드 폴더 생성
+    레이어마다 group_mix 분포로 그룹 개수를 정하고, missing_rate 비율로 레이어를 건너뛰며,
+    malformed_rate 비율로 규칙에 맞지 않는 파일명을 섞음. 생성 통계 dict 반환
+    """
+    rng = random.Random(seed)
+    mix = parse_group_mix(group_mix) if isinstance(group_mix, str) else group_mix
+    sizes = [size for size, _ in mix]
+    weights = [weight for _, weight in mix]
+    
+    # 파일마다 앞부분만 다른 내용 (같은 내용의 파일이 생기지 않도록)
+    payload = bytes(rng.getrandbits(8) for _ in range(min(file_size, 64 * 1024)))
+    payload = (payload * (file_size // max(len(payload), 1) + 1))[:file_size]
+    
+    os.makedirs(folder_path, exist_ok=True)
+    stats = {'file_count': 0, 'layer_count': 0, 'missing_layers': 0, 'malformed_files': 0, 'bytes': 0}
+    layer = 0
+    trigger = 0
+    
+    def write_file(filename):
+        header = f"{stats['file_count']:016d}".encode()
+        with open(os.path.join(folder_path, filename), 'wb') as f:
+            f.write((header + payload)[:file_size] if file_size else b'')
+        stats['file_count'] += 1
+        stats['bytes'] += file_size
+    
+    while stats['file_count'] < file_count:
+        layer += 1
+        if rng.random() < missing_rate:
+            stats['missing_layers'] += 1
+            continue
+        
+        stats['layer_count'] += 1
+        group_size = rng.choices(sizes, weights)[0]
+        if group_size >= 5:
+            group_size = rng.randint(5, 7)
+        
+        for _ in range(group_size):
+            if stats['file_count'] >= file_count:
+                break
+            trigger += 1
+            if rng.random() < malformed_rate:
+                filename = rng.choice(MALFORMED_PATTERNS).format(layer=layer, trigger=trigger)
+                stats['malformed_files'] += 1
+            else:
+                filename = f"{layer}-Layer Shot_{trigger}-trigger_count{extension}"
+            write_file(filename)
+    
+    return stats
+
+class FileSource:
+    """업로드 파일처럼 seek/read를 제공하되 읽을 때만 원본 파일을 여는 객체 (열린 파일 수 제한)"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+    
+    def seek(self, offset, whence=0):
+        if self.file is None:
+            self.file = open(self.path, 'rb')
+        return self.file.seek(offset, whence)
+    
+    def read(self, size=-1):
+        data = self.file.read(size)
+        if not data:
+            self.file.close()
+            self.file = None
+        return data
+
+def get_git_commit():
+    """현재 커밋 해시 (git 저장소가 아니면 None)"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+def time_stage(stages, name, func, items=None, bytes_count=None):
+    """단계 실행 시간 측정 후 stages에 기록하고 결과 반환"""
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    
+    stage = {'seconds': round(seconds, 6)}
+    if items is not None:
+        stage['items'] = items
+        stage['items_per_second'] = round(items / seconds, 1) if seconds > 0 else None
+    if bytes_count is not None:
+        stage['bytes'] = bytes_count
+        stage['bytes_per_second'] = round(bytes_count / seconds, 1) if seconds > 0 else None
+    stages[name] = stage
+    return result
+
+def run_benchmark(input_folder, work_folder, max_workers=DEFAULT_MAX_WORKERS, output_mode='copy', include_zip=True, include_numpy=NUMPY_AVAILABLE):
+    """생성된 입력 폴더로 파이프라인 단계별 시간 측정, {단계명: 측정 결과} 반환"""
+    stages = {}
+    
+    image_files = time_stage(stages, 'get_image_files', lambda: get_image_files(input_folder))
+    seconds = stages['get_image_files']['seconds']
+    stages['get_image_files']['items'] = len(image_files)
+    stages['get_image_files']['items_per_second'] = round(len(image_files) / seconds, 1) if seconds > 0 else None
+    
+    def parse_all():
+        parsed_files = {}
+        for filename in image_files:
+            result = parse_filename(filename)
+            if result:
+                parsed_files[filename] = result
+        return parsed_files
+    
+    parsed_files = time_stage(stages, 'parse_filename', parse_all, items=len(image_files))
+    first_numbers = [first_num for first_num, _ in parsed_files.values()]
+    time_stage(stages, 'find_missing_ranges', lambda: find_missing_ranges(first_numbers), items=len(first_numbers))
+    groups = time_stage(stages, 'group_by_first_number', lambda: group_by_first_number(parsed_files), items=len(parsed_files))
+    group_analysis = time_stage(stages, 'analyze_groups', lambda: analyze_groups(groups), items=len(groups))
+    
+    if include_numpy:
+        group_arrays = time_stage(stages, 'build_group_arrays', lambda: build_group_arrays(parsed_files.items()), items=len(parsed_files))
+        time_stage(stages, 'analyze_group_arrays', lambda: analyze_group_arrays(group_arrays), items=len(groups))
+    
+    # 처리 대상 바이트 (Deposition/Scanning/Unknown으로 저장되는 파일)
+    routed_files = [items[index][1] for items in groups.values() if len(items) <= 4 for index in ([0] if len(items) == 1 else [-2, -1])]
+    routed_bytes = sum(os.path.getsize(os.path.join(input_folder, filename)) for filename in routed_files)
+    
+    output_folder = os.path.join(work_folder, "output")
+    processing_log = time_stage(
+        stages, 'process_images',
+        lambda: process_images(input_folder, output_folder, groups, max_workers, None, output_mode),
+        items=len(routed_files), bytes_count=routed_bytes,
+    )
+    
+    abnormal_log = build_abnormal_log(groups, group_analysis)
+    time_stage(stages, 'save_log', lambda: save_log(processing_log, output_folder, "processing_log"), items=len(processing_log))
+    
+    if include_zip:
+        sources = {filename: (FileSource(os.path.join(input_folder, filename)), os.path.getsize(os.path.join(input_folder, filename))) for filename in routed_files}
+        zip_path = os.path.join(work_folder, "upload.zip")
+        log_files = [(make_log_filename("abnormal_groups_log"), abnormal_log)] if abnormal_log else []
+        time_stage(
+            stages, 'upload_zip',
+            lambda: write_zip_archive(zip_path, sources, groups, log_files),
+            items=len(routed_files), bytes_count=routed_bytes,
+        )
+        stages['upload_zip']['archive_bytes'] = os.path.getsize(zip_path)
+    
+    return stages
+
+def compare_results(current, baseline):
+    """단계별 이전 결과 대비 속도 비율 (1보다 크면 빨라짐)"""
+    comparison = {}
+    for name, stage in current['stages'].items():
+        previous = baseline.get('stages', {}).get(name)
+        if not previous or not stage['seconds']:
+            continue
+        comparison[name] = {
+            'baseline_seconds': previous['seconds'],
+            'seconds': stage['seconds'],
+            'speedup': round(previous['seconds'] / stage['seconds'], 3),
+        }
+    return {'baseline_commit': baseline.get('environment', {}).get('git_commit'), 'stages': comparison}
+
+def main(argv=None):
+    """명령줄 실행: 측정 결과를 JSON으로 표준 출력(또는 --output 파일)에 기록"""
+    parser = argparse.ArgumentParser(description="가상 빌드 폴더를 만들어 파이프라인 단계별 시간을 측정합니다.")
+    parser.add_argument("--files", type=int, default=10000, help="생성할 파일 수 (기본값: 10000)")
+    parser.add_argument("--group-mix", default=DEFAULT_GROUP_MIX, help=f"그룹 개수 분포 '개수:비율,...', 5는 5개 이상 (기본값: {DEFAULT_GROUP_MIX})")
+    parser.add_argument("--missing-rate", type=float, default=0.01, help="누락 레이어 비율 (기본값: 0.01)")
+    parser.add_argument("--malformed-rate", type=float, default=0.005, help="규칙에 맞지 않는 파일명 비율 (기본값: 0.005)")
+    parser.add_argument("--file-size", type=int, default=4096, help="파일 크기 (바이트, 기본값: 4096)")
+    parser.add_argument("--extension", default=".jpg", help="파일 확장자 (기본값: .jpg)")
+    parser.add_argument("--seed", type=int, default=0, help="난수 시드 (기본값: 0)")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_MAX_WORKERS, help=f"복사 작업자 수 (기본값: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument("-m", "--mode", choices=list(OUTPUT_MODES), default="copy", help="출력 방식 (기본값: copy)")
+    parser.add_argument("--no-zip", action="store_true", help="업로드 모드 ZIP 단계 제외")
+    parser.add_argument("--workdir", help="작업 폴더 (지정하지 않으면 임시 폴더를 만들고 끝나면 삭제)")
+    parser.add_argument("--input", help="가상 폴더를 만들지 않고 기존 입력 폴더로 측정")
+    parser.add_argument("--compare", help="이전 측정 결과 JSON 파일과 비교")
+    parser.add_argument("-o", "--output", help="결과 JSON 파일 경로 (지정하지 않으면 표준 출력)")
+    args = parser.parse_args(argv)
+    
+    try:
+        group_mix = parse_group_mix(args.group_mix)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    work_folder = args.workdir or tempfile.mkdtemp(prefix="bench_")
+    os.makedirs(work_folder, exist_ok=True)
+    
+    try:
+        config = {
+            'files': args.files,
+            'group_mix': args.group_mix,
+            'missing_rate': args.missing_rate,
+            'malformed_rate': args.malformed_rate,
+            'file_size': args.file_size,
+            'extension': args.extension,
+            'seed': args.seed,
+            'workers': args.workers,
+            'mode': args.mode,
+        }
+        
+        if args.input:
+            input_folder = args.input
+            generation = None
+            config['input'] = args.input
+        else:
+            input_folder = os.path.join(work_folder, "input")
+            start = time.perf_counter()
+            generation = generate_build(input_folder, args.files, group_mix, args.missing_rate, args.malformed_rate, args.file_size, args.extension, args.seed)
+            generation['seconds'] = round(time.perf_counter() - start, 3)
+        
+        stages = run_benchmark(input_folder, work_folder, args.workers, args.mode, include_zip=not args.no_zip)
+        result = {
+            'config': config,
+            'generation': generation,
+            'environment': {
+                'git_commit': get_git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'numpy': NUMPY_AVAILABLE,
+                'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            'stages': stages,
+        }
+        
+        if args.compare:
+            with open(args.compare, 'r', encoding='utf-8') as f:
+                result['comparison'] = compare_results(result, json.load(f))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(work_folder, ignore_errors=True)
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""
+처리한 빌드의 결과를 모아 두는 로컬 SQLite 카탈로그 (빌드 간 통계 조회)
+
+실행 요약과 실행 매니페스트의 그룹별/파일별 결과를 실행이 끝날 때 한 트랜잭션으로 기록합니다.
+
+예:
+    python cli.py C:/images/input -o C:/images/output --no-catalog   (기본으로는 DEFAULT_CATALOG_PATH에 기록)
+    python catalog.py runs --since 2026-09-01 --until 2026-10-01 --group-size 3 --min-ratio 1
+    python catalog.py stats --days 30
+    python catalog.py groups --build build_042 --group-size 5
+    python catalog.py sql "SELECT build, COUNT(*) FROM runs GROUP BY build"
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+from pipeline import RUN_RECORD_CHUNK, archive_stem, format_ranges, get_input_base, iter_run_records, measure_stage
+
+# 기본 카탈로그 위치 (사용자별 하나, 앱/cli.py/batch.py가 기본으로 기록하고 catalog.py가 조회, --no-catalog로 끔)
+DEFAULT_CATALOG_PATH = os.path.join(os.path.expanduser("~"), ".image_sorter", "catalog.sqlite3")
+
+# 다른 프로세스(앱, 일괄 처리)가 기록 중일 때 기다리는 시간 (초)
+CATALOG_TIMEOUT = 30.0
+
+# 그룹 개수 구분 (group_sizes의 키와 runs 표의 개수 열)
+GROUP_SIZE_KEYS = ('1', '2', '3', '4', 'other')
+GROUP_SIZE_COLUMNS = {key: f"size_{key}" for key in GROUP_SIZE_KEYS}
+
+# runs: 실행 하나당 한 행 (그룹 개수별 개수는 열로 두어 비율 조회에 그룹 표를 읽지 않음)
+# groups/files: 실행 매니페스트 항목 (증분 처리도 건너뛴 그룹을 포함한 전체 그룹, 건너뛴 그룹은 이전 실행의 결과)
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    build TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    input_folders TEXT NOT NULL,
+    output_folder TEXT,
+    output_mode TEXT,
+    large_group_rule TEXT,
+    file_count INTEGER NOT NULL,
+    parsed_count INTEGER,
+    failed_file_count INTEGER NOT NULL,
+    group_count INTEGER NOT NULL,
+    size_1 INTEGER NOT NULL,
+    size_2 INTEGER NOT NULL,
+    size_3 INTEGER NOT NULL,
+    size_4 INTEGER NOT NULL,
+    size_other INTEGER NOT NULL,
+    missing_count INTEGER NOT NULL,
+    missing_ranges TEXT NOT NULL,
+    outlier_count INTEGER NOT NULL,
+    abnormal_count INTEGER NOT NULL,
+    duplicate_group_count INTEGER NOT NULL,
+    skipped_groups INTEGER NOT NULL,
+    run_record_count INTEGER NOT NULL,
+    elapsed_seconds REAL,
+    run_manifest_path TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+CREATE INDEX IF NOT EXISTS runs_build ON runs (build, started_at);
+CREATE TABLE IF NOT EXISTS groups (
+    run_id INTEGER NOT NULL,
+    first_num INTEGER NOT NULL,
+    group_size INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    new_filename TEXT,
+    duplicate_count INTEGER NOT NULL,
+    PRIMARY KEY (run_id, first_num)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS groups_size ON groups (group_size, run_id);
+CREATE TABLE IF NOT EXISTS files (
+    run_id INTEGER NOT NULL,
+    first_num INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    folder TEXT,
+    destination TEXT,
+    mode TEXT,
+    PRIMARY KEY (run_id, first_num, source)
+) WITHOUT ROWID;
+"""
+
+def open_catalog(catalog_path=DEFAULT_CATALOG_PATH):
+    """
+    카탈로그 연결 열기 (파일과 표가 없으면 생성)
+    WAL 모드로 기록 중에도 조회할 수 있고, 실행 끝의 한 번 기록만 디스크에 동기화
+    """
+    folder = os.path.dirname(catalog_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    connection = sqlite3.connect(catalog_path, timeout=CATALOG_TIMEOUT)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(CATALOG_SCHEMA)
+    return connection
+
+def build_name(input_folders):
+    """카탈로그의 빌드 이름 (입력 폴더들의 공통 폴더명 또는 압축 확장자를 뺀 압축 파일명, batch.py 출력 폴더명과 같음)"""
+    return archive_stem(get_input_base(input_folders) or input_folders[0])
+
+def should_record(summary):
+    """카탈로그에 기록할 실행인지 확인 (분석만 한 실행, 취소된 실행, 샤드 하나의 실행은 제외하고 샤드는 merge_shards 결과로 기록)"""
+    return bool(summary.get('run_manifest_path')) and not summary.get('dry_run') and not summary.get('cancelled') and not summary.get('shard')
+
+def iter_catalog_rows(run_id, run_records):
+    """실행 매니페스트 항목을 RUN_RECORD_CHUNK개씩 (그룹 행 목록, 파일 행 목록)으로 변환 (미사용 파일은 폴더 없이 기록)"""
+    run_records = iter(run_records)
+    while True:
+        chunk = list(islice(run_records, RUN_RECORD_CHUNK))
+        if not chunk:
+            return
+        group_rows = []
+        file_rows = []
+        for record in chunk:
+            first_num = record['first_num']
+            group_rows.append((run_id, first_num, record['group_size'], record['status'], record['new_filename'], len(record.get('duplicates', []))))
+            for target in record['targets']:
+                file_rows.append((run_id, first_num, target['source'], target['folder'], target['destination'], target['mode']))
+            for filename in record['unused']:
+                file_rows.append((run_id, first_num, filename, None, None, None))
+        yield group_rows, file_rows
+
+def record_run(summary, catalog_path=DEFAULT_CATALOG_PATH, name=None):
+    """
+    run_pipeline/merge_shards 요약과 실행 매니페스트를 카탈로그에 한 트랜잭션으로 기록하고 실행 id 반환
+    기록하지 않는 실행(should_record)이면 None, 기록 시간은 summary['metrics']의 'catalog' 단계로 추가
+    name을 지정하지 않으면 build_name으로 입력 폴더에서 빌드 이름을 정함
+    기록에 실패해도 이미 끝난 처리 결과에는 영향이 없도록 예외를 올리지 않고 summary['catalog_error']에 담고 None 반환
+    """
+    if not should_record(summary):
+        return None
+    
+    metrics = summary.get('metrics')
+    with measure_stage(metrics, 'catalog') as stage:
+        group_sizes = summary['group_sizes']
+        run_row = {
+            'started_at': metrics['started_at'] if metrics else datetime.now().isoformat(timespec='seconds'),
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'build': name or build_name(summary['input_folders']),
+            'kind': 'shard_merge' if 'shard_count' in summary else 'local',
+            'input_folders': json.dumps(summary['input_folders'], ensure_ascii=False),
+            'output_folder': summary['output_folder'],
+            'output_mode': summary.get('output_mode'),
+            'large_group_rule': summary.get('large_group_rule'),
+            'file_count': summary['file_count'],
+            'parsed_count': summary.get('parsed_count'),
+            'failed_file_count': len(summary['failed_files']),
+            'group_count': summary['group_count'],
+            'missing_count': summary['missing_count'],
+            'missing_ranges': json.dumps(summary['missing_ranges']),
+            'outlier_count': len(summary['outlier_numbers']),
+            # 개수가 2개가 아닌 그룹 수 (중복 촬영 그룹은 duplicate_group_count에 따로 기록)
+            'abnormal_count': sum(count for key, count in group_sizes.items() if key != '2'),
+            'duplicate_group_count': summary['duplicate_group_count'],
+            'skipped_groups': summary.get('skipped_groups', 0),
+            'run_record_count': summary['run_record_count'],
+            'elapsed_seconds': summary.get('elapsed_seconds') or (metrics or {}).get('total_seconds'),
+            'run_manifest_path': summary['run_manifest_path'],
+        }
+        for key, column in GROUP_SIZE_COLUMNS.items():
+            run_row[column] = group_sizes.get(key, 0)
+        
+        run_id = None
+        try:
+            connection = open_catalog(catalog_path)
+            try:
+                # 한 트랜잭션으로 기록 (실패하면 이 실행의 행은 모두 취소)
+                with connection:
+                    columns = ', '.join(run_row)
+                    placeholders = ', '.join(f":{column}" for column in run_row)
+                    run_id = connection.execute(f"INSERT INTO runs ({columns}) VALUES ({placeholders})", run_row).lastrowid
+                    for group_rows, file_rows in iter_catalog_rows(run_id, iter_run_records(summary['run_manifest_path'])):
+                        connection.executemany("INSERT INTO groups VALUES (?, ?, ?, ?, ?, ?)", group_rows)
+                        connection.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)", file_rows)
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError) as e:
+            run_id = None
+            summary['catalog_error'] = f"{type(e).__name__}: {e}"
+        stage['files'] = summary['run_record_count']
+    
+    summary['catalog_path'] = catalog_path
+    summary['catalog_run_id'] = run_id
+    return run_id
+
+def parse_date(text):
+    """조회 기간 날짜 (YYYY-MM-DD 또는 YYYY-MM, YYYY-MM이면 그 달 1일)"""
+    for date_format in ("%Y-%m-%d", "%Y-%m"):
+        try:
+            return datetime.strptime(text, date_format).date().isoformat()
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"날짜 형식이 올바르지 않습니다: {text} (예: 2026-09-01, 2026-09)")
+
+def run_filters(since=None, until=None, build=None):
+    """runs 표 조회 조건 (since 이상 until 미만 날짜, build는 이름 일부로 검색) -> (WHERE 절, 인자 목록)"""
+    conditions = []
+    params = []
+    if since:
+        conditions.append("started_at >= ?")
+        params.append(since)
+    if until:
+        conditions.append("started_at < ?")
+        params.append(until)
+    if build:
+        conditions.append("build LIKE ?")
+        params.append(f"%{build}%")
+    return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+def size_column(group_size):
+    """그룹 개수(1~4 또는 5 이상은 'other')의 runs 표 열 이름"""
+    key = str(group_size)
+    if key not in GROUP_SIZE_COLUMNS:
+        key = 'other'
+    return GROUP_SIZE_COLUMNS[key]
+
+def query_runs(connection, since=None, until=None, build=None, group_size=None, min_ratio=None, limit=None):
+    """
+    실행 목록 (최근 실행부터)
+    group_size를 지정하면 전체 그룹 중 그 개수 그룹의 비율(%)을 'ratio'로 추가하고, min_ratio(%)보다 큰 실행만 반환
+    """
+    where, params = run_filters(since, until, build)
+    ratio = "NULL"
+    if group_size is not None:
+        ratio = f"ROUND(100.0 * {size_column(group_size)} / MAX(group_count, 1), 3)"
+        if min_ratio is not None:
+            where += (" AND " if where else " WHERE ") + f"{ratio} > ?"
+            params.append(min_ratio)
+    sql = (
+        f"SELECT id, started_at, build, output_folder, file_count, group_count, size_1, size_2, size_3, size_4, size_other, "
+        f"missing_count, missing_ranges, abnormal_count, duplicate_group_count, failed_file_count, elapsed_seconds, {ratio} AS ratio "
+        f"FROM runs{where} ORDER BY started_at DESC, id DESC"
+    )
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    
+    runs = []
+    for row in connection.execute(sql, params):
+        run = dict(row)
+        run['missing_ranges'] = format_ranges(json.loads(run['missing_ranges']), limit=20)
+        runs.append(run)
+    return runs
+
+def build_stats(connection, since=None, until=None, build=None):
+    """빌드별 통계 (실행 수, 마지막 실행, 그룹 개수별 비율(%)은 빌드의 마지막 실행 기준, 누락/비정상 그룹은 실행 평균)"""
+    where, params = run_filters(since, until, build)
+    size_ratios = ', '.join(
+        f"ROUND(100.0 * last.{column} / MAX(last.group_count, 1), 3) AS ratio_{key}"
+        for key, column in GROUP_SIZE_COLUMNS.items()
+    )
+    sql = (
+        f"WITH selected AS (SELECT * FROM runs{where}), "
+        f"last AS (SELECT * FROM selected WHERE id IN (SELECT MAX(id) FROM selected GROUP BY build)) "
+        f"SELECT selected.build, COUNT(*) AS run_count, MAX(selected.started_at) AS last_started_at, "
+        f"last.file_count, last.group_count, {size_ratios}, "
+        f"ROUND(AVG(selected.missing_count), 1) AS avg_missing_count, ROUND(AVG(selected.abnormal_count), 1) AS avg_abnormal_count, "
+        f"SUM(selected.duplicate_group_count) AS duplicate_group_count "
+        f"FROM selected JOIN last ON last.build = selected.build "
+        f"GROUP BY selected.build ORDER BY selected.build"
+    )
+    return [dict(row) for row in connection.execute(sql, params)]
+
+def query_groups(connection, group_size, since=None, until=None, build=None, limit=1000):
+    """여러 실행에서 그룹 개수가 group_size인 그룹 목록 (5 이상이면 5개 이상 전체), 파일명은 ;로 연결"""
+    where, params = run_filters(since, until, build)
+    size_condition = "groups.group_size >= ?" if size_column(group_size) == GROUP_SIZE_COLUMNS['other'] else "groups.group_size = ?"
+    sql = (
+        f"SELECT runs.id AS run_id, runs.started_at, runs.build, groups.first_num, groups.group_size, groups.status, groups.new_filename, "
+        f"(SELECT GROUP_CONCAT(source, ';') FROM files WHERE files.run_id = groups.run_id AND files.first_num = groups.first_num) AS sources "
+        f"FROM groups JOIN (SELECT * FROM runs{where}) AS runs ON runs.id = groups.run_id "
+        f"WHERE {size_condition} ORDER BY runs.started_at DESC, groups.first_num LIMIT ?"
+    )
+    params.append(5 if size_column(group_size) == GROUP_SIZE_COLUMNS['other'] else int(group_size))
+    params.append(limit)
+    return [dict(row) for row in connection.execute(sql, params)]
+
+def query_sql(catalog_path, sql, params=()):
+    """읽기 전용 연결로 임의의 SELECT 실행 (카탈로그를 수정하는 문장은 sqlite3 오류)"""
+    uri = "file:" + os.path.abspath(catalog_path).replace(os.sep, "/") + "?mode=ro"
+    connection = sqlite3.connect(uri, uri=True, timeout=CATALOG_TIMEOUT)
+    connection.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in connection.execute(sql, params)]
+    finally:
+        connection.close()
+
+def add_period_arguments(parser):
+    """조회 기간과 빌드 이름 인자"""
+    parser.add_argument("--since", type=parse_date, help="이 날짜부터 (YYYY-MM-DD 또는 YYYY-MM)")
+    parser.add_argument("--until", type=parse_date, help="이 날짜 전까지 (YYYY-MM-DD 또는 YYYY-MM, 예: 지난달이면 --since 2026-09 --until 2026-10)")
+    parser.add_argument("--days", type=int, help="최근 며칠 (--since 대신 사용)")
+    parser.add_argument("--build", help="빌드 이름 일부")
+
+def main(argv=None):
+    """명령줄 조회: 결과를 JSON으로 표준 출력에 기록"""
+    parser = argparse.ArgumentParser(description="처리한 빌드 카탈로그에서 빌드 간 통계를 조회합니다.")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_PATH, help=f"카탈로그 파일 (기본값: {DEFAULT_CATALOG_PATH})")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    runs_parser = subparsers.add_parser("runs", help="실행 목록 (--group-size와 --min-ratio로 그룹 비율 조건 지정)")
+    add_period_arguments(runs_parser)
+    runs_parser.add_argument("--group-size", type=int, choices=range(1, 6), help="비율을 계산할 그룹 개수 (5는 5개 이상)")
+    runs_parser.add_argument("--min-ratio", type=float, help="그룹 비율(%%)이 이 값보다 큰 실행만 (--group-size 필요)")
+    runs_parser.add_argument("--limit", type=int, help="최대 실행 수")
+    
+    stats_parser = subparsers.add_parser("stats", help="빌드별 통계")
+    add_period_arguments(stats_parser)
+    
+    groups_parser = subparsers.add_parser("groups", help="여러 실행에서 특정 개수의 그룹 목록")
+    add_period_arguments(groups_parser)
+    groups_parser.add_argument("--group-size", type=int, choices=range(1, 6), required=True, help="그룹 개수 (5는 5개 이상)")
+    groups_parser.add_argument("--limit", type=int, default=1000, help="최대 그룹 수 (기본값: 1000)")
+    
+    sql_parser = subparsers.add_parser("sql", help="읽기 전용 SQL 조회 (표: runs, groups, files)")
+    sql_parser.add_argument("query", help="SELECT 문")
+    args = parser.parse_args(argv)
+    
+    if args.command == "runs" and args.min_ratio is not None and args.group_size is None:
+        parser.error("--min-ratio에는 --group-size가 필요합니다.")
+    if not os.path.exists(args.catalog):
+        parser.error(f"카탈로그 파일이 없습니다: {args.catalog}")
+    
+    try:
+        if args.command == "sql":
+            result = query_sql(args.catalog, args.query)
+        else:
+            since = args.since
+            if args.days is not None:
+                since = (datetime.now() - timedelta(days=args.days)).isoformat(timespec='seconds')
+            connection = open_catalog(args.catalog)
+            try:
+                start = time.perf_counter()
+                if args.command == "runs":
+                    result = query_runs(connection, since, args.until, args.build, args.group_size, args.min_ratio, args.limit)
+                elif args.command == "stats":
+                    result = build_stats(connection, since, args.until, args.build)
+                else:
+                    result = query_groups(connection, args.group_size, since, args.until, args.build, args.limit)
+                sys.stderr.write(f"{len(result)}개 결과 ({time.perf_counter() - start:.3f}초)\n")
+            finally:
+                connection.close()
+    except sqlite3.Error as e:
+        sys.stderr.write(f"오류가 발생했습니다: {e}\n")
+        return 1
+    
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
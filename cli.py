@@ -0,0 +1,140 @@
+"""
+이미지 분류 도구 명령줄 실행 (Streamlit 없이 실행)
+
+예:
+    python cli.py C:/images/input -o C:/images/output --workers 16
+    python cli.py D:/build/session1 D:/build/session2 --recursive --dry-run
+    python cli.py D:/dumps/build_001.tar.gz -o D:/images/output
+    python cli.py //nas/build_042 -o //nas/sorted/build_042 --shard 0/4   (각 작업자가 0/4 ~ 3/4 실행)
+    python cli.py --merge-shards -o //nas/sorted/build_042
+    python cli.py C:/images/input -o C:/images/output --catalog D:/catalog.sqlite3   (기본값은 ~/.image_sorter/catalog.sqlite3, --no-catalog로 끔, 빌드 간 조회는 catalog.py)
+"""
+import argparse
+import json
+import os
+import sys
+
+from catalog import DEFAULT_CATALOG_PATH, record_run
+from pipeline import DEFAULT_JPEG_QUALITY, DEFAULT_MAX_WORKERS, DEFAULT_TRANSCODE_PROCESSES, LARGE_GROUP_RULES, NUMPY_AVAILABLE, OUTPUT_FORMATS, OUTPUT_MODES, PIL_AVAILABLE, PYARROW_AVAILABLE, is_archive, merge_shards, parse_layer_range, parse_shard, run_pipeline
+
+def build_parser():
+    """명령줄 인자 정의"""
+    parser = argparse.ArgumentParser(
+        description="숫자-Layer Shot_숫자-trigger_count 형식의 이미지를 분류하여 Deposition/Scanning/Unknown 폴더에 저장합니다.",
+    )
+    parser.add_argument("input_folders", nargs="*", help="입력 폴더 경로 (여러 개 지정 가능) 또는 ZIP/TAR 압축 파일 하나 (압축을 풀지 않고 읽음)")
+    parser.add_argument("-o", "--output", help="출력 폴더 경로 (--dry-run이 아니면 필수)")
+    parser.add_argument("-r", "--recursive", action="store_true", help="하위 폴더까지 탐색")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_MAX_WORKERS, help=f"복사 작업자 수 (기본값: {DEFAULT_MAX_WORKERS}, 1이면 순차 처리)")
+    parser.add_argument("-m", "--mode", choices=list(OUTPUT_MODES), default="copy", help="출력 방식 (기본값: copy)")
+    parser.add_argument("--incremental", action="store_true", help="출력 폴더의 매니페스트와 비교하여 변경된 그룹만 처리")
+    parser.add_argument("--fingerprint", action="store_true", help="내용 지문(크기+해시)으로 출력 폴더에 이미 같은 파일은 다시 쓰지 않고, 그룹 안 동일 파일(중복 촬영)을 비정상 그룹 로그에 기록")
+    parser.add_argument("--output-format", choices=list(OUTPUT_FORMATS), help="BMP/TIFF 원본을 변환하여 저장할 형식 (png/webp는 무손실, jpeg은 --jpeg-quality 품질, pillow 필요)")
+    parser.add_argument("--jpeg-quality", type=int, default=DEFAULT_JPEG_QUALITY, help=f"JPEG 변환 품질 1~95 (기본값: {DEFAULT_JPEG_QUALITY})")
+    parser.add_argument("--transcode-processes", type=int, default=DEFAULT_TRANSCODE_PROCESSES, help=f"이미지 변환 프로세스 수 (기본값: {DEFAULT_TRANSCODE_PROCESSES}, 1이면 순차 처리)")
+    parser.add_argument("--export-volume", action="store_true", help="처리 후 Deposition/Scanning을 레이어 번호 순 메모리 맵 배열(.npy)과 누락 레이어 마스크로 내보냄 (numpy, pillow 필요)")
+    parser.add_argument("--large-group-rule", choices=list(LARGE_GROUP_RULES), default="skip", help="5개 이상 그룹 처리 규칙 (skip: 저장하지 않고 미사용으로 기록, highest_pair: 가장 높은 두 숫자를 Deposition/Scanning으로 저장)")
+    parser.add_argument("--dry-run", action="store_true", help="분석만 하고 파일은 저장하지 않음 (-o를 지정하면 분류 계획을 기존 출력 폴더와 비교)")
+    parser.add_argument("--plan", metavar="PATH", help="그룹별 분류 계획(원본, 대상 폴더, 새 파일명, 사유, 미사용 파일)을 JSON Lines로 저장")
+    parser.add_argument("--numpy", action="store_true", help="NumPy 배열로 그룹 분석 (파일이 매우 많은 빌드용, numpy 필요)")
+    parser.add_argument("--layer-range", type=parse_layer_range, help="예상 레이어 범위 (예: 1-5000, 상한만은 -5000). 범위 밖 번호는 누락 계산에서 제외하고 이상값으로 표시")
+    parser.add_argument("--manifest-format", action="append", choices=["csv", "parquet"], default=[], help="실행 매니페스트(JSON Lines)를 CSV/Parquet으로도 저장 (여러 번 지정 가능, parquet은 pyarrow 필요)")
+    parser.add_argument("--shard", type=parse_shard, help="샤드 처리: '번호/개수'(예: 0/4)이면 레이어 번호를 개수로 나눈 나머지가 번호인 그룹만 공유 출력 폴더에 저장 (로그는 출력 폴더/shards/에 저장)")
+    parser.add_argument("--merge-shards", action="store_true", help="모든 샤드가 끝난 출력 폴더(-o)의 샤드별 로그와 누락 분석을 합쳐 한 번에 실행한 것과 같은 로그 작성 (입력 폴더는 지정하지 않음)")
+    parser.add_argument("--catalog", metavar="PATH", default=DEFAULT_CATALOG_PATH, help=f"실행 결과(그룹별/파일별)를 기록할 SQLite 카탈로그 (기본값: {DEFAULT_CATALOG_PATH}, 분석만 한 실행과 샤드 하나의 실행은 기록하지 않고 --merge-shards 결과를 기록, 조회는 catalog.py)")
+    parser.add_argument("--no-catalog", action="store_true", help="카탈로그에 기록하지 않음")
+    parser.add_argument("--track-memory", action="store_true", help="파일 저장 단계 중 최대 추가 메모리(tracemalloc)를 성능 기록에 추가 (저장이 느려지므로 측정할 때만 사용)")
+    parser.add_argument("--progress", action="store_true", help="복사 진행률을 표준 오류로 출력")
+    return parser
+
+def print_progress(done, total):
+    """복사 진행률을 표준 오류에 한 줄로 갱신 (표준 출력은 JSON 전용)"""
+    sys.stderr.write(f"\r{done}/{total} 파일 복사")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+def main(argv=None):
+    """명령줄 실행: 결과 요약을 JSON으로 표준 출력에 기록"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    if args.merge_shards:
+        if not args.output:
+            parser.error("--merge-shards에는 출력 폴더(-o)를 지정해야 합니다.")
+        if args.input_folders:
+            parser.error("--merge-shards에는 입력 폴더를 지정하지 않습니다.")
+        try:
+            summary = merge_shards(args.output, args.layer_range)
+            if not args.no_catalog:
+                record_run(summary, args.catalog)
+        except Exception as e:
+            sys.stderr.write(f"오류가 발생했습니다: {e}\n")
+            return 1
+        json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+        return 0
+    
+    if not args.input_folders:
+        parser.error("입력 폴더를 지정해야 합니다.")
+    if not args.dry_run and not args.output:
+        parser.error("--dry-run이 아니면 출력 폴더(-o)를 지정해야 합니다.")
+    missing_folders = [path for path in args.input_folders if not (os.path.isdir(path) or (os.path.isfile(path) and is_archive(path)))]
+    if missing_folders:
+        parser.error(f"입력 폴더 또는 압축 파일을 찾을 수 없습니다: {', '.join(missing_folders)}")
+    if len(args.input_folders) > 1 and any(is_archive(path) for path in args.input_folders):
+        parser.error("압축 파일 입력은 하나만 지정할 수 있으며 다른 입력 폴더와 함께 사용할 수 없습니다.")
+    if (args.incremental or args.fingerprint) and is_archive(args.input_folders[0]):
+        parser.error("압축 파일 입력에는 --incremental과 --fingerprint를 사용할 수 없습니다.")
+    if args.workers < 1:
+        parser.error("작업자 수는 1 이상이어야 합니다.")
+    if args.numpy and not NUMPY_AVAILABLE:
+        parser.error("--numpy에는 numpy가 필요합니다. (pip install numpy)")
+    if "parquet" in args.manifest_format and not PYARROW_AVAILABLE:
+        parser.error("--manifest-format parquet에는 pyarrow가 필요합니다. (pip install pyarrow)")
+    if args.output_format and not PIL_AVAILABLE:
+        parser.error("--output-format에는 pillow가 필요합니다. (pip install pillow)")
+    if not 1 <= args.jpeg_quality <= 95:
+        parser.error("JPEG 품질은 1~95 사이여야 합니다.")
+    if args.transcode_processes < 1:
+        parser.error("변환 프로세스 수는 1 이상이어야 합니다.")
+    if args.export_volume and not (NUMPY_AVAILABLE and PIL_AVAILABLE):
+        parser.error("--export-volume에는 numpy와 pillow가 필요합니다. (pip install numpy pillow)")
+    if args.shard and (args.incremental or args.export_volume):
+        parser.error("--shard에는 --incremental과 --export-volume을 사용할 수 없습니다.")
+    
+    try:
+        summary = run_pipeline(
+            args.input_folders,
+            args.output,
+            recursive=args.recursive,
+            max_workers=args.workers,
+            output_mode=args.mode,
+            incremental=args.incremental,
+            fingerprint=args.fingerprint,
+            output_format=args.output_format,
+            quality=args.jpeg_quality,
+            transcode_processes=args.transcode_processes,
+            export_volume=args.export_volume,
+            large_group_rule=args.large_group_rule,
+            plan_path=args.plan,
+            shard=args.shard,
+            track_memory=args.track_memory,
+            dry_run=args.dry_run,
+            expected_range=args.layer_range,
+            use_numpy=args.numpy,
+            manifest_formats=args.manifest_format,
+            progress_callback=print_progress if args.progress else None,
+        )
+        if not args.no_catalog:
+            record_run(summary, args.catalog)
+    except Exception as e:
+        sys.stderr.write(f"오류가 발생했습니다: {e}\n")
+        return 1
+    
+    json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
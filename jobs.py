@@ -0,0 +1,153 @@
+"""
+백그라운드 처리 작업 관리 (Streamlit 스크립트 실행과 분리된 스레드에서 파이프라인 실행)
+화면을 새로 고치거나 다른 위젯을 눌러도 작업은 계속되며, 작업 ID로 진행 상황을 다시 조회
+작업 목록은 프로세스 전체에서 공유하므로 작업마다 시작한 브라우저 세션의 토큰(owner)을 기록하고 그 세션에서만 조회/정리
+"""
+import os
+import threading
+import time
+import traceback
+import uuid
+
+from catalog import record_run
+from pipeline import DEFAULT_JPEG_QUALITY, process_uploaded_files, run_pipeline
+
+# 끝난 작업을 보관하는 개수 (초과하면 오래된 작업부터 정리하고 임시 파일 삭제)
+JOB_HISTORY_SIZE = 20
+
+# 프로세스 전체에서 공유하는 작업 목록 (Streamlit 세션이 바뀌어도 유지)
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def remove_temp_files(job):
+    """작업이 남긴 임시 파일 삭제"""
+    for path in job['temp_files']:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    job['temp_files'] = []
+
+def prune_jobs():
+    """끝난 작업이 JOB_HISTORY_SIZE를 넘으면 오래된 것부터 정리 (_jobs_lock 안에서 호출)"""
+    finished = sorted((job for job in _jobs.values() if job['status'] != 'running'), key=lambda job: job['started_at'])
+    for job in finished[:max(0, len(finished) - JOB_HISTORY_SIZE)]:
+        remove_temp_files(job)
+        del _jobs[job['id']]
+
+def start_job(kind, description, target, *args, owner=None, **kwargs):
+    """
+    target(job, *args, **kwargs)를 백그라운드 스레드에서 실행하고 작업 dict 반환
+    target의 반환값은 job['result']에, 예외는 job['error']에 기록
+    owner: 작업을 시작한 세션의 토큰 (find_jobs/discard_job에서 같은 토큰의 작업만 다룸)
+    """
+    job = {
+        'id': uuid.uuid4().hex,
+        'kind': kind,
+        'owner': owner,
+        'description': description,
+        'status': 'running',
+        'stage': None,
+        'done': 0,
+        'total': None,
+        'started_at': time.time(),
+        'finished_at': None,
+        'result': None,
+        'error': None,
+        'cancel_event': threading.Event(),
+        'temp_files': [],
+    }
+    
+    def run():
+        try:
+            job['result'] = target(job, *args, **kwargs)
+            job['status'] = 'cancelled' if job['cancel_event'].is_set() else 'done'
+        except Exception as e:
+            job['error'] = f"{type(e).__name__}: {e}"
+            job['traceback'] = traceback.format_exc()
+            job['status'] = 'failed'
+        finally:
+            job['finished_at'] = time.time()
+    
+    with _jobs_lock:
+        prune_jobs()
+        _jobs[job['id']] = job
+    threading.Thread(target=run, name=f"job-{kind}-{job['id'][:8]}", daemon=True).start()
+    return job
+
+def set_job_stage(job, stage, done=0, total=None):
+    """작업의 현재 단계와 진행 수 갱신 (파이프라인의 stage_callback으로 사용)"""
+    job['stage'] = stage
+    job['done'] = done
+    job['total'] = total
+
+def cancel_job(job_id):
+    """작업 취소 요청 (진행 중인 그룹 묶음이 끝나면 멈춤), 요청했으면 True"""
+    job = get_job(job_id)
+    if job is None or job['status'] != 'running':
+        return False
+    job['cancel_event'].set()
+    return True
+
+def get_job(job_id, owner=None):
+    """작업 ID로 작업 dict 조회 (없거나 owner를 지정했는데 다른 세션의 작업이면 None)"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None or (owner is not None and job['owner'] != owner):
+        return None
+    return job
+
+def find_jobs(kind=None, running_only=False, owner=None):
+    """종류별 작업 목록 (최근 시작한 순, owner를 지정하면 그 세션의 작업만)"""
+    with _jobs_lock:
+        jobs = [
+            job for job in _jobs.values()
+            if (kind is None or job['kind'] == kind) and (not running_only or job['status'] == 'running') and (owner is None or job['owner'] == owner)
+        ]
+    return sorted(jobs, key=lambda job: job['started_at'], reverse=True)
+
+def discard_job(job_id, owner=None):
+    """끝난 작업을 목록에서 지우고 임시 파일 삭제 (실행 중이거나 owner를 지정했는데 다른 세션의 작업이면 그대로 두고 False)"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None or job['status'] == 'running' or (owner is not None and job['owner'] != owner):
+            return False
+        remove_temp_files(job)
+        del _jobs[job_id]
+    return True
+
+def run_local_job(job, input_folders, output_folder, catalog_path=None, **options):
+    """로컬 폴더 처리 작업 (options는 run_pipeline에 그대로 전달, catalog_path를 지정하면 끝난 실행을 카탈로그에 기록)"""
+    summary = run_pipeline(
+        input_folders,
+        output_folder,
+        stage_callback=lambda stage, done, total: set_job_stage(job, stage, done, total),
+        should_stop=job['cancel_event'].is_set,
+        **options
+    )
+    if catalog_path:
+        set_job_stage(job, 'catalog', 0, None)
+        record_run(summary, catalog_path)
+    return summary
+
+def run_upload_job(job, uploaded_files, expected_range=None, output_format=None, quality=DEFAULT_JPEG_QUALITY, large_group_rule=None):
+    """
+    업로드 파일 처리 작업, 결과 ZIP은 작업을 정리할 때 삭제
+    실패하면 예외로 올려 작업 상태에 반영하고, 취소되면 None 반환
+    """
+    zip_path, results, error = process_uploaded_files(
+        uploaded_files,
+        expected_range,
+        stage_callback=lambda stage, done, total: set_job_stage(job, stage, done, total),
+        should_stop=job['cancel_event'].is_set,
+        output_format=output_format,
+        quality=quality,
+        large_group_rule=large_group_rule,
+    )
+    if zip_path:
+        job['temp_files'].append(zip_path)
+    if job['cancel_event'].is_set():
+        return None
+    if error:
+        raise RuntimeError(error)
+    return {'zip_path': zip_path, **results}
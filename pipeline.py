@@ -0,0 +1,2634 @@
+"""
+이미지 분류 파이프라인 (Streamlit 없이 사용 가능한 핵심 로직)
+파일 탐색 -> 파일명 파싱 -> 누락 값 탐지 -> 그룹 분석 -> 분류 저장 -> 로그 생성
+"""
+import os
+import re
+import sys
+import csv
+import ctypes
+import errno
+import hashlib
+import heapq
+import io
+import json
+import select
+import struct
+import tarfile
+import time
+import tracemalloc
+import shutil
+import tempfile
+import zipfile
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import ExitStack, contextmanager, nullcontext
+from datetime import datetime
+from functools import partial
+from itertools import islice
+
+# NumPy는 대용량 빌드의 배열 기반 그룹 분석에만 사용 (선택)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# 실행 매니페스트 Parquet 내보내기에만 사용 (선택)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# 출력 이미지 변환(PNG/WebP/JPEG)에만 사용 (선택)
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# 최대 메모리(RSS) 확인은 resource가 있는 환경(Unix)에서만 사용 가능
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+# reflink(FICLONE)는 fcntl이 있는 환경(Linux)에서만 사용 가능
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# 복사 작업자 수 기본값 (NAS 등 I/O 대기 시간이 긴 저장소 기준)
+DEFAULT_MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# 지원 이미지 확장자
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif'}
+
+# 입력으로 바로 읽을 수 있는 압축 파일 (압축을 풀지 않고 항목 이름으로 분석)
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+# 압축된 TAR은 임의 위치를 읽을 수 없어 항목 순서대로 한 번에 읽음
+# (분석할 때 항목 목록을 읽으며 한 번, 저장할 때 처음부터 스트림으로 한 번 더, 전체를 두 번 풂)
+STREAMED_ARCHIVE_EXTENSIONS = ('.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# 탐색 중 진행 상황을 화면에 갱신하는 파일 수 간격
+DISCOVERY_REPORT_INTERVAL = 1000
+
+# 분석 결과 캐시 한도: 최근 분석 결과 수, 캐시 전체 파일 수 (이보다 큰 분석 결과는 캐시하지 않음)
+ANALYSIS_CACHE_ENTRIES = 4
+ANALYSIS_CACHE_MAX_FILES = 2000000
+
+# 이미 압축된 형식은 ZIP에 다시 압축하지 않고 그대로 저장
+STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+# ZIP 기록 시 한 번에 읽는 크기
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+# 내용 지문(크기 + 해시) 계산 시 한 번에 읽는 크기
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+
+# 출력 방식: 복사 / 하드링크 / 리플링크(CoW 복제) / 심볼릭 링크
+OUTPUT_MODES = {
+    'copy': "복사",
+    'hardlink': "하드링크",
+    'reflink': "리플링크 (CoW 복제)",
+    'symlink': "심볼릭 링크",
+}
+
+# 출력 이미지 변환 형식 (압축하지 않은 BMP/TIFF 원본만 변환하고 나머지는 그대로 배치)
+OUTPUT_FORMATS = {
+    'png': "PNG (무손실)",
+    'webp': "WebP (무손실)",
+    'jpeg': "JPEG (품질 지정)",
+}
+OUTPUT_FORMAT_EXTENSIONS = {'png': '.png', 'webp': '.webp', 'jpeg': '.jpg'}
+TRANSCODE_SOURCE_EXTENSIONS = {'.bmp', '.tiff'}
+
+# JPEG 변환 품질 기본값 (1~95)
+DEFAULT_JPEG_QUALITY = 95
+
+# 변환 프로세스 수 기본값 (인코딩은 CPU 위주)
+DEFAULT_TRANSCODE_PROCESSES = os.cpu_count() or 1
+
+# 볼륨 스택 내보내기: 폴더별 (레이어 수, 높이, 너비[, 채널]) 배열(.npy)과 레이어별 존재 마스크, 색인 파일
+VOLUME_FOLDERS = ('Deposition', 'Scanning')
+VOLUME_INDEX_FILENAME = "volume_index.json"
+
+# 볼륨 디코딩 작업 하나가 처리하는 레이어 수
+VOLUME_CHUNK_LAYERS = 64
+
+# 이미지 모드별 (dtype, 채널 모양), 그 외 모드는 RGB로 변환
+VOLUME_MODES = {
+    'L': ('uint8', ()),
+    'I;16': ('uint16', ()),
+    'RGB': ('uint8', (3,)),
+    'RGBA': ('uint8', (4,)),
+}
+
+# 샤드 처리: 샤드별 로그와 실행 매니페스트는 출력 폴더의 shards/shard_번호_of_개수/에 저장하고 merge_shards로 합침
+SHARD_FOLDER = "shards"
+SHARD_SUMMARY_FILENAME = "shard_summary.json"
+
+# 증분 처리용 매니페스트 파일명 (출력 폴더에 저장)
+MANIFEST_FILENAME = "processing_manifest.json"
+MANIFEST_VERSION = 2
+
+# 실행 매니페스트: 그룹별 처리 결과를 처리하는 대로 JSON Lines로 기록 (CSV/Parquet은 선택)
+RUN_MANIFEST_NAME = "run_manifest"
+RUN_MANIFEST_FORMATS = {
+    'jsonl': "JSON Lines",
+    'csv': "CSV",
+    'parquet': "Parquet",
+}
+
+# CSV/Parquet 열 (폴더별 원본/저장 위치/배치 방식을 열로 펼침)
+RUN_MANIFEST_COLUMNS = ['first_num', 'group_size', 'status', 'new_filename'] + [
+    f"{folder}_{field}" for folder in ('deposition', 'scanning', 'unknown') for field in ('source', 'destination', 'mode')
+] + ['unused', 'duplicates']
+
+# 한 번에 배치하고 매니페스트에 기록하는 그룹 수 (처리 결과를 전부 메모리에 모으지 않도록)
+RUN_RECORD_CHUNK = 1000
+
+# 다른 단계 시간에 포함되어 전체 소요 시간 합계에서 빼는 단계 (동일 파일 확인, 이미지 변환 인코딩 시간 합계)
+NESTED_STAGES = {'fingerprint', 'transcode'}
+
+# 감시 모드 기본값: 폴더 확인 간격(초), 파일 쓰기 완료 판단 대기(초), 새 파일이 없을 때 종료까지 대기(초)
+WATCH_POLL_INTERVAL = 1.0
+WATCH_SETTLE_TIME = 2.0
+WATCH_IDLE_TIMEOUT = 600
+
+# inotify 이벤트 (Linux)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+INOTIFY_EVENT = struct.Struct('iIII')
+
+# Linux ioctl FICLONE 번호
+FICLONE = 0x40049409
+
+class ProcessingCancelled(Exception):
+    """처리 중 취소 요청으로 중단된 경우"""
+
+def parse_filename(filename):
+    """
+    파일명을 파싱하여 (앞_숫자, 뒤_숫자) 형태로 반환
+    예: "90-Layer Shot_215-trigger_count.jpg" -> ("90", "215")
+    """
+    # 하위 폴더 경로와 확장자 제거
+    name_without_ext = os.path.splitext(os.path.basename(filename))[0]
+    
+    # 패턴: 숫자-Layer Shot_숫자-trigger_count
+    pattern = r'(\d+)-Layer Shot_(\d+)-trigger_count'
+    match = re.match(pattern, name_without_ext)
+    
+    if match:
+        first_num = match.group(1)
+        second_num = match.group(2)
+        return (int(first_num), int(second_num))
+    return None
+
+def is_image_file(filename):
+    """지원하는 이미지 확장자인지 확인"""
+    return os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS
+
+def iter_image_files(folder_path, recursive=False, exclude_dirs=()):
+    """
+    os.scandir로 이미지 파일을 찾는 즉시 하나씩 반환 (폴더 기준 상대 경로)
+    recursive이면 하위 폴더까지 탐색, exclude_dirs의 폴더와 심볼릭 링크 폴더는 제외
+    """
+    excluded = {os.path.normcase(os.path.abspath(path)) for path in exclude_dirs}
+    pending_dirs = [""]
+    
+    while pending_dirs:
+        rel_dir = pending_dirs.pop()
+        with os.scandir(os.path.join(folder_path, rel_dir)) as entries:
+            for entry in entries:
+                rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive and os.path.normcase(os.path.abspath(entry.path)) not in excluded:
+                        pending_dirs.append(rel_path)
+                elif is_image_file(entry.name) and entry.is_file():
+                    yield rel_path
+
+def is_archive(path):
+    """입력으로 읽을 수 있는 ZIP/TAR 압축 파일인지 확장자로 확인"""
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+def archive_stem(path):
+    """압축 파일명에서 압축 확장자를 뺀 이름 (예: build_001.tar.gz -> build_001)"""
+    name = os.path.basename(os.path.normpath(path))
+    for ext in sorted(ARCHIVE_EXTENSIONS, key=len, reverse=True):
+        if name.lower().endswith(ext):
+            return name[:-len(ext)]
+    return name
+
+def open_archive(source, name=None):
+    """
+    ZIP/TAR 압축 파일(경로 또는 파일 객체)을 열고 (압축 파일 객체, {항목 이름: (열기 함수, 크기)}) 반환
+    항목 이름과 크기만 읽으며, 내용은 열기 함수를 호출할 때 압축을 풀어 읽음 (항목 순서는 압축 파일 안의 순서)
+    압축된 TAR은 항목 목록을 읽는 것만으로 전체를 한 번 풀고, 그 뒤 항목을 읽으면 처음으로 되감아 다시 풂
+    압축 파일 객체는 사용 후 호출한 쪽에서 닫음
+    """
+    name = name or (source if isinstance(source, str) else getattr(source, 'name', ''))
+    if name.lower().endswith('.zip'):
+        archive = zipfile.ZipFile(source)
+        members = {
+            info.filename: (partial(archive.open, info), info.file_size)
+            for info in archive.infolist()
+            if not info.is_dir() and is_image_file(info.filename)
+        }
+    else:
+        archive = tarfile.open(source, 'r:*') if isinstance(source, str) else tarfile.open(fileobj=source, mode='r:*')
+        members = {
+            member.name: (partial(archive.extractfile, member), member.size)
+            for member in archive
+            if member.isfile() and is_image_file(member.name)
+        }
+    return archive, members
+
+def open_source(source):
+    """
+    원본 열기 (with 문으로 사용): 업로드 파일 객체는 처음으로 되감아 그대로, 압축 파일 항목(열기 함수)은 압축을 풀며 읽는 파일 객체
+    """
+    if callable(source):
+        return source()
+    source.seek(0)
+    return nullcontext(source)
+
+def get_image_files(folder_path):
+    """이미지 폴더에서 이미지 파일만 가져오기"""
+    return list(iter_image_files(folder_path))
+
+def split_input_folders(text):
+    """';'로 구분된 입력 폴더 경로 목록"""
+    return [path.strip() for path in text.split(';') if path.strip()]
+
+def get_input_base(input_folders):
+    """
+    여러 입력 폴더의 공통 기준 폴더
+    파일 경로는 이 폴더 기준 상대 경로로 다루며, 공통 경로가 없으면(다른 드라이브) 빈 문자열로 절대 경로 사용
+    """
+    if len(input_folders) == 1:
+        return input_folders[0]
+    try:
+        return os.path.commonpath([os.path.abspath(path) for path in input_folders])
+    except ValueError:
+        return ""
+
+def iter_input_files(input_folders, recursive=False, exclude_dirs=()):
+    """여러 입력 폴더의 이미지 파일을 get_input_base 기준 경로로 차례대로 반환"""
+    base = get_input_base(input_folders)
+    
+    for folder in input_folders:
+        if len(input_folders) == 1:
+            prefix = ""
+        elif base:
+            prefix = os.path.relpath(os.path.abspath(folder), base)
+        else:
+            prefix = os.path.abspath(folder)
+        
+        for rel_path in iter_image_files(folder, recursive, exclude_dirs):
+            yield os.path.join(prefix, rel_path) if prefix not in ("", os.curdir) else rel_path
+
+def archive_input(input_folders):
+    """입력이 압축 파일 하나이면 그 경로, 폴더이면 None (압축 파일은 다른 입력과 함께 사용할 수 없음)"""
+    archives = [path for path in input_folders if os.path.isfile(path) and is_archive(path)]
+    if not archives:
+        return None
+    if len(input_folders) > 1:
+        raise ValueError("압축 파일 입력은 하나만 지정할 수 있으며 다른 입력 폴더와 함께 사용할 수 없습니다.")
+    return archives[0]
+
+def folder_state_key(input_folders, recursive=False, exclude_dirs=()):
+    """
+    입력 폴더 상태 키: 폴더별 (경로, 수정 시각, 이미지 파일 수), recursive이면 하위 폴더도 포함
+    파일이 추가/삭제/이름 변경되면 폴더 수정 시각이나 파일 수가 바뀌므로 분석 결과 캐시의 무효화 기준으로 사용
+    (파일명만 분석하므로 파일 내용이 바뀌는 것은 상관없음, 압축 파일 입력은 (경로, 수정 시각, 크기))
+    """
+    source_archive = archive_input(input_folders)
+    if source_archive:
+        # 압축 파일은 경로, 수정 시각, 크기로 판단
+        stat = os.stat(source_archive)
+        return ((os.path.abspath(source_archive), stat.st_mtime_ns, stat.st_size),)
+    
+    excluded = {os.path.normcase(os.path.abspath(path)) for path in exclude_dirs}
+    key = []
+    
+    for folder in input_folders:
+        pending_dirs = [os.path.abspath(folder)]
+        while pending_dirs:
+            dir_path = pending_dirs.pop()
+            file_count = 0
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and os.path.normcase(os.path.abspath(entry.path)) not in excluded:
+                            pending_dirs.append(entry.path)
+                    elif is_image_file(entry.name) and entry.is_file():
+                        file_count += 1
+            key.append((dir_path, os.stat(dir_path).st_mtime_ns, file_count))
+    
+    return tuple(key)
+
+def iter_parsed_files(image_files, timing=None):
+    """
+    탐색 중인 파일을 바로 파싱하여 (파일 경로, 파싱 결과 또는 None) 반환
+    timing dict를 넘기면 파싱에 걸린 시간을 timing['seconds']에 더함 (탐색 시간과 구분용)
+    """
+    if timing is None:
+        for filename in image_files:
+            yield filename, parse_filename(filename)
+        return
+    
+    for filename in image_files:
+        start = time.perf_counter()
+        result = parse_filename(filename)
+        timing['seconds'] = timing.get('seconds', 0.0) + time.perf_counter() - start
+        yield filename, result
+
+def split_outliers(numbers, expected_range=None):
+    """
+    예상 레이어 범위 (처음, 마지막) 밖의 번호를 이상값으로 분리
+    (범위 안 번호 집합, 정렬된 이상값 목록) 반환, 범위의 한쪽은 None으로 비워둘 수 있음
+    """
+    first, last = expected_range or (None, None)
+    existing = set()
+    outliers = set()
+    for number in numbers:
+        if (first is not None and number < first) or (last is not None and number > last):
+            outliers.add(number)
+        else:
+            existing.add(number)
+    return existing, sorted(outliers)
+
+def parse_layer_range(text):
+    """
+    '1-5000' 형식의 예상 레이어 범위를 (처음, 마지막)으로 변환
+    '-5000'은 상한만, '100-'은 하한만 지정
+    """
+    first_text, separator, last_text = text.strip().partition('-')
+    if not separator:
+        raise ValueError(f"레이어 범위 형식이 올바르지 않습니다: {text}")
+    first = int(first_text) if first_text.strip() else None
+    last = int(last_text) if last_text.strip() else None
+    if first is not None and last is not None and first > last:
+        raise ValueError(f"레이어 범위의 시작이 끝보다 큽니다: {text}")
+    return first, last
+
+def parse_shard(text):
+    """
+    '번호/개수' 형식(예: '0/4')의 샤드 지정을 (번호, 개수)로 변환 (번호는 0부터 개수-1까지)
+    """
+    index_text, separator, count_text = text.strip().partition('/')
+    if not separator:
+        raise ValueError(f"샤드 형식이 올바르지 않습니다 (예: 0/4): {text}")
+    index, count = int(index_text), int(count_text)
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"샤드 번호는 0부터 개수-1 사이여야 합니다: {text}")
+    return index, count
+
+def shard_of(first_num, shard_count):
+    """앞 숫자(레이어 번호)가 속한 샤드 번호 (레이어 번호를 샤드 개수로 나눈 나머지, 같은 그룹은 항상 같은 샤드)"""
+    return first_num % shard_count
+
+def filter_shard_groups(groups, shard):
+    """{앞 숫자: 그룹 항목} 중 shard=(번호, 개수)에 속한 그룹만 반환"""
+    index, count = shard
+    return {first_num: items for first_num, items in groups.items() if shard_of(first_num, count) == index}
+
+def shard_log_folder(output_folder, shard):
+    """샤드별 로그와 실행 매니페스트를 저장하는 폴더 (출력 폴더/shards/shard_번호_of_개수)"""
+    index, count = shard
+    return os.path.join(output_folder, SHARD_FOLDER, f"shard_{index}_of_{count}")
+
+def find_missing_ranges(numbers, expected_range=None):
+    """
+    정렬한 번호 사이의 빈 구간을 [(시작, 끝)] 목록으로 반환 (O(n log n), 누락 개수와 무관한 메모리)
+    expected_range를 지정하면 범위 밖 번호는 무시하고, 범위 끝까지 없는 번호도 누락으로 포함
+    """
+    first, last = expected_range or (None, None)
+    existing, _ = split_outliers(numbers, expected_range)
+    if not existing and last is None:
+        return []
+    
+    ranges = []
+    previous = (first if first is not None else 1) - 1
+    for number in sorted(existing):
+        if number > previous + 1:
+            ranges.append((previous + 1, number - 1))
+        previous = max(previous, number)
+    if last is not None and last > previous:
+        ranges.append((previous + 1, last))
+    
+    return ranges
+
+def count_missing(missing_ranges):
+    """누락 구간 목록의 전체 누락 개수"""
+    return sum(end - start + 1 for start, end in missing_ranges)
+
+def format_ranges(ranges, limit=None):
+    """누락 구간을 '120-180, 442' 형태 문자열로 변환 (limit개 구간까지만 표시)"""
+    shown = ranges if limit is None else ranges[:limit]
+    text = ', '.join(str(start) if start == end else f"{start}-{end}" for start, end in shown)
+    if limit is not None and len(ranges) > limit:
+        text += f" ... 외 {len(ranges) - limit}개 구간"
+    return text
+
+def find_missing_numbers(numbers, expected_range=None):
+    """
+    최대값을 기준으로 누락된 숫자 찾기
+    누락 구간을 하나씩 펼친 목록이므로 누락이 많을 수 있으면 find_missing_ranges 사용
+    """
+    return [number for start, end in find_missing_ranges(numbers, expected_range) for number in range(start, end + 1)]
+
+def group_by_first_number(parsed_files):
+    """
+    앞 숫자를 기준으로 그룹핑
+    그룹은 앞 숫자(레이어 번호) 순이므로 처리 로그와 실행 매니페스트는 파일 탐색 순서와 상관없이 레이어 순 (샤드를 합친 결과와 같음)
+    """
+    groups = defaultdict(list)
+    
+    for filename, (first_num, second_num) in parsed_files.items():
+        groups[first_num].append((second_num, filename))
+    
+    # 각 그룹 내에서 두번째 숫자로 정렬
+    for key in groups:
+        groups[key].sort()
+    
+    return dict(sorted(groups.items()))
+
+def analyze_groups(groups):
+    """그룹별 개수 분석"""
+    group_analysis = {
+        1: [],
+        2: [],
+        3: [],
+        4: [],
+        'other': []
+    }
+    
+    for first_num, items in groups.items():
+        count = len(items)
+        if count in [1, 2, 3, 4]:
+            group_analysis[count].append(first_num)
+        else:
+            group_analysis['other'].append(first_num)
+    
+    return group_analysis
+
+def build_group_arrays(parsed_items):
+    """
+    (파일명, (앞_숫자, 뒤_숫자)) 목록을 NumPy 배열 기반 그룹 구조로 변환 (NumPy 필요)
+    파일명은 표에 한 번만 저장하고, (앞_숫자, 뒤_숫자) 정렬은 lexsort 한 번으로 처리
+    그룹 순서(앞 숫자 순)와 그룹 내 순서는 group_by_first_number와 같음
+    """
+    filenames = []
+    first_values = array('q')
+    second_values = array('q')
+    for filename, (first_num, second_num) in parsed_items:
+        filenames.append(filename)
+        first_values.append(first_num)
+        second_values.append(second_num)
+    
+    first_nums = np.array(first_values, dtype=np.int64)
+    second_nums = np.array(second_values, dtype=np.int64)
+    
+    # 앞 숫자, 뒤 숫자 순으로 정렬 (lexsort는 마지막 키가 우선)
+    order = np.lexsort((second_nums, first_nums))
+    sorted_first = first_nums[order]
+    sorted_second = second_nums[order]
+    
+    # 앞/뒤 숫자가 모두 같은 파일(확장자만 다른 경우 등)은 파일명 순으로 정렬하여 기존 방식과 맞춤
+    if len(order) > 1:
+        ties = np.flatnonzero((sorted_first[1:] == sorted_first[:-1]) & (sorted_second[1:] == sorted_second[:-1]))
+        run_start = None
+        for position, next_position in zip(ties, list(ties[1:]) + [None]):
+            if run_start is None:
+                run_start = position
+            if next_position != position + 1:
+                run = order[run_start:position + 2]
+                order[run_start:position + 2] = sorted(run, key=filenames.__getitem__)
+                run_start = None
+    
+    group_starts = np.flatnonzero(np.r_[True, sorted_first[1:] != sorted_first[:-1]]) if len(order) else np.empty(0, dtype=np.int64)
+    group_sizes = np.diff(np.r_[group_starts, len(order)])
+    
+    return {
+        'filenames': filenames,
+        'file_index': order,
+        'first_nums': sorted_first,
+        'second_nums': sorted_second,
+        'group_first_nums': sorted_first[group_starts],
+        'group_starts': group_starts,
+        'group_sizes': group_sizes,
+    }
+
+def analyze_group_arrays(group_arrays):
+    """배열 기반 그룹별 개수 분석 (analyze_groups와 같은 결과)"""
+    sizes = group_arrays['group_sizes']
+    first_nums = group_arrays['group_first_nums']
+    
+    group_analysis = {count: first_nums[sizes == count].tolist() for count in (1, 2, 3, 4)}
+    group_analysis['other'] = first_nums[sizes > 4].tolist()
+    return group_analysis
+
+def group_arrays_to_groups(group_arrays, first_nums=None):
+    """
+    배열 기반 그룹 구조를 group_by_first_number 형태의 dict로 변환
+    first_nums를 지정하면 해당 그룹만 변환
+    """
+    filenames = group_arrays['filenames']
+    file_index = group_arrays['file_index'].tolist()
+    second_nums = group_arrays['second_nums'].tolist()
+    selected = None if first_nums is None else set(first_nums)
+    
+    groups = {}
+    for first_num, start, size in zip(group_arrays['group_first_nums'].tolist(), group_arrays['group_starts'].tolist(), group_arrays['group_sizes'].tolist()):
+        if selected is not None and first_num not in selected:
+            continue
+        groups[first_num] = [(second_nums[position], filenames[file_index[position]]) for position in range(start, start + size)]
+    return groups
+
+def reflink_file(src, dst):
+    """파일시스템의 CoW 복제(reflink/clonefile)로 파일 생성, 지원하지 않으면 OSError"""
+    if sys.platform == "darwin":
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), dst)
+        return
+    
+    if not FCNTL_AVAILABLE:
+        raise OSError(errno.EOPNOTSUPP, "reflink를 지원하지 않는 환경입니다", dst)
+    
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+def place_file(src, dst, output_mode='copy'):
+    """
+    출력 방식에 따라 파일 배치, 실제로 사용된 방식을 반환
+    링크/복제가 실패하면 (다른 장치, 미지원 파일시스템 등) 복사로 대체
+    """
+    # 기존 대상이 링크일 경우 원본에 덮어쓰지 않도록 먼저 제거
+    if os.path.lexists(dst):
+        os.remove(dst)
+    
+    if output_mode != 'copy':
+        try:
+            if output_mode == 'hardlink':
+                os.link(src, dst)
+            elif output_mode == 'reflink':
+                reflink_file(src, dst)
+            elif output_mode == 'symlink':
+                os.symlink(os.path.abspath(src), dst)
+            else:
+                raise ValueError(f"알 수 없는 출력 방식: {output_mode}")
+            return output_mode
+        except OSError:
+            pass
+    
+    shutil.copy2(src, dst)
+    return 'copy'
+
+def resolve_output_mode(input_folder, output_folder, output_mode):
+    """하드링크/리플링크는 입력과 출력이 다른 장치에 있으면 복사로 대체"""
+    if output_mode in ('hardlink', 'reflink'):
+        try:
+            if os.stat(input_folder).st_dev != os.stat(output_folder).st_dev:
+                return 'copy'
+        except OSError:
+            return 'copy'
+    return output_mode
+
+def file_digest(path, chunk_size=FINGERPRINT_CHUNK_SIZE):
+    """파일 내용을 chunk_size씩 읽어 계산한 BLAKE2b 해시 (16진수 문자열)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def destination_matches(src, dst, output_mode='copy', src_digest=None):
+    """
+    대상 파일이 이미 원본과 같은지 확인 (크기를 먼저 비교하고 같을 때만 해시 비교)
+    심볼릭 링크 방식은 같은 원본을 가리키는 링크여야 하며, 그 외 방식은 같은 파일(하드링크)이거나 내용이 같으면 일치
+    """
+    if not os.path.lexists(dst):
+        return False
+    if output_mode == 'symlink':
+        return os.path.islink(dst) and os.readlink(dst) == os.path.abspath(src)
+    if os.path.islink(dst) or not os.path.isfile(dst):
+        return False
+    if os.path.samefile(src, dst):
+        return True
+    if os.stat(src).st_size != os.stat(dst).st_size:
+        return False
+    return (src_digest or file_digest(src)) == file_digest(dst)
+
+def place_file_sized(src, dst, output_mode='copy', skip_unchanged=False, src_digest=None):
+    """
+    place_file 실행 후 (실제 사용 방식, 원본 크기) 반환
+    skip_unchanged이면 대상이 이미 원본과 같을 때 쓰지 않고 'unchanged' 반환
+    """
+    if skip_unchanged and destination_matches(src, dst, output_mode, src_digest):
+        return 'unchanged', os.stat(src).st_size
+    used_mode = place_file(src, dst, output_mode)
+    return used_mode, os.stat(src).st_size
+
+def place_files(copy_tasks, output_mode='copy', max_workers=None, progress_callback=None, stats=None, skip_unchanged=False, digests=None):
+    """
+    (원본, 대상) 경로 목록을 작업자 풀로 배치하고 작업별 실제 사용 방식 목록을 반환
+    max_workers가 1이면 순차 처리, progress_callback(완료 수, 전체 수)는 호출한 스레드에서 실행
+    stats dict를 넘기면 처리한 파일 수('files')와 바이트('bytes'), 건너뛴 파일 수('unchanged')를 더함
+    skip_unchanged이면 대상이 이미 원본과 같은 파일은 다시 쓰지 않음 (digests: 미리 계산한 {원본 경로: 해시})
+    """
+    total = len(copy_tasks)
+    used_modes = [None] * total
+    total_bytes = 0
+    digests = digests or {}
+    if progress_callback:
+        progress_callback(0, total)
+    if stats is not None:
+        stats['files'] = (stats.get('files') or 0) + total
+        stats['bytes'] = stats.get('bytes') or 0
+        stats['unchanged'] = stats.get('unchanged') or 0
+    if total == 0:
+        return used_modes
+    
+    if max_workers is None:
+        max_workers = DEFAULT_MAX_WORKERS
+    
+    if max_workers <= 1:
+        for index, (src, dst) in enumerate(copy_tasks):
+            used_modes[index], size = place_file_sized(src, dst, output_mode, skip_unchanged, digests.get(src))
+            total_bytes += size
+            if progress_callback:
+                progress_callback(index + 1, total)
+        if stats is not None:
+            stats['bytes'] += total_bytes
+            stats['unchanged'] += used_modes.count('unchanged')
+        return used_modes
+    
+    # 대기 중인 작업 수를 제한하여 대량 파일에서도 메모리 사용량 유지
+    max_pending = max_workers * 4
+    done = 0
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+        
+        def collect():
+            nonlocal done, total_bytes
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                used_modes[pending.pop(future)], size = future.result()
+                total_bytes += size
+                done += 1
+            if progress_callback:
+                progress_callback(done, total)
+        
+        try:
+            for index, (src, dst) in enumerate(copy_tasks):
+                pending[executor.submit(place_file_sized, src, dst, output_mode, skip_unchanged, digests.get(src))] = index
+                if len(pending) >= max_pending:
+                    collect()
+            while pending:
+                collect()
+        except BaseException:
+            # 첫 오류에서 남은 작업 취소 후 예외 전달
+            for future in pending:
+                future.cancel()
+            raise
+    
+    if stats is not None:
+        stats['bytes'] += total_bytes
+        stats['unchanged'] += used_modes.count('unchanged')
+    return used_modes
+
+def find_duplicate_shots(input_folder, groups, max_workers=None):
+    """
+    그룹 안에서 내용이 같은 파일(카메라가 같은 장면을 두 번 촬영) 찾기
+    그룹 안에서 크기가 같은 파일만 해시를 계산하며 ({앞 숫자: [[같은 파일명 목록]]}, {원본 경로: 해시}) 반환
+    """
+    if max_workers is None:
+        max_workers = DEFAULT_MAX_WORKERS
+    
+    members = [(first_num, filename) for first_num, items in groups.items() if len(items) > 1 for _, filename in items]
+    paths = [os.path.join(input_folder, filename) for _, filename in members]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        sizes = list(executor.map(os.path.getsize, paths))
+        size_counts = defaultdict(int)
+        for (first_num, _), size in zip(members, sizes):
+            size_counts[(first_num, size)] += 1
+        candidates = [index for index, ((first_num, _), size) in enumerate(zip(members, sizes)) if size_counts[(first_num, size)] > 1]
+        candidate_digests = executor.map(file_digest, [paths[index] for index in candidates])
+        digests = dict(zip((paths[index] for index in candidates), candidate_digests))
+    
+    # (앞 숫자, 크기, 해시)가 같은 파일을 그룹 안 순서대로 묶음
+    same_content = defaultdict(list)
+    for index in candidates:
+        first_num, filename = members[index]
+        same_content[(first_num, sizes[index], digests[paths[index]])].append(filename)
+    
+    duplicates = defaultdict(list)
+    for (first_num, _, _), filenames in same_content.items():
+        if len(filenames) > 1:
+            duplicates[first_num].append(filenames)
+    return dict(duplicates), digests
+
+def encode_image(source, output_format, quality=DEFAULT_JPEG_QUALITY):
+    """
+    이미지를 output_format(png/webp/jpeg)으로 인코딩한 바이트 반환 (source: 파일 경로 또는 바이트)
+    PNG/WebP는 무손실, JPEG은 quality로 품질 지정
+    """
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+        buffer = io.BytesIO()
+        if output_format == 'png':
+            if image.mode == 'CMYK':
+                image = image.convert('RGB')
+            image.save(buffer, 'PNG', compress_level=6)
+        elif output_format == 'webp':
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            image.save(buffer, 'WEBP', lossless=True)
+        elif output_format == 'jpeg':
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.save(buffer, 'JPEG', quality=quality)
+        else:
+            raise ValueError(f"알 수 없는 출력 형식: {output_format}")
+    return buffer.getvalue()
+
+def transcode_file(src, dst, output_format, quality=DEFAULT_JPEG_QUALITY):
+    """원본을 변환하여 dst에 저장 후 (원본 크기, 출력 크기, 인코딩 시간) 반환 (프로세스 풀 작업 단위)"""
+    start = time.perf_counter()
+    data = encode_image(src, output_format, quality)
+    encode_seconds = time.perf_counter() - start
+    # 기존 대상이 링크일 경우 원본에 덮어쓰지 않도록 먼저 제거
+    if os.path.lexists(dst):
+        os.remove(dst)
+    with open(dst, 'wb') as f:
+        f.write(data)
+    return os.stat(src).st_size, len(data), encode_seconds
+
+def transcode_bytes(data, output_format, quality=DEFAULT_JPEG_QUALITY):
+    """업로드 버퍼 내용을 변환하여 (변환된 바이트, 인코딩 시간) 반환 (프로세스 풀 작업 단위)"""
+    start = time.perf_counter()
+    encoded = encode_image(data, output_format, quality)
+    return encoded, time.perf_counter() - start
+
+def add_transcode_stats(stats, source_bytes, output_bytes, encode_seconds):
+    """변환 결과를 stats의 'transcoded'/'transcode_source_bytes'/'transcode_output_bytes'/'encode_seconds'에 더함"""
+    stats['transcoded'] = stats.get('transcoded', 0) + 1
+    stats['transcode_source_bytes'] = stats.get('transcode_source_bytes', 0) + source_bytes
+    stats['transcode_output_bytes'] = stats.get('transcode_output_bytes', 0) + output_bytes
+    stats['encode_seconds'] = stats.get('encode_seconds', 0.0) + encode_seconds
+
+def transcode_files(transcode_tasks, output_format, quality=DEFAULT_JPEG_QUALITY, executor=None, progress_callback=None, stats=None):
+    """
+    (원본, 대상) 경로 목록을 변환하여 저장 (executor가 있으면 프로세스 풀, 없으면 순차 처리)
+    progress_callback(완료 수, 전체 수), stats dict를 넘기면 place_files와 같은 'files'/'bytes'에 변환 결과도 더함
+    """
+    total = len(transcode_tasks)
+    if stats is not None:
+        stats['files'] = (stats.get('files') or 0) + total
+        stats['bytes'] = stats.get('bytes') or 0
+    
+    if executor is None:
+        results = (transcode_file(src, dst, output_format, quality) for src, dst in transcode_tasks)
+    else:
+        results = (future.result() for future in [executor.submit(transcode_file, src, dst, output_format, quality) for src, dst in transcode_tasks])
+    
+    for done, (source_bytes, output_bytes, encode_seconds) in enumerate(results, start=1):
+        if stats is not None:
+            stats['bytes'] += source_bytes
+            add_transcode_stats(stats, source_bytes, output_bytes, encode_seconds)
+        if progress_callback:
+            progress_callback(done, total)
+    return ['transcode'] * total
+
+def add_transcode_metrics(metrics, stats):
+    """변환 단계 기록: 인코딩 시간 합계, 변환 파일 수, 원본/출력 바이트, 절약한 바이트, 이미지당 인코딩 시간"""
+    transcoded = stats.get('transcoded', 0)
+    stage = add_stage_metrics(metrics, 'transcode', stats.get('encode_seconds', 0.0), transcoded, stats.get('transcode_source_bytes', 0))
+    stage['output_bytes'] = stats.get('transcode_output_bytes', 0)
+    stage['bytes_saved'] = stage['bytes'] - stage['output_bytes']
+    stage['encode_seconds_per_image'] = round(stats.get('encode_seconds', 0.0) / transcoded, 4) if transcoded else None
+    return stage
+
+def build_abnormal_log(groups, group_analysis, large_group_sizes=None):
+    """
+    개수가 2개가 아닌 그룹 로그 생성
+    large_group_sizes: 5개 이상 그룹의 {앞 숫자: 개수} (그룹 항목 없이 개수만 아는 경우, 지정하면 groups는 사용하지 않음)
+    """
+    if large_group_sizes is None:
+        large_group_sizes = {first_num: len(groups[first_num]) for first_num in group_analysis['other']}
+    abnormal_log = []
+    if group_analysis[1]:
+        abnormal_log.append(f"1개: {', '.join(map(str, group_analysis[1]))}")
+    if group_analysis[3]:
+        abnormal_log.append(f"3개: {', '.join(map(str, group_analysis[3]))}")
+    if group_analysis[4]:
+        abnormal_log.append(f"4개: {', '.join(map(str, group_analysis[4]))}")
+    for first_num in group_analysis['other']:
+        abnormal_log.append(f"{large_group_sizes[first_num]}개: {first_num}")
+    return abnormal_log
+
+def route_group(items, large_group_rule=None):
+    """
+    그룹 개수 규칙에 따라 ([(원본 파일명, 대상 폴더)], 미사용 파일 목록) 반환
+    처리 규칙이 없는 그룹(5개 이상)은 None, large_group_rule(LARGE_GROUP_RULES의 이름 또는 규칙 함수)을 지정하면 그 규칙 사용
+    """
+    count = len(items)
+    
+    if count == 1:
+        # Unknown 폴더에 저장
+        return [(items[0][1], "Unknown")], []
+    elif count == 2:
+        # 낮은 숫자 -> Deposition, 높은 숫자 -> Scanning
+        return [(items[0][1], "Deposition"), (items[1][1], "Scanning")], []
+    elif count == 3:
+        # 2번째로 높은 숫자 -> Deposition, 가장 높은 숫자 -> Scanning
+        return [(items[1][1], "Deposition"), (items[2][1], "Scanning")], [items[0][1]]
+    elif count == 4:
+        # 2번째로 높은 숫자 -> Deposition, 가장 높은 숫자 -> Scanning
+        return [(items[2][1], "Deposition"), (items[3][1], "Scanning")], [items[0][1], items[1][1]]
+    
+    rule = resolve_large_group_rule(large_group_rule)
+    return rule(items) if rule else None
+
+def route_highest_pair(items):
+    """5개 이상 그룹 규칙: 3/4개 그룹과 같이 2번째로 높은 숫자 -> Deposition, 가장 높은 숫자 -> Scanning, 나머지는 미사용"""
+    return [(items[-2][1], "Deposition"), (items[-1][1], "Scanning")], [item[1] for item in items[:-2]]
+
+# 5개 이상 그룹 처리 규칙 {이름: 규칙 함수}
+# 규칙 함수는 그룹 항목(뒤 숫자 순)을 받아 route_group과 같은 형태를 반환하며, None은 처리하지 않고 모두 미사용
+LARGE_GROUP_RULES = {
+    'skip': None,
+    'highest_pair': route_highest_pair,
+}
+
+# 5개 이상 그룹 규칙 표시 이름
+LARGE_GROUP_RULE_LABELS = {
+    'skip': "처리하지 않음 (모두 미사용)",
+    'highest_pair': "가장 높은 두 숫자 사용 (3/4개 그룹과 같은 규칙)",
+}
+
+def resolve_large_group_rule(large_group_rule):
+    """5개 이상 그룹 규칙 이름 또는 함수를 규칙 함수(또는 None)로 변환"""
+    if large_group_rule is None or callable(large_group_rule):
+        return large_group_rule
+    if large_group_rule not in LARGE_GROUP_RULES:
+        raise ValueError(f"알 수 없는 5개 이상 그룹 규칙: {large_group_rule}")
+    return LARGE_GROUP_RULES[large_group_rule]
+
+def rank_reason(count, position):
+    """그룹 안 순위 설명 (예: '3개 그룹, 2번째로 높은 숫자')"""
+    if count == 1:
+        return "1개 그룹"
+    rank = count - position
+    return f"{count}개 그룹, " + ("가장 높은 숫자" if rank == 1 else f"{rank}번째로 높은 숫자")
+
+def plan_group(first_num, items, output_format=None, large_group_rule=None):
+    """
+    그룹 하나의 분류 계획 (파일을 읽거나 쓰지 않고 파일명만으로 계산)
+    routes: [{'source', 'folder', 'new_filename', 'transcode', 'reason'}], unused: [{'source', 'reason'}]
+    새 파일명과 변환 여부는 저장하는 원본 파일 자신의 확장자로 정함 (확장자가 섞인 그룹도 내용과 확장자가 맞음)
+    그룹의 new_filename은 첫 저장 파일의 이름 (처리 규칙이 없는 그룹은 첫 파일 기준)
+    처리 규칙이 없는 그룹은 status 'no_rule'이며 모든 파일이 unused
+    """
+    count = len(items)
+    positions = {filename: position for position, (_, filename) in enumerate(items)}
+    route = route_group(items, large_group_rule)
+    if route is None:
+        routes, unused = [], [filename for _, filename in items]
+    else:
+        routes, unused = route
+    
+    planned_routes = [
+        {
+            'source': filename,
+            'folder': folder_name,
+            'new_filename': output_filename(first_num, filename, output_format),
+            'transcode': needs_transcode(filename, output_format),
+            'reason': rank_reason(count, positions[filename]),
+        }
+        for filename, folder_name in routes
+    ]
+    return {
+        'first_num': first_num,
+        'group_size': count,
+        'status': 'routed' if route is not None else 'no_rule',
+        'new_filename': planned_routes[0]['new_filename'] if planned_routes else output_filename(first_num, items[0][1], output_format),
+        'routes': planned_routes,
+        'unused': [
+            {'source': filename, 'reason': rank_reason(count, positions[filename]) + (" (처리 규칙 없음)" if route is None else " (미사용)")}
+            for filename in unused
+        ],
+    }
+
+def iter_plan(groups, output_format=None, large_group_rule=None):
+    """{앞 숫자: 그룹 항목}의 그룹별 분류 계획을 차례로 반환 (대용량 빌드는 필요한 만큼만 계산)"""
+    for first_num, items in groups.items():
+        yield plan_group(first_num, items, output_format, large_group_rule)
+
+def build_plan(groups, output_format=None, large_group_rule=None):
+    """전체 분류 계획 목록 (파일 입출력 없음, 각 실행기는 같은 plan_group 결과대로 저장)"""
+    return list(iter_plan(groups, output_format, large_group_rule))
+
+def iter_plan_entries(plan):
+    """분류 계획을 (원본 파일명, 대상 폴더, 새 파일명, 사유) 목록으로 펼침"""
+    for record in plan:
+        for route in record['routes']:
+            yield route['source'], route['folder'], route['new_filename'], route['reason']
+
+def save_plan(plan, plan_path):
+    """분류 계획을 그룹당 한 줄의 JSON Lines로 저장 후 경로 반환"""
+    with open(plan_path, 'w', encoding='utf-8') as f:
+        for record in plan:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    return plan_path
+
+def diff_plan(plan, output_folder):
+    """
+    분류 계획과 기존 출력 폴더 비교 (출력 폴더 목록만 읽고 원본은 읽지 않음)
+    {'new': 새로 만들 파일, 'existing': 이미 있어 덮어쓸 파일, 'stale': 계획에 없는 기존 출력 이미지} (각각 '폴더/파일명' 목록)
+    """
+    extensions = IMAGE_EXTENSIONS | set(OUTPUT_FORMAT_EXTENSIONS.values())
+    existing_files = set()
+    for folder_name in ("Deposition", "Scanning", "Unknown"):
+        folder_path = os.path.join(output_folder, folder_name)
+        if not os.path.isdir(folder_path):
+            continue
+        with os.scandir(folder_path) as entries:
+            existing_files.update(
+                f"{folder_name}/{entry.name}" for entry in entries
+                if os.path.splitext(entry.name)[1].lower() in extensions and not entry.is_dir()
+            )
+    
+    diff = {'new': [], 'existing': [], 'stale': []}
+    planned = set()
+    for _, folder_name, new_filename, _ in iter_plan_entries(plan):
+        dest = f"{folder_name}/{new_filename}"
+        planned.add(dest)
+        diff['existing' if dest in existing_files else 'new'].append(dest)
+    diff['stale'] = sorted(existing_files - planned)
+    return diff
+
+def output_filename(first_num, filename, output_format=None):
+    """
+    원본 파일 filename의 출력 파일명 (앞_숫자 + 원본 확장자)
+    output_format을 지정하면 변환 대상(BMP/TIFF) 원본은 변환 형식의 확장자 사용
+    """
+    ext = os.path.splitext(filename)[1]
+    if needs_transcode(filename, output_format):
+        ext = OUTPUT_FORMAT_EXTENSIONS[output_format]
+    return f"{first_num}{ext}"
+
+def needs_transcode(filename, output_format=None):
+    """output_format을 지정했고 원본이 변환 대상(BMP/TIFF)이면 변환 필요"""
+    return bool(output_format) and os.path.splitext(filename)[1].lower() in TRANSCODE_SOURCE_EXTENSIONS
+
+def build_run_record(first_num, items, new_filename, targets, unused, duplicates=None):
+    """
+    실행 매니페스트 항목 (그룹 하나의 처리 결과)
+    targets: [(원본 파일명, 대상 폴더, 새 파일명, 실제 배치 방식 또는 None)], 처리 규칙이 없는 그룹은 None
+    duplicates: 내용이 같은 파일명 목록의 목록 (지문 비교를 사용한 경우)
+    """
+    if targets is None:
+        # 5개 이상인 경우 모든 파일이 미사용
+        return {
+            'first_num': first_num,
+            'group_size': len(items),
+            'status': 'no_rule',
+            'new_filename': new_filename,
+            'targets': [],
+            'unused': [item[1] for item in items],
+            'duplicates': list(duplicates or []),
+        }
+    
+    return {
+        'first_num': first_num,
+        'group_size': len(items),
+        'status': 'routed',
+        'new_filename': new_filename,
+        'targets': [
+            {'source': filename, 'folder': folder_name, 'destination': f"{folder_name}/{target_filename}", 'mode': used_mode}
+            for filename, folder_name, target_filename, used_mode in targets
+        ],
+        'unused': list(unused),
+        'duplicates': list(duplicates or []),
+    }
+
+def format_duplicates(duplicates):
+    """동일 파일 목록을 'a = b; c = d' 형태 문자열로 변환"""
+    return '; '.join(' = '.join(filenames) for filenames in duplicates)
+
+def format_run_record(record, show_modes=True):
+    """
+    실행 매니페스트 항목으로 처리 로그 한 줄 생성
+    show_modes이면 파일별 실제 배치 방식을 [hardlink] 형태로 표시 (복사 이외의 방식을 선택한 경우)
+    """
+    count = record['group_size']
+    first_num = record['first_num']
+    if record['status'] == 'no_rule':
+        line = f"[{count}개] {first_num}: 처리 규칙 없음 - {', '.join(record['unused'])}"
+        if record.get('duplicates'):
+            line += f" (동일 파일: {format_duplicates(record['duplicates'])})"
+        return line
+    
+    parts = []
+    for target in record['targets']:
+        part = f"{target['source']} -> {target['destination']}"
+        if show_modes and target['mode']:
+            part += f" [{target['mode']}]"
+        parts.append(part)
+    line = f"[{count}개] {first_num}: {', '.join(parts)}"
+    if record['unused']:
+        line += f" (미사용: {', '.join(record['unused'])})"
+    if record.get('duplicates'):
+        line += f" (동일 파일: {format_duplicates(record['duplicates'])})"
+    return line
+
+def count_target_folders(run_records, counts=None):
+    """
+    실행 매니페스트 항목에서 실제로 저장한 폴더별 파일 수 {'Deposition', 'Scanning', 'Unknown'} 반환
+    counts를 넘기면 그 dict에 더함 (항목을 기록하면서 한 개씩 셀 때)
+    """
+    if counts is None:
+        counts = dict.fromkeys(("Deposition", "Scanning", "Unknown"), 0)
+    for record in run_records:
+        for target in record['targets']:
+            counts[target['folder']] += 1
+    return counts
+
+def format_duplicate_log(record):
+    """비정상 그룹 로그의 중복 촬영 한 줄 (예: '중복 촬영 3개: 440 - a = b')"""
+    return f"중복 촬영 {record['group_size']}개: {record['first_num']} - {format_duplicates(record['duplicates'])}"
+
+def iter_processed_records(input_folder, output_folder, groups, max_workers=None, progress_callback=None, output_mode='copy', stats=None, should_stop=None, fingerprint=False, output_format=None, quality=DEFAULT_JPEG_QUALITY, transcode_processes=None, large_group_rule=None):
+    """
+    그룹별 분류 계획(plan_group)대로 이미지를 처리하며 실행 매니페스트 항목을 차례로 반환
+    RUN_RECORD_CHUNK개 그룹씩 배치한 뒤 내보내므로 전체 처리 결과를 메모리에 모으지 않음
+    stats dict를 넘기면 저장한 파일 수('files')와 바이트('bytes')를 기록
+    should_stop()이 참이면 다음 묶음을 시작하지 않고 멈춤 (이미 반환한 그룹은 모두 저장이 끝난 상태)
+    fingerprint이면 묶음별로 그룹 안 동일 파일을 찾아 항목의 'duplicates'에 기록하고, 대상이 이미 같은 파일은 다시 쓰지 않음
+    (stats의 'unchanged'에 건너뛴 파일 수, 'fingerprint_seconds'/'fingerprint_files'에 동일 파일 확인 시간과 해시한 파일 수)
+    output_format(png/webp/jpeg)을 지정하면 BMP/TIFF 원본은 transcode_processes개 프로세스로 변환하여 저장 (배치 방식 'transcode')
+    large_group_rule: 5개 이상 그룹 규칙 (LARGE_GROUP_RULES의 이름 또는 규칙 함수)
+    """
+    if output_format and not PIL_AVAILABLE:
+        raise RuntimeError("출력 이미지 변환에는 Pillow가 필요합니다. (pip install pillow)")
+    if transcode_processes is None:
+        transcode_processes = DEFAULT_TRANSCODE_PROCESSES
+    
+    # 출력 폴더 생성
+    deposition_folder = os.path.join(output_folder, "Deposition")
+    scanning_folder = os.path.join(output_folder, "Scanning")
+    unknown_folder = os.path.join(output_folder, "Unknown")
+    
+    os.makedirs(deposition_folder, exist_ok=True)
+    os.makedirs(scanning_folder, exist_ok=True)
+    os.makedirs(unknown_folder, exist_ok=True)
+    
+    effective_mode = resolve_output_mode(input_folder, output_folder, output_mode)
+    
+    # 진행 상황은 묶음별이 아닌 전체 파일 수 기준으로 전달
+    total = sum(len(route[0]) for route in (route_group(items, large_group_rule) for items in groups.values()) if route)
+    placed = 0
+    
+    def chunk_progress(done, _):
+        progress_callback(placed + done, total)
+    
+    if progress_callback:
+        progress_callback(0, total)
+    
+    # 변환 프로세스 풀은 묶음마다 만들지 않고 실행 동안 유지
+    executor = ProcessPoolExecutor(max_workers=transcode_processes) if output_format and transcode_processes > 1 else None
+    try:
+        group_items = iter(groups.items())
+        while not (should_stop and should_stop()):
+            chunk = list(islice(group_items, RUN_RECORD_CHUNK))
+            if not chunk:
+                break
+            
+            copy_tasks = []
+            transcode_tasks = []
+            # (앞 숫자, 그룹 항목, 새 파일명, [(원본 파일명, 대상 폴더, 변환 여부, 작업 번호)] 또는 None, 미사용 파일)
+            entries = []
+            
+            duplicates, digests = {}, {}
+            if fingerprint:
+                start = time.perf_counter()
+                duplicates, digests = find_duplicate_shots(input_folder, dict(chunk), max_workers)
+                if stats is not None:
+                    stats['fingerprint_seconds'] = stats.get('fingerprint_seconds', 0.0) + time.perf_counter() - start
+                    stats['fingerprint_files'] = stats.get('fingerprint_files', 0) + len(digests)
+            
+            for first_num, items in chunk:
+                plan = plan_group(first_num, items, output_format, large_group_rule)
+                new_filename = plan['new_filename']
+                if plan['status'] == 'no_rule':
+                    entries.append((first_num, items, new_filename, None, None))
+                    continue
+                
+                targets = []
+                for route in plan['routes']:
+                    filename, folder_name, transcode = route['source'], route['folder'], route['transcode']
+                    src = os.path.join(input_folder, filename)
+                    dst = os.path.join(output_folder, folder_name, route['new_filename'])
+                    tasks = transcode_tasks if transcode else copy_tasks
+                    targets.append((filename, folder_name, route['new_filename'], transcode, len(tasks)))
+                    tasks.append((src, dst))
+                entries.append((first_num, items, new_filename, targets, [entry['source'] for entry in plan['unused']]))
+            
+            # 파일 배치 (작업자 풀)
+            copy_modes = place_files(copy_tasks, effective_mode, max_workers, chunk_progress if progress_callback else None, stats, fingerprint, digests)
+            placed += len(copy_tasks)
+            # 이미지 변환 (프로세스 풀)
+            transcode_modes = transcode_files(transcode_tasks, output_format, quality, executor, chunk_progress if progress_callback else None, stats)
+            placed += len(transcode_tasks)
+            
+            # 실제 배치 방식은 처리 후에 알 수 있으므로 항목은 묶음 처리가 끝난 뒤 작성
+            for first_num, items, new_filename, targets, unused in entries:
+                if targets is not None:
+                    targets = [
+                        (filename, folder_name, target_filename, (transcode_modes if transcode else copy_modes)[task_index])
+                        for filename, folder_name, target_filename, transcode, task_index in targets
+                    ]
+                yield build_run_record(first_num, items, new_filename, targets, unused, duplicates.get(first_num))
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+def iter_streamed_members(archive_path, names):
+    """
+    압축된 TAR을 처음부터 한 번만 풀며 names에 있는 항목을 (이름, 열기 함수, 크기)로 차례로 반환
+    스트림 모드로 읽으므로 열기 함수는 다음 항목으로 넘어가기 전에 호출해야 함 (되감지 않음)
+    """
+    with tarfile.open(archive_path, 'r|*') as archive:
+        for member in archive:
+            if member.isfile() and member.name in names:
+                yield member.name, partial(archive.extractfile, member), member.size
+
+def extract_member(opener, dst):
+    """압축 파일 항목을 압축을 풀며 dst에 바로 저장 (임시 폴더에 풀지 않음)"""
+    # 기존 대상이 링크일 경우 원본에 덮어쓰지 않도록 먼저 제거
+    if os.path.lexists(dst):
+        os.remove(dst)
+    with opener() as src, open(dst, 'wb') as f:
+        shutil.copyfileobj(src, f, ZIP_CHUNK_SIZE)
+
+def iter_archive_records(archive_path, output_folder, groups, progress_callback=None, stats=None, should_stop=None, output_format=None, quality=DEFAULT_JPEG_QUALITY, transcode_processes=None, large_group_rule=None):
+    """
+    ZIP/TAR 압축 파일 안의 이미지를 압축을 풀지 않고 항목별로 읽어 분류 저장하며 실행 매니페스트 항목을 차례로 반환 (배치 방식 'extract')
+    ZIP과 무압축 TAR은 RUN_RECORD_CHUNK개 그룹씩 처리하고, 압축된 TAR은 되감으면 처음부터 다시 풀어야 하므로 전체를 한 번에 항목 순서대로 읽음
+    (압축된 TAR은 항목 목록을 따로 읽지 않고 스트림으로 한 번만 풀지만, 분석 단계의 항목 목록 읽기와 합치면 전체를 두 번 풂)
+    stats, should_stop, output_format, large_group_rule은 iter_processed_records와 같음 (취소하면 대상을 모두 저장한 그룹까지만 반환)
+    """
+    if output_format and not PIL_AVAILABLE:
+        raise RuntimeError("출력 이미지 변환에는 Pillow가 필요합니다. (pip install pillow)")
+    if transcode_processes is None:
+        transcode_processes = DEFAULT_TRANSCODE_PROCESSES
+    
+    for folder_name in ("Deposition", "Scanning", "Unknown"):
+        os.makedirs(os.path.join(output_folder, folder_name), exist_ok=True)
+    
+    streamed = archive_path.lower().endswith(STREAMED_ARCHIVE_EXTENSIONS)
+    if streamed:
+        archive, members, positions = None, None, None
+        chunk_size = len(groups)
+    else:
+        archive, members = open_archive(archive_path)
+        # 항목 이름별 압축 파일 안의 순서 (항목을 앞에서부터 읽도록 정렬)
+        positions = {name: position for position, name in enumerate(members)}
+        chunk_size = RUN_RECORD_CHUNK
+    
+    total = sum(len(route[0]) for route in (route_group(items, large_group_rule) for items in groups.values()) if route)
+    placed = 0
+    if progress_callback:
+        progress_callback(0, total)
+    if stats is not None:
+        stats['files'] = stats.get('files') or 0
+        stats['bytes'] = stats.get('bytes') or 0
+    
+    executor = ProcessPoolExecutor(max_workers=transcode_processes) if output_format and transcode_processes > 1 else None
+    
+    def write_transcoded(result, dst, size):
+        encoded, encode_seconds = result
+        with open(dst, 'wb') as f:
+            f.write(encoded)
+        if stats is not None:
+            add_transcode_stats(stats, size, len(encoded), encode_seconds)
+    
+    try:
+        group_items = iter(groups.items())
+        while not (should_stop and should_stop()):
+            chunk = list(islice(group_items, chunk_size))
+            if not chunk:
+                break
+            
+            # (항목 이름, 대상 경로, 변환 여부)
+            tasks = []
+            entries = []
+            for first_num, items in chunk:
+                plan = plan_group(first_num, items, output_format, large_group_rule)
+                new_filename = plan['new_filename']
+                if plan['status'] == 'no_rule':
+                    entries.append((first_num, items, new_filename, None, None))
+                    continue
+                
+                targets = []
+                for route in plan['routes']:
+                    filename, folder_name, transcode = route['source'], route['folder'], route['transcode']
+                    targets.append((filename, folder_name, route['new_filename'], transcode, len(tasks)))
+                    tasks.append((filename, os.path.join(output_folder, folder_name, route['new_filename']), transcode))
+                entries.append((first_num, items, new_filename, targets, [entry['source'] for entry in plan['unused']]))
+            
+            # 변환 중인 파일 (작업, 대상 경로, 원본 크기, 작업 번호), 프로세스 수의 두 배까지만 메모리에 보관
+            pending = []
+            written = set()
+            cancelled = False
+            # (작업 번호, 열기 함수, 크기)를 압축 파일 안의 항목 순서대로
+            if streamed:
+                task_positions = {task[0]: task_index for task_index, task in enumerate(tasks)}
+                archive_members = ((task_positions[name], opener, size) for name, opener, size in iter_streamed_members(archive_path, task_positions))
+            else:
+                archive_members = ((task_index,) + members[tasks[task_index][0]] for task_index in sorted(range(len(tasks)), key=lambda index: positions[tasks[index][0]]))
+            for task_index, opener, size in archive_members:
+                if should_stop and should_stop():
+                    cancelled = True
+                    break
+                _, dst, transcode = tasks[task_index]
+                if not transcode:
+                    extract_member(opener, dst)
+                    written.add(task_index)
+                else:
+                    with opener() as src:
+                        data = src.read()
+                    if os.path.lexists(dst):
+                        os.remove(dst)
+                    if executor is None:
+                        write_transcoded(transcode_bytes(data, output_format, quality), dst, size)
+                        written.add(task_index)
+                    else:
+                        pending.append((executor.submit(transcode_bytes, data, output_format, quality), dst, size, task_index))
+                        if len(pending) >= transcode_processes * 2:
+                            future, pending_dst, pending_size, pending_index = pending.pop(0)
+                            write_transcoded(future.result(), pending_dst, pending_size)
+                            written.add(pending_index)
+                placed += 1
+                if stats is not None:
+                    stats['files'] += 1
+                    stats['bytes'] += size
+                if progress_callback:
+                    progress_callback(placed, total)
+            # 스트림으로 읽던 압축 파일 닫기 (취소한 경우)
+            archive_members.close()
+            
+            while pending:
+                future, pending_dst, pending_size, pending_index = pending.pop(0)
+                write_transcoded(future.result(), pending_dst, pending_size)
+                written.add(pending_index)
+            
+            for first_num, items, new_filename, targets, unused in entries:
+                if targets is not None:
+                    if not all(task_index in written for *_, task_index in targets):
+                        continue
+                    targets = [
+                        (filename, folder_name, target_filename, 'transcode' if transcode else 'extract')
+                        for filename, folder_name, target_filename, transcode, _ in targets
+                    ]
+                yield build_run_record(first_num, items, new_filename, targets, unused)
+            
+            if cancelled:
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        if archive is not None:
+            archive.close()
+
+def process_images(input_folder, output_folder, groups, max_workers=None, progress_callback=None, output_mode='copy', stats=None, fingerprint=False, output_format=None, quality=DEFAULT_JPEG_QUALITY, large_group_rule=None):
+    """
+    그룹별 규칙에 따라 이미지 처리 후 처리 로그 목록 반환
+    그룹이 많은 빌드는 iter_processed_records로 실행 매니페스트에 바로 기록
+    fingerprint이면 대상이 이미 같은 파일은 건너뛰고 그룹 안 동일 파일을 로그에 표시
+    output_format을 지정하면 BMP/TIFF 원본을 변환하여 저장 (stats에 변환 결과 기록)
+    large_group_rule을 지정하면 5개 이상 그룹도 그 규칙으로 처리 (저장 위치를 미리 보려면 build_plan 사용)
+    """
+    records = iter_processed_records(input_folder, output_folder, groups, max_workers, progress_callback, output_mode, stats, fingerprint=fingerprint, output_format=output_format, quality=quality, large_group_rule=large_group_rule)
+    # 복사 이외의 방식을 선택했거나 건너뛴/변환한 파일이 있을 수 있으면 파일별 실제 사용 방식 기록
+    return [format_run_record(record, output_mode != 'copy' or fingerprint or bool(output_format)) for record in records]
+
+def open_run_manifest(output_folder, formats=()):
+    """
+    실행 매니페스트 파일 열기 (JSON Lines는 항상, formats에 'csv'가 있으면 CSV도 함께 작성)
+    항목은 write_run_record로 처리하는 대로 추가하고 close_run_manifest로 닫음
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    manifest_path = os.path.join(output_folder, make_log_filename(RUN_MANIFEST_NAME, ".jsonl"))
+    writer = {
+        'path': manifest_path,
+        'file': open(manifest_path, 'w', encoding='utf-8'),
+        'csv_path': None,
+        'csv_file': None,
+        'csv_writer': None,
+        'count': 0,
+    }
+    if 'csv' in formats:
+        writer['csv_path'] = os.path.splitext(manifest_path)[0] + ".csv"
+        # 엑셀에서 바로 열 수 있도록 BOM 포함
+        writer['csv_file'] = open(writer['csv_path'], 'w', encoding='utf-8-sig', newline='')
+        writer['csv_writer'] = csv.DictWriter(writer['csv_file'], fieldnames=RUN_MANIFEST_COLUMNS)
+        writer['csv_writer'].writeheader()
+    return writer
+
+def flatten_run_record(record):
+    """CSV/Parquet용 한 행 (미사용 파일은 ;로 연결)"""
+    row = {column: None for column in RUN_MANIFEST_COLUMNS}
+    row['first_num'] = record['first_num']
+    row['group_size'] = record['group_size']
+    row['status'] = record['status']
+    row['new_filename'] = record['new_filename']
+    for target in record['targets']:
+        folder = target['folder'].lower()
+        row[f"{folder}_source"] = target['source']
+        row[f"{folder}_destination"] = target['destination']
+        row[f"{folder}_mode"] = target['mode']
+    row['unused'] = ';'.join(record['unused'])
+    row['duplicates'] = format_duplicates(record.get('duplicates', []))
+    return row
+
+def write_run_record(writer, record):
+    """실행 매니페스트에 항목 하나 추가"""
+    writer['file'].write(json.dumps(record, ensure_ascii=False) + '\n')
+    if writer['csv_writer'] is not None:
+        writer['csv_writer'].writerow(flatten_run_record(record))
+    writer['count'] += 1
+
+def close_run_manifest(writer):
+    """실행 매니페스트 파일 닫기, {형식: 경로} 반환"""
+    writer['file'].close()
+    paths = {'jsonl': writer['path']}
+    if writer['csv_file'] is not None:
+        writer['csv_file'].close()
+        paths['csv'] = writer['csv_path']
+    return paths
+
+def iter_run_records(manifest_path, offset=0, limit=None):
+    """실행 매니페스트 항목을 파일에서 차례로 읽기 (offset번째부터 limit개)"""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        stop = offset + limit if limit is not None else None
+        for line in islice(f, offset, stop):
+            yield json.loads(line)
+
+def export_run_manifest_parquet(manifest_path, batch_size=10000):
+    """실행 매니페스트(JSON Lines)를 같은 이름의 Parquet 파일로 변환 (batch_size개 항목씩)"""
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("Parquet 내보내기에는 pyarrow가 필요합니다. (pip install pyarrow)")
+    
+    schema = pa.schema([
+        (column, pa.int64() if column in ('first_num', 'group_size') else pa.string())
+        for column in RUN_MANIFEST_COLUMNS
+    ])
+    parquet_path = os.path.splitext(manifest_path)[0] + ".parquet"
+    records = iter_run_records(manifest_path)
+    with pq.ParquetWriter(parquet_path, schema) as parquet_writer:
+        while True:
+            rows = [flatten_run_record(record) for record in islice(records, batch_size)]
+            if not rows:
+                break
+            parquet_writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    return parquet_path
+
+def write_processing_log(manifest_path, output_folder, show_modes=False):
+    """실행 매니페스트를 읽으며 사람이 읽는 processing_log 파일 작성"""
+    log_path = os.path.join(output_folder, make_log_filename("processing_log"))
+    with open(log_path, 'w', encoding='utf-8') as f:
+        for record in iter_run_records(manifest_path):
+            f.write(format_run_record(record, show_modes) + '\n')
+    return log_path
+
+def new_run_metrics(mode):
+    """실행 단위 성능 기록 생성 (단계별 결과는 measure_stage로 추가)"""
+    return {
+        'mode': mode,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'stages': {},
+    }
+
+def add_stage_metrics(metrics, name, seconds, files=None, bytes_count=None, peak_memory=None):
+    """단계 하나의 소요 시간과 처리량(초당 파일 수/바이트) 기록"""
+    stage = {'seconds': round(seconds, 4)}
+    if files is not None:
+        stage['files'] = files
+        stage['files_per_second'] = round(files / seconds, 1) if seconds > 0 else None
+    if bytes_count is not None:
+        stage['bytes'] = bytes_count
+        stage['bytes_per_second'] = round(bytes_count / seconds, 1) if seconds > 0 else None
+    if peak_memory is not None:
+        stage['peak_memory_bytes'] = peak_memory
+    metrics['stages'][name] = stage
+    return stage
+
+@contextmanager
+def measure_stage(metrics, name, track_memory=False):
+    """
+    with 블록 실행 시간을 metrics에 단계로 기록
+    블록에서 받은 dict에 'files'/'bytes'를 채우면 처리량도 계산, track_memory이면 블록 중 최대 메모리 사용량(tracemalloc) 기록
+    (tracemalloc은 모든 Python 할당을 추적하여 저장 단계 처리량이 크게 줄고 디코딩한 이미지 버퍼는 보지 못하므로 명시적으로 요청한 경우에만 사용)
+    metrics가 None이면 측정하지 않음
+    """
+    stage = {'files': None, 'bytes': None}
+    if metrics is None:
+        yield stage
+        return
+    
+    started_tracing = False
+    if track_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        tracemalloc.reset_peak()
+        base_memory = tracemalloc.get_traced_memory()[0]
+    
+    start = time.perf_counter()
+    try:
+        yield stage
+    finally:
+        seconds = time.perf_counter() - start
+        peak_memory = None
+        if track_memory:
+            peak_memory = max(tracemalloc.get_traced_memory()[1] - base_memory, 0)
+            if started_tracing:
+                tracemalloc.stop()
+        add_stage_metrics(metrics, name, seconds, stage['files'], stage['bytes'], peak_memory)
+
+def finish_run_metrics(metrics, total_seconds=None):
+    """전체 소요 시간(지정하지 않으면 NESTED_STAGES를 뺀 단계별 시간의 합)과 프로세스 최대 메모리(RSS) 기록"""
+    if total_seconds is None:
+        total_seconds = sum(stage['seconds'] for name, stage in metrics['stages'].items() if name not in NESTED_STAGES)
+    metrics['total_seconds'] = round(total_seconds, 4)
+    if RESOURCE_AVAILABLE:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux는 KB, macOS는 바이트 단위
+        metrics['peak_rss_bytes'] = max_rss if sys.platform == "darwin" else max_rss * 1024
+    return metrics
+
+def save_run_metrics(metrics, output_folder):
+    """성능 기록을 processing_log 옆에 run_metrics_YYYYMMDD_HHMMSS.json으로 저장"""
+    metrics_path = os.path.join(output_folder, make_log_filename("run_metrics", ".json"))
+    with open(metrics_path, 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+    return metrics_path
+
+def list_layer_files(folder_path):
+    """출력 폴더의 '앞_숫자.확장자' 이미지를 {레이어 번호: 경로}로 반환 (폴더가 없으면 빈 dict)"""
+    extensions = IMAGE_EXTENSIONS | set(OUTPUT_FORMAT_EXTENSIONS.values())
+    layers = {}
+    if not os.path.isdir(folder_path):
+        return layers
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            if stem.isdigit() and ext.lower() in extensions and entry.is_file():
+                layers[int(stem)] = entry.path
+    return layers
+
+def volume_layout(path):
+    """이미지 헤더만 읽어 볼륨 한 장의 ((높이, 너비), 이미지 모드) 반환"""
+    with Image.open(path) as image:
+        mode = image.mode if image.mode in VOLUME_MODES else 'RGB'
+        return (image.height, image.width), mode
+
+def decode_volume_chunk(stack_path, tasks, mode):
+    """
+    [(배열 위치, 이미지 경로)]를 디코딩하여 메모리 맵 배열의 해당 위치에 기록 (프로세스 풀 작업 단위)
+    이미지는 한 장씩 디코딩하므로 작업자 메모리는 이미지 한 장 크기로 유지
+    """
+    stack = np.lib.format.open_memmap(stack_path, mode='r+')
+    try:
+        height, width = stack.shape[1:3]
+        for position, path in tasks:
+            with Image.open(path) as image:
+                if image.mode != mode:
+                    image = image.convert(mode)
+                if image.size != (width, height):
+                    raise ValueError(f"이미지 크기가 볼륨과 다릅니다: {path} ({image.size[0]}x{image.size[1]}, 볼륨 {width}x{height})")
+                stack[position] = np.asarray(image)
+        stack.flush()
+    finally:
+        del stack
+    return len(tasks)
+
+def export_volumes(output_folder, expected_range=None, processes=None, chunk_layers=VOLUME_CHUNK_LAYERS, progress_callback=None):
+    """
+    출력 폴더의 Deposition/Scanning 이미지를 레이어 번호 순의 메모리 맵 배열(.npy)로 내보내고 색인 파일 경로 반환 (내보낼 이미지가 없으면 None)
+    배열 위치는 레이어 번호 - 첫 레이어 번호이며, 두 폴더 모두 같은 레이어 범위(expected_range 또는 발견한 최소~최대)를 사용
+    이미지가 없는 레이어는 0으로 채우고 마스크(*_mask.npy)를 False로 표시
+    chunk_layers개 레이어씩 processes개 프로세스에서 디코딩하여 배열 파일에 바로 기록 (전체 볼륨을 메모리에 올리지 않음)
+    progress_callback(완료 레이어 수, 전체 레이어 수)
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("볼륨 내보내기에는 numpy가 필요합니다. (pip install numpy)")
+    if not PIL_AVAILABLE:
+        raise RuntimeError("볼륨 내보내기에는 Pillow가 필요합니다. (pip install pillow)")
+    if processes is None:
+        processes = DEFAULT_TRANSCODE_PROCESSES
+    
+    folder_layers = {name: list_layer_files(os.path.join(output_folder, name)) for name in VOLUME_FOLDERS}
+    all_layers = set().union(*folder_layers.values())
+    first, last = expected_range or (None, None)
+    first = min(all_layers) if first is None and all_layers else first
+    last = max(all_layers) if last is None and all_layers else last
+    if first is None or last is None or first > last:
+        return None
+    
+    layer_count = last - first + 1
+    index = {
+        'first_layer': first,
+        'last_layer': last,
+        'layer_count': layer_count,
+        'stacks': {},
+    }
+    
+    # 폴더별 (배열 경로, 이미지 모드, [(배열 위치, 이미지 경로)] 묶음 목록)
+    jobs = []
+    for name, layers in folder_layers.items():
+        in_range = {layer: path for layer, path in layers.items() if first <= layer <= last}
+        if not in_range:
+            continue
+        
+        shape, mode = volume_layout(in_range[min(in_range)])
+        dtype, channels = VOLUME_MODES[mode]
+        stack_path = os.path.join(output_folder, f"{name.lower()}_volume.npy")
+        mask_path = os.path.join(output_folder, f"{name.lower()}_volume_mask.npy")
+        
+        # 헤더와 파일 크기만 만들고 닫음 (쓰지 않은 레이어는 0)
+        stack = np.lib.format.open_memmap(stack_path, mode='w+', dtype=dtype, shape=(layer_count,) + shape + channels)
+        del stack
+        mask = np.zeros(layer_count, dtype=bool)
+        mask[[layer - first for layer in in_range]] = True
+        np.save(mask_path, mask)
+        
+        tasks = sorted((layer - first, path) for layer, path in in_range.items())
+        chunks = [tasks[start:start + chunk_layers] for start in range(0, len(tasks), chunk_layers)]
+        jobs.append((stack_path, mode, chunks))
+        
+        index['stacks'][name] = {
+            'path': os.path.basename(stack_path),
+            'mask_path': os.path.basename(mask_path),
+            'shape': [layer_count, *shape, *channels],
+            'dtype': dtype,
+            'mode': mode,
+            'layer_count': len(in_range),
+            'missing_ranges': [list(missing) for missing in find_missing_ranges(in_range, (first, last))],
+            'outside_range': sorted(set(layers) - set(in_range)),
+        }
+    
+    total = sum(len(tasks) for _, _, chunks in jobs for tasks in chunks)
+    done = 0
+    if progress_callback:
+        progress_callback(0, total)
+    
+    with (ProcessPoolExecutor(max_workers=processes) if processes > 1 else nullcontext()) as executor:
+        for stack_path, mode, chunks in jobs:
+            if executor is None:
+                results = (decode_volume_chunk(stack_path, tasks, mode) for tasks in chunks)
+            else:
+                results = executor.map(decode_volume_chunk, [stack_path] * len(chunks), chunks, [mode] * len(chunks))
+            for count in results:
+                done += count
+                if progress_callback:
+                    progress_callback(done, total)
+    
+    index_path = os.path.join(output_folder, VOLUME_INDEX_FILENAME)
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    return index_path
+
+def load_volume(output_folder, folder_name='Deposition'):
+    """
+    export_volumes로 내보낸 볼륨을 메모리 맵으로 열어 (배열, 레이어 마스크, 첫 레이어 번호) 반환
+    레이어 번호 N은 배열[N - 첫 레이어 번호], 마스크가 False인 위치는 이미지가 없는 레이어
+    """
+    with open(os.path.join(output_folder, VOLUME_INDEX_FILENAME), 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    entry = index['stacks'][folder_name]
+    stack = np.load(os.path.join(output_folder, entry['path']), mmap_mode='r')
+    mask = np.load(os.path.join(output_folder, entry['mask_path']))
+    return stack, mask, index['first_layer']
+
+def load_manifest(output_folder):
+    """출력 폴더의 처리 매니페스트 읽기 (없거나 형식이 다르면 빈 매니페스트)"""
+    manifest_path = os.path.join(output_folder, MANIFEST_FILENAME)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'groups': {}}
+    
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {'version': MANIFEST_VERSION, 'groups': {}}
+    return manifest
+
+def save_manifest(manifest, output_folder):
+    """처리 매니페스트를 임시 파일에 쓴 뒤 교체 (중간에 중단되어도 이전 매니페스트 유지)"""
+    manifest_path = os.path.join(output_folder, MANIFEST_FILENAME)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(temp_path, manifest_path)
+    return manifest_path
+
+def build_group_record(first_num, items, file_stats, output_format=None, large_group_rule=None):
+    """매니페스트 그룹 항목: 원본 파일별 크기/수정 시각/파싱 결과/저장 위치"""
+    plan = plan_group(first_num, items, output_format, large_group_rule)
+    destinations = {route['source']: f"{route['folder']}/{route['new_filename']}" for route in plan['routes']}
+    
+    files = []
+    for second_num, filename in items:
+        size, mtime_ns = file_stats[filename]
+        files.append({
+            'source': filename,
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'first_num': first_num,
+            'second_num': second_num,
+            'destination': destinations.get(filename)
+        })
+    return {'files': files}
+
+def group_destinations(record):
+    """매니페스트 그룹 항목의 저장 위치 목록"""
+    return [file['destination'] for file in record['files'] if file['destination']]
+
+def process_images_incremental(input_folder, output_folder, groups, max_workers=None, progress_callback=None, output_mode='copy', stats=None, should_stop=None, fingerprint=False, output_format=None, quality=DEFAULT_JPEG_QUALITY, transcode_processes=None, large_group_rule=None):
+    """
+    매니페스트와 비교하여 구성이 바뀐 그룹만 처리
+    (전체 그룹의 실행 매니페스트 항목, 건너뛴 그룹 수) 반환, 건너뛴 그룹은 이전 실행의 항목을 그대로 사용
+    stats, fingerprint, output_format, large_group_rule은 process_images와 같음 (다시 처리한 파일만 기록)
+    5개 이상 그룹 규칙을 바꾸면 해당 그룹은 저장 위치가 바뀌므로 다시 처리
+    should_stop()으로 중간에 멈추면 처리하지 못한 그룹은 매니페스트에서 빼서 다음 실행 때 처리
+    """
+    if max_workers is None:
+        max_workers = DEFAULT_MAX_WORKERS
+    
+    os.makedirs(output_folder, exist_ok=True)
+    manifest = load_manifest(output_folder)
+    old_groups = manifest['groups']
+    
+    # 원본 파일 크기/수정 시각 확인 (네트워크 저장소에서는 병렬로 stat)
+    filenames = [filename for items in groups.values() for _, filename in items]
+    paths = [os.path.join(input_folder, filename) for filename in filenames]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        stat_results = list(executor.map(os.stat, paths))
+    file_stats = {filename: (stat.st_size, stat.st_mtime_ns) for filename, stat in zip(filenames, stat_results)}
+    
+    # 출력 방식이나 변환 형식/품질이 바뀌면 모든 그룹을 다시 처리
+    output_format_setting = {'format': output_format, 'quality': quality} if output_format else None
+    mode_changed = manifest.get('output_mode') != output_mode or manifest.get('output_format') != output_format_setting
+    
+    new_groups = {}
+    changed_groups = {}
+    for first_num, items in groups.items():
+        key = str(first_num)
+        record = build_group_record(first_num, items, file_stats, output_format, large_group_rule)
+        old_record = old_groups.get(key)
+        
+        unchanged = (
+            not mode_changed
+            and old_record is not None
+            and old_record['files'] == record['files']
+            and all(os.path.exists(os.path.join(output_folder, dest)) for dest in group_destinations(record))
+        )
+        if unchanged:
+            record['result'] = old_record['result']
+        else:
+            changed_groups[first_num] = items
+        new_groups[key] = record
+    
+    # 구성이 바뀌었거나 사라진 그룹의 이전 결과 중 더 이상 쓰지 않는 파일 삭제 (예: 1개 -> 2개로 바뀐 그룹의 Unknown)
+    for key, old_record in old_groups.items():
+        new_record = new_groups.get(key)
+        keep = set(group_destinations(new_record)) if new_record else set()
+        for dest in group_destinations(old_record):
+            dest_path = os.path.join(output_folder, dest)
+            if dest not in keep and os.path.lexists(dest_path):
+                os.remove(dest_path)
+    
+    for run_record in iter_processed_records(input_folder, output_folder, changed_groups, max_workers, progress_callback, output_mode, stats, should_stop, fingerprint, output_format, quality, transcode_processes, large_group_rule):
+        new_groups[str(run_record['first_num'])]['result'] = run_record
+    
+    # 중간에 멈춘 경우 처리하지 못한 그룹
+    unfinished = [first_num for first_num in changed_groups if 'result' not in new_groups[str(first_num)]]
+    for first_num in unfinished:
+        del new_groups[str(first_num)]
+    
+    manifest['output_mode'] = output_mode
+    manifest['output_format'] = output_format_setting
+    manifest['groups'] = new_groups
+    save_manifest(manifest, output_folder)
+    
+    run_records = [new_groups[str(first_num)]['result'] for first_num in groups if str(first_num) in new_groups]
+    skipped_count = len(groups) - len(changed_groups)
+    return run_records, skipped_count
+
+def open_inotify(folder_path):
+    """inotify로 폴더 감시 시작 후 파일 디스크립터 반환, 사용할 수 없으면 None (폴링으로 대체)"""
+    if not sys.platform.startswith("linux"):
+        return None
+    
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = IN_CREATE | IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO
+        if libc.inotify_add_watch(fd, os.fsencode(folder_path), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+def read_inotify_names(fd, timeout):
+    """
+    이벤트가 올 때까지 최대 timeout초 대기 후 (변경된 파일명 목록, 이벤트 유실 여부) 반환
+    이벤트 큐가 넘치면 유실 여부가 True이며 폴더 전체를 다시 확인해야 함
+    """
+    names = []
+    overflow = False
+    ready, _, _ = select.select([fd], [], [], timeout)
+    if not ready:
+        return names, overflow
+    
+    while True:
+        try:
+            data = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            break
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+            if name:
+                names.append(os.fsdecode(name))
+    
+    return names, overflow
+
+def iter_stable_files(folder_path, inotify_fd=None, poll_interval=WATCH_POLL_INTERVAL, settle_time=WATCH_SETTLE_TIME):
+    """
+    폴더에 새로 생긴 이미지 파일 중 쓰기가 끝난 파일 목록을 반복해서 반환 (없으면 빈 목록)
+    크기/수정 시각이 settle_time초 동안 바뀌지 않아야 쓰기가 끝난 것으로 판단
+    inotify_fd가 없으면 poll_interval초마다 폴더를 다시 확인
+    """
+    seen = set()
+    # 파일명 -> ((크기, 수정 시각), 처음 확인한 시각)
+    pending = {}
+    rescan = True
+    
+    while True:
+        if rescan or inotify_fd is None:
+            with os.scandir(folder_path) as entries:
+                names = [entry.name for entry in entries if entry.is_file()]
+            rescan = False
+        else:
+            names, rescan = read_inotify_names(inotify_fd, poll_interval)
+        
+        for name in names:
+            if name not in seen and name not in pending and is_image_file(name):
+                pending[name] = None
+        
+        now = time.monotonic()
+        stable_files = []
+        for name, last in list(pending.items()):
+            try:
+                stat = os.stat(os.path.join(folder_path, name))
+            except FileNotFoundError:
+                del pending[name]
+                continue
+            
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if last is None and time.time() - stat.st_mtime >= settle_time:
+                # 감시 시작 전에 이미 다 써진 파일
+                stable = True
+            elif last is None or last[0] != signature:
+                pending[name] = (signature, now)
+                stable = False
+            else:
+                stable = now - last[1] >= settle_time
+            
+            if stable:
+                del pending[name]
+                seen.add(name)
+                stable_files.append(name)
+        
+        yield stable_files
+        
+        if inotify_fd is None:
+            time.sleep(poll_interval)
+
+def watch_and_process(input_folder, output_folder, output_mode='copy', poll_interval=WATCH_POLL_INTERVAL, settle_time=WATCH_SETTLE_TIME, idle_timeout=WATCH_IDLE_TIMEOUT, max_workers=None, large_group_rule=None):
+    """
+    프린터가 쓰는 중인 폴더를 감시하며 완료된 레이어 그룹을 바로 분류
+    더 높은 레이어 번호가 나타난 그룹을 완료로 보고 처리, idle_timeout초 동안 새 파일이 없으면 남은 그룹을 처리하고 종료
+    실행 매니페스트와 로그는 처리할 때마다 파일 끝에 추가하며, 확인할 때마다 진행 상태 dict를 반환
+    늦게 도착한 파일로 다시 처리한 그룹은 매니페스트에 항목이 다시 추가됨 (나중 항목이 최종 결과)
+    large_group_rule: 5개 이상 그룹 규칙 (LARGE_GROUP_RULES의 이름 또는 규칙 함수)
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    abnormal_log_path = os.path.join(output_folder, make_log_filename("abnormal_groups_log"))
+    processing_log_path = os.path.join(output_folder, make_log_filename("processing_log"))
+    manifest_writer = open_run_manifest(output_folder)
+    
+    groups = defaultdict(list)
+    # 처리한 그룹의 저장 위치 (늦게 도착한 파일로 다시 처리할 때 이전 결과 정리용)
+    routed = {}
+    # 아직 처리하지 않았거나 다시 처리해야 하는 그룹
+    waiting = set()
+    failed_files = []
+    file_count = 0
+    max_first_num = None
+    abnormal_count = 0
+    recent_log = []
+    
+    inotify_fd = open_inotify(input_folder)
+    last_activity = time.monotonic()
+    
+    try:
+        for stable_files in iter_stable_files(input_folder, inotify_fd, poll_interval, settle_time):
+            for filename in stable_files:
+                parsed = parse_filename(filename)
+                if not parsed:
+                    failed_files.append(filename)
+                    continue
+                first_num, second_num = parsed
+                file_count += 1
+                groups[first_num].append((second_num, filename))
+                groups[first_num].sort()
+                waiting.add(first_num)
+                if max_first_num is None or first_num > max_first_num:
+                    max_first_num = first_num
+            
+            now = time.monotonic()
+            if stable_files:
+                last_activity = now
+            finished = now - last_activity >= idle_timeout
+            
+            # 완료된 그룹: 더 높은 레이어 번호가 나타난 그룹 (감시 종료 시에는 전부)
+            ready = sorted(first_num for first_num in waiting if finished or first_num < max_first_num)
+            if ready:
+                ready_groups = {first_num: groups[first_num] for first_num in ready}
+                
+                # 다시 처리하는 그룹의 이전 결과 중 더 이상 쓰지 않는 파일 삭제
+                for first_num, items in ready_groups.items():
+                    plan = plan_group(first_num, items, large_group_rule=large_group_rule)
+                    destinations = [f"{route['folder']}/{route['new_filename']}" for route in plan['routes']]
+                    for dest in routed.get(first_num, []):
+                        dest_path = os.path.join(output_folder, dest)
+                        if dest not in destinations and os.path.lexists(dest_path):
+                            os.remove(dest_path)
+                    routed[first_num] = destinations
+                
+                log_lines = []
+                for run_record in iter_processed_records(input_folder, output_folder, ready_groups, max_workers, None, output_mode, large_group_rule=large_group_rule):
+                    write_run_record(manifest_writer, run_record)
+                    log_lines.append(format_run_record(run_record, output_mode != 'copy'))
+                manifest_writer['file'].flush()
+                with open(processing_log_path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(line + '\n' for line in log_lines))
+                
+                abnormal_lines = [f"{len(items)}개: {first_num}" for first_num, items in ready_groups.items() if len(items) != 2]
+                if abnormal_lines:
+                    abnormal_count += len(abnormal_lines)
+                    with open(abnormal_log_path, 'a', encoding='utf-8') as f:
+                        f.write(''.join(line + '\n' for line in abnormal_lines))
+                
+                waiting.difference_update(ready)
+                recent_log = (recent_log + log_lines)[-20:]
+            
+            yield {
+                'backend': "inotify" if inotify_fd is not None else "polling",
+                'file_count': file_count,
+                'group_count': len(groups),
+                'routed_count': len(routed),
+                'waiting_count': len(waiting),
+                'abnormal_count': abnormal_count,
+                'failed_files': failed_files,
+                'recent_log': recent_log,
+                'idle_seconds': now - last_activity,
+                'finished': finished,
+                'processing_log_path': processing_log_path,
+                'abnormal_log_path': abnormal_log_path,
+                'run_manifest_path': manifest_writer['path'],
+            }
+            
+            if finished:
+                return
+    finally:
+        close_run_manifest(manifest_writer)
+        if inotify_fd is not None:
+            os.close(inotify_fd)
+
+def make_log_filename(log_name, ext=".txt"):
+    """타임스탬프가 붙은 로그 파일명 생성"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{log_name}_{timestamp}{ext}"
+
+def save_log(log_content, output_folder, log_name):
+    """로그 파일 저장"""
+    log_filename = make_log_filename(log_name)
+    log_path = os.path.join(output_folder, log_filename)
+    
+    with open(log_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(log_content))
+    
+    return log_path
+
+def add_zip_entry(zip_file, arcname, source, size):
+    """원본(파일 객체 또는 압축 파일 항목)을 청크 단위로 ZIP 항목에 기록 (이미 압축된 형식은 무압축 저장)"""
+    zip_info = zipfile.ZipInfo(arcname, date_time=datetime.now().timetuple()[:6])
+    ext = os.path.splitext(arcname)[1].lower()
+    zip_info.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    zip_info.external_attr = 0o644 << 16
+    # 크기를 미리 지정하여 대용량 파일은 ZIP64로 기록
+    zip_info.file_size = size
+    
+    with open_source(source) as f, zip_file.open(zip_info, 'w') as dest:
+        shutil.copyfileobj(f, dest, ZIP_CHUNK_SIZE)
+
+def write_zip_archive(zip_path, sources, groups, log_files, metrics=None, progress_callback=None, should_stop=None, output_format=None, quality=DEFAULT_JPEG_QUALITY, transcode_processes=None, large_group_rule=None, track_memory=False):
+    """
+    업로드 버퍼에서 바로 Deposition/Scanning/Unknown 경로로 ZIP 작성 후 실행 매니페스트 항목 목록 반환
+    sources: {파일명: (파일 객체 또는 압축 파일 항목 열기 함수, 크기)}, log_files: [(로그 파일명, 로그 내용 목록)]
+    실행 매니페스트(JSON Lines)와 이를 바탕으로 만든 처리 로그도 ZIP에 함께 저장
+    metrics를 넘기면 'zip' 단계를 기록하고 성능 기록 파일도 ZIP에 함께 저장 (track_memory이면 단계 중 최대 추가 메모리도 기록)
+    progress_callback(저장한 파일 수, 전체 파일 수), should_stop()이 참이면 파일 사이에서 ProcessingCancelled 발생
+    output_format을 지정하면 BMP/TIFF 원본은 프로세스 풀에서 변환하여 저장 (변환 중인 파일은 프로세스 수의 두 배까지만 메모리에 보관)
+    그룹별 저장 위치는 plan_group 분류 계획 사용 (large_group_rule: 5개 이상 그룹 규칙)
+    원본은 그룹 순서가 아니라 sources 순서(압축 파일 항목은 압축 파일 안의 순서)로 읽어, 압축된 TAR을 항목마다 처음부터 다시 풀지 않음
+    (압축된 TAR은 open_archive가 항목 목록을 읽을 때 한 번, 첫 항목을 읽을 때 되감아 한 번 더, 전체를 두 번 풂)
+    """
+    if output_format and not PIL_AVAILABLE:
+        raise RuntimeError("출력 이미지 변환에는 Pillow가 필요합니다. (pip install pillow)")
+    if transcode_processes is None:
+        transcode_processes = DEFAULT_TRANSCODE_PROCESSES
+    
+    # 분류 계획은 파일명만으로 계산하므로 먼저 전체 그룹의 항목과 저장 작업을 만듦
+    positions = {filename: position for position, filename in enumerate(sources)}
+    run_records = []
+    # (원본 파일명, ZIP 항목 이름, 변환 여부)
+    tasks = []
+    for first_num, items in groups.items():
+        plan = plan_group(first_num, items, output_format, large_group_rule)
+        new_filename = plan['new_filename']
+        if plan['status'] == 'no_rule':
+            run_records.append(build_run_record(first_num, items, new_filename, None, None))
+            continue
+        
+        targets = []
+        for route in plan['routes']:
+            filename, folder_name, transcode = route['source'], route['folder'], route['transcode']
+            tasks.append((filename, f"{folder_name}/{route['new_filename']}", transcode))
+            targets.append((filename, folder_name, route['new_filename'], 'transcode' if transcode else None))
+        run_records.append(build_run_record(first_num, items, new_filename, targets, [entry['source'] for entry in plan['unused']]))
+    tasks.sort(key=lambda task: positions[task[0]])
+    
+    transcode_stats = {}
+    # 변환 중인 ZIP 항목 (작업, 항목 이름, 원본 크기), 먼저 넣은 항목부터 기록
+    pending = []
+    
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file, \
+            (ProcessPoolExecutor(max_workers=transcode_processes) if output_format and transcode_processes > 1 else nullcontext()) as executor:
+        
+        def write_transcoded(result, arcname, size):
+            encoded, encode_seconds = result
+            add_zip_entry(zip_file, arcname, io.BytesIO(encoded), len(encoded))
+            add_transcode_stats(transcode_stats, size, len(encoded), encode_seconds)
+        
+        with measure_stage(metrics, 'zip', track_memory) as stage:
+            stage['files'] = 0
+            stage['bytes'] = 0
+            for done, (filename, arcname, transcode) in enumerate(tasks):
+                if should_stop and should_stop():
+                    raise ProcessingCancelled("처리가 취소되었습니다.")
+                if progress_callback:
+                    progress_callback(done, len(tasks))
+                source, size = sources[filename]
+                stage['files'] += 1
+                stage['bytes'] += size
+                if not transcode:
+                    add_zip_entry(zip_file, arcname, source, size)
+                    continue
+                
+                with open_source(source) as f:
+                    data = f.read()
+                if executor is None:
+                    write_transcoded(transcode_bytes(data, output_format, quality), arcname, size)
+                else:
+                    pending.append((executor.submit(transcode_bytes, data, output_format, quality), arcname, size))
+                    if len(pending) >= transcode_processes * 2:
+                        future, pending_arcname, pending_size = pending.pop(0)
+                        write_transcoded(future.result(), pending_arcname, pending_size)
+            
+            while pending:
+                future, arcname, size = pending.pop(0)
+                write_transcoded(future.result(), arcname, size)
+        
+        if output_format and metrics is not None:
+            add_transcode_metrics(metrics, transcode_stats)
+        
+        for log_filename, log_content in log_files:
+            zip_file.writestr(log_filename, '\n'.join(log_content))
+        zip_file.writestr(make_log_filename(RUN_MANIFEST_NAME, ".jsonl"), ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in run_records))
+        zip_file.writestr(make_log_filename("processing_log"), '\n'.join(format_run_record(record) for record in run_records))
+        
+        if metrics is not None:
+            finish_run_metrics(metrics)
+            zip_file.writestr(make_log_filename("run_metrics", ".json"), json.dumps(metrics, ensure_ascii=False, indent=2))
+    
+    return run_records
+
+def process_uploaded_files(uploaded_files, expected_range=None, stage_callback=None, should_stop=None, output_format=None, quality=DEFAULT_JPEG_QUALITY, large_group_rule=None, track_memory=False):
+    """
+    업로드된 파일들을 처리
+    결과 ZIP은 디스크의 임시 파일로 작성하며, 사용 후 호출한 쪽에서 삭제
+    stage_callback(단계, 완료 수, 전체 수)로 단계별 진행 상황 전달, should_stop()이 참이면 ZIP을 지우고 취소 오류 반환
+    output_format을 지정하면 BMP/TIFF 원본을 변환하여 ZIP에 저장
+    업로드한 ZIP/TAR 압축 파일은 풀지 않고 안의 이미지 항목을 바로 읽어 처리 (항목은 하위 폴더를 뺀 파일명 사용)
+    하위 폴더가 달라도 파일명이 같은 원본은 처음 것만 사용하고 나머지는 비정상 그룹 로그에 '이름 중복'으로 기록
+    large_group_rule을 지정하면 5개 이상 그룹도 그 규칙으로 ZIP에 저장
+    track_memory이면 ZIP 작성 중 최대 추가 메모리(tracemalloc)를 기록 (ZIP 작성이 느려지므로 기본값은 사용하지 않음)
+    """
+    zip_path = None
+    metrics = new_run_metrics("upload")
+    
+    def report(stage, done=0, total=None):
+        if stage_callback:
+            stage_callback(stage, done, total)
+    
+    # 업로드한 압축 파일은 ZIP 작성이 끝날 때까지 열어 둠
+    archives = ExitStack()
+    try:
+        # 업로드 버퍼를 임시 폴더에 저장하지 않고 파일명으로 바로 참조
+        sources = {}
+        # 파일명별 원본 위치 (업로드 파일명 또는 '압축 파일명:항목 경로'), 둘 이상이면 이름 중복
+        source_paths = defaultdict(list)
+        for uploaded_file in uploaded_files:
+            if is_image_file(uploaded_file.name):
+                entries = [(uploaded_file.name, uploaded_file.name, (uploaded_file, uploaded_file.size))]
+            elif is_archive(uploaded_file.name):
+                uploaded_file.seek(0)
+                archive, members = open_archive(uploaded_file, uploaded_file.name)
+                archives.callback(archive.close)
+                entries = [(os.path.basename(member_name), f"{uploaded_file.name}:{member_name}", source) for member_name, source in members.items()]
+            else:
+                continue
+            for filename, source_path, source in entries:
+                source_paths[filename].append(source_path)
+                sources.setdefault(filename, source)
+        name_conflicts = [f"이름 중복: {filename} - {' = '.join(paths)} (처음 것만 사용)" for filename, paths in source_paths.items() if len(paths) > 1]
+        
+        image_files = list(sources)
+        
+        if not image_files:
+            return None, None, "업로드된 이미지 파일이 없습니다."
+        
+        # 파일명 파싱
+        parsed_files = {}
+        failed_files = []
+        
+        report('parse', 0, len(image_files))
+        with measure_stage(metrics, 'parse') as stage:
+            for filename in image_files:
+                result = parse_filename(filename)
+                if result:
+                    parsed_files[filename] = result
+                else:
+                    failed_files.append(filename)
+            stage['files'] = len(image_files)
+        
+        if not parsed_files:
+            return None, None, "규칙에 맞는 파일명이 없습니다."
+        
+        # 그룹핑 및 분석
+        report('grouping', 0, len(parsed_files))
+        first_numbers = [first_num for first_num, _ in parsed_files.values()]
+        with measure_stage(metrics, 'missing') as stage:
+            missing_ranges = find_missing_ranges(first_numbers, expected_range)
+            _, outlier_numbers = split_outliers(first_numbers, expected_range)
+            stage['files'] = len(parsed_files)
+        with measure_stage(metrics, 'grouping') as stage:
+            groups = group_by_first_number(parsed_files)
+            group_analysis = analyze_groups(groups)
+            
+            # 비정상 그룹 로그 (업로드 원본의 이름 중복 포함)
+            abnormal_log = build_abnormal_log(groups, group_analysis) + name_conflicts
+            stage['files'] = len(parsed_files)
+        
+        log_files = []
+        if abnormal_log:
+            log_files.append((make_log_filename("abnormal_groups_log"), abnormal_log))
+        
+        # 이미지 처리 및 ZIP 파일 생성 (중간 복사본 없이 바로 기록)
+        fd, zip_path = tempfile.mkstemp(prefix="processed_", suffix=".zip")
+        os.close(fd)
+        run_records = write_zip_archive(
+            zip_path, sources, groups, log_files, metrics,
+            progress_callback=lambda done, total: report('zip', done, total),
+            should_stop=should_stop,
+            output_format=output_format,
+            quality=quality,
+            large_group_rule=large_group_rule,
+            track_memory=track_memory,
+        )
+        
+        folder_counts = count_target_folders(run_records)
+        return zip_path, {
+            'parsed_files': parsed_files,
+            'failed_files': failed_files,
+            'missing_ranges': missing_ranges,
+            'missing_count': count_missing(missing_ranges),
+            'outlier_numbers': outlier_numbers,
+            'group_analysis': group_analysis,
+            'abnormal_log': abnormal_log,
+            'name_conflicts': name_conflicts,
+            'run_records': run_records,
+            'deposition_count': folder_counts['Deposition'],
+            'scanning_count': folder_counts['Scanning'],
+            'unknown_count': folder_counts['Unknown'],
+            'metrics': metrics
+        }, None
+        
+    except Exception as e:
+        # 실패 시 작성 중이던 ZIP 정리
+        if zip_path:
+            try:
+                os.remove(zip_path)
+            except OSError:
+                pass
+        return None, None, str(e)
+    finally:
+        archives.close()
+
+def analyze_input_folders(input_folders, recursive=False, exclude_dirs=(), expected_range=None, use_numpy=False, metrics=None, progress_callback=None):
+    """
+    입력 폴더 탐색 -> 파일명 파싱 -> 그룹 분석 -> 누락 값 탐지까지 실행한 분석 결과 dict 반환 (파일은 저장하지 않음)
+    progress_callback(발견한 파일 수, 그룹 수)는 탐색 중 DISCOVERY_REPORT_INTERVAL개마다 호출
+    use_numpy이면 그룹을 배열로만 분석하고 'groups'는 None (필요할 때 analysis_groups로 변환)
+    """
+    if use_numpy and not NUMPY_AVAILABLE:
+        raise RuntimeError("배열 기반 그룹 분석에는 numpy가 필요합니다. (pip install numpy)")
+    
+    # 1~2. 이미지 파일 탐색과 동시에 파일명 파싱 (압축 파일은 풀지 않고 항목 이름만 읽음)
+    source_archive = archive_input(input_folders)
+    if source_archive:
+        archive, members = open_archive(source_archive)
+        archive.close()
+        image_files = iter(members)
+    else:
+        image_files = iter_input_files(input_folders, recursive=recursive, exclude_dirs=exclude_dirs)
+    failed_files = []
+    first_number_set = set()
+    file_count = 0
+    parse_timing = {'seconds': 0.0}
+    
+    def iter_parsed_success():
+        nonlocal file_count
+        for filename, result in iter_parsed_files(image_files, parse_timing):
+            file_count += 1
+            if result:
+                yield filename, result
+            else:
+                failed_files.append(filename)
+            
+            # 탐색이 끝나기 전에도 중간 결과 전달
+            if progress_callback:
+                if result:
+                    first_number_set.add(result[0])
+                if file_count % DISCOVERY_REPORT_INTERVAL == 0:
+                    progress_callback(file_count, len(first_number_set))
+    
+    discovery_start = time.perf_counter()
+    group_arrays = None
+    parsed_files = None
+    if use_numpy:
+        # 파일별 dict를 만들지 않고 배열로 바로 모음
+        group_arrays = build_group_arrays(iter_parsed_success())
+    else:
+        parsed_files = dict(iter_parsed_success())
+    
+    # 탐색과 파싱은 함께 진행되므로 파싱 시간을 빼서 탐색 시간으로 기록
+    if metrics is not None:
+        discovery_seconds = time.perf_counter() - discovery_start
+        add_stage_metrics(metrics, 'listing', discovery_seconds - parse_timing['seconds'], file_count)
+        add_stage_metrics(metrics, 'parse', parse_timing['seconds'], file_count)
+    
+    # 4. 그룹핑 및 분석
+    with measure_stage(metrics, 'grouping') as stage:
+        if use_numpy:
+            parsed_count = len(group_arrays['filenames'])
+            first_numbers = group_arrays['group_first_nums'].tolist()
+            group_analysis = analyze_group_arrays(group_arrays)
+            group_count = len(first_numbers)
+            # 5개 이상 그룹의 개수 표시에 필요한 그룹만 변환
+            abnormal_log = build_abnormal_log(group_arrays_to_groups(group_arrays, group_analysis['other']), group_analysis)
+            groups = None
+        else:
+            parsed_count = len(parsed_files)
+            first_numbers = [first_num for first_num, _ in parsed_files.values()]
+            groups = group_by_first_number(parsed_files)
+            group_analysis = analyze_groups(groups)
+            group_count = len(groups)
+            abnormal_log = build_abnormal_log(groups, group_analysis)
+        stage['files'] = parsed_count
+    
+    # 3. 누락된 값 찾기
+    with measure_stage(metrics, 'missing') as stage:
+        missing_ranges = find_missing_ranges(first_numbers, expected_range)
+        _, outlier_numbers = split_outliers(first_numbers, expected_range)
+        stage['files'] = parsed_count
+    
+    return {
+        'input_base': source_archive or get_input_base(input_folders),
+        'source_archive': source_archive,
+        'file_count': file_count,
+        'parsed_count': parsed_count,
+        'failed_files': failed_files,
+        'missing_ranges': missing_ranges,
+        'outlier_numbers': outlier_numbers,
+        'group_count': group_count,
+        'group_analysis': group_analysis,
+        'abnormal_log': abnormal_log,
+        'groups': groups,
+        'group_arrays': group_arrays,
+    }
+
+def analysis_groups(analysis):
+    """분석 결과의 {앞 숫자: 그룹 항목} (배열로 분석한 경우 처음 요청할 때 변환하여 보관)"""
+    if analysis['groups'] is None:
+        analysis['groups'] = group_arrays_to_groups(analysis['group_arrays'])
+    return analysis['groups']
+
+def get_cached_analysis(cache, key):
+    """캐시에서 분석 결과 찾기 (찾으면 가장 최근에 사용한 항목으로 이동), 없으면 None"""
+    analysis = cache.pop(key, None)
+    if analysis is not None:
+        cache[key] = analysis
+    return analysis
+
+def store_analysis(cache, key, analysis, max_entries=ANALYSIS_CACHE_ENTRIES, max_files=ANALYSIS_CACHE_MAX_FILES):
+    """
+    분석 결과를 캐시에 저장 (cache는 dict, 오래 사용하지 않은 항목이 앞쪽)
+    항목 수나 전체 파일 수가 한도를 넘으면 오래된 항목부터 삭제하여 메모리 사용량 제한
+    """
+    if analysis['file_count'] > max_files:
+        return
+    cache.pop(key, None)
+    cache[key] = analysis
+    while len(cache) > max_entries or sum(cached['file_count'] for cached in cache.values()) > max_files:
+        del cache[next(iter(cache))]
+
+def run_pipeline(input_folders, output_folder, recursive=False, max_workers=None, output_mode='copy', incremental=False, dry_run=False, progress_callback=None, expected_range=None, use_numpy=False, manifest_formats=(), analysis=None, stage_callback=None, should_stop=None, fingerprint=False, output_format=None, quality=DEFAULT_JPEG_QUALITY, transcode_processes=None, export_volume=False, large_group_rule=None, plan_path=None, shard=None, track_memory=False):
+    """
+    로컬 폴더 처리 전체 실행 후 결과 요약 dict 반환
+    dry_run이면 분석만 하고 출력 폴더에는 아무것도 쓰지 않음
+    expected_range=(처음, 마지막) 레이어 범위 밖 번호는 누락 계산에서 제외하고 이상값으로 표시
+    use_numpy이면 파일별 dict 대신 NumPy 배열로 그룹 분석 (결과는 같음, 파일 선택은 dict로 변환한 그룹에 같은 route_group 규칙 적용)
+    단계별 성능 기록은 summary['metrics']에 담고 출력 폴더에 run_metrics 파일로 저장
+    그룹별 처리 결과는 실행 매니페스트(JSON Lines)에 기록하고, manifest_formats의 'csv'/'parquet' 형식으로도 저장
+    analysis: 같은 조건으로 미리 실행한 analyze_input_folders 결과 (넘기면 탐색과 분석을 건너뜀)
+    stage_callback(단계, 완료 수, 전체 수)로 'analysis'/'copy'/'save_log' 단계별 진행 상황 전달
+    should_stop()이 참이면 그룹 묶음 사이에서 멈추고, 저장이 끝난 그룹까지만 매니페스트와 로그에 기록 (summary['cancelled'])
+    fingerprint이면 출력 폴더에 이미 같은 파일은 다시 쓰지 않고, 그룹 안 동일 파일(중복 촬영)을 비정상 그룹 로그에 추가
+    output_format(png/webp/jpeg)을 지정하면 BMP/TIFF 원본을 transcode_processes개 프로세스로 변환하여 저장 (JPEG은 quality 품질)
+    export_volume이면 처리 후 Deposition/Scanning을 레이어 순 메모리 맵 배열로 내보냄 (디코딩도 transcode_processes개 프로세스 사용)
+    입력이 ZIP/TAR 압축 파일이면 압축을 풀지 않고 항목을 바로 읽어 저장 (output_mode와 상관없이 'extract', incremental/fingerprint는 사용할 수 없음)
+    large_group_rule: 5개 이상 그룹 규칙 (LARGE_GROUP_RULES의 이름 또는 규칙 함수, None이면 처리하지 않음)
+    plan_path를 지정하면 분류 계획을 JSON Lines로 저장하며, dry_run이면 기존 출력 폴더와 비교한 결과를 summary['plan_diff']에 기록
+    shard=(번호, 개수)이면 shard_of로 이 샤드에 속한 그룹만 공유 출력 폴더에 저장하고, 로그와 실행 매니페스트는 shard_log_folder에 기록
+    (모든 샤드가 끝나면 merge_shards로 한 번에 실행한 것과 같은 로그를 만듦, 누락/그룹 분석 결과는 빌드 전체 기준)
+    track_memory이면 파일 저장 단계 중 최대 추가 메모리(tracemalloc)를 기록 (저장이 느려지므로 기본값은 사용하지 않고 프로세스 최대 메모리만 기록)
+    """
+    if 'parquet' in manifest_formats and not PYARROW_AVAILABLE:
+        raise RuntimeError("Parquet 내보내기에는 pyarrow가 필요합니다. (pip install pyarrow)")
+    if output_format and not PIL_AVAILABLE:
+        raise RuntimeError("출력 이미지 변환에는 Pillow가 필요합니다. (pip install pillow)")
+    if export_volume and not (NUMPY_AVAILABLE and PIL_AVAILABLE):
+        raise RuntimeError("볼륨 내보내기에는 numpy와 Pillow가 필요합니다. (pip install numpy pillow)")
+    
+    start_time = time.perf_counter()
+    metrics = new_run_metrics("local")
+    
+    def report(stage, done=0, total=None):
+        if stage_callback:
+            stage_callback(stage, done, total)
+    
+    if (incremental or fingerprint) and archive_input(input_folders):
+        raise ValueError("압축 파일 입력에는 증분 처리와 내용 지문을 사용할 수 없습니다.")
+    if shard is not None and (incremental or export_volume):
+        raise ValueError("샤드 처리에는 증분 처리와 볼륨 내보내기를 사용할 수 없습니다. (볼륨은 merge_shards 후 export_volumes로 내보냄)")
+    large_group_route = resolve_large_group_rule(large_group_rule)
+    
+    if analysis is None:
+        report('analysis')
+        exclude_dirs = [output_folder] if output_folder else []
+        analysis = analyze_input_folders(input_folders, recursive, exclude_dirs, expected_range, use_numpy, metrics, lambda file_count, _: report('analysis', file_count))
+    group_analysis = analysis['group_analysis']
+    abnormal_log = analysis['abnormal_log']
+    missing_ranges = analysis['missing_ranges']
+    
+    # 샤드 처리: 이 샤드의 그룹만 저장하고 비정상 그룹 로그도 이 샤드 그룹 기준 (merge_shards에서 합침)
+    shard_groups = None
+    log_folder = output_folder
+    if shard is not None:
+        shard_groups = filter_shard_groups(analysis_groups(analysis), shard)
+        abnormal_log = build_abnormal_log(shard_groups, analyze_groups(shard_groups))
+        if output_folder:
+            log_folder = shard_log_folder(output_folder, shard)
+    
+    # 5개 이상 그룹 규칙으로 저장하는 파일 수 (폴더별, 분석만 할 때의 예상 파일 수이며 처리하면 실제 저장한 항목 기준으로 바꿈)
+    large_group_counts = defaultdict(int)
+    if large_group_route is not None and group_analysis['other']:
+        if analysis['groups'] is not None:
+            large_groups = {first_num: analysis['groups'][first_num] for first_num in group_analysis['other']}
+        else:
+            large_groups = group_arrays_to_groups(analysis['group_arrays'], group_analysis['other'])
+        for record in iter_plan(large_groups, large_group_rule=large_group_route):
+            for route in record['routes']:
+                large_group_counts[route['folder']] += 1
+    
+    summary = {
+        'input_folders': list(input_folders),
+        'output_folder': output_folder,
+        'output_mode': output_mode,
+        'fingerprint': fingerprint,
+        'output_format': output_format,
+        'large_group_rule': large_group_rule if large_group_rule is None or isinstance(large_group_rule, str) else large_group_rule.__name__,
+        'dry_run': dry_run,
+        'file_count': analysis['file_count'],
+        'parsed_count': analysis['parsed_count'],
+        'failed_files': analysis['failed_files'],
+        'missing_ranges': missing_ranges,
+        'missing_count': count_missing(missing_ranges),
+        'outlier_numbers': analysis['outlier_numbers'],
+        'group_count': analysis['group_count'],
+        'group_sizes': {str(key): len(value) for key, value in group_analysis.items()},
+        'abnormal_log': abnormal_log,
+        'deposition_count': len(group_analysis[2]) + len(group_analysis[3]) + len(group_analysis[4]) + large_group_counts['Deposition'],
+        'scanning_count': len(group_analysis[2]) + len(group_analysis[3]) + len(group_analysis[4]) + large_group_counts['Scanning'],
+        'unknown_count': len(group_analysis[1]) + large_group_counts['Unknown'],
+        'skipped_groups': 0,
+        'unchanged_file_count': 0,
+        'duplicate_group_count': 0,
+        'transcoded_file_count': 0,
+        'transcode_bytes_saved': 0,
+        'abnormal_log_path': None,
+        'processing_log_path': None,
+        'run_manifest_path': None,
+        'run_manifest_exports': {},
+        'run_metrics_path': None,
+        'volume_index_path': None,
+        'run_record_count': 0,
+        'plan_path': None,
+        'plan_diff': None,
+        'shard': {'index': shard[0], 'count': shard[1], 'group_count': len(shard_groups)} if shard is not None else None,
+        'cancelled': False,
+    }
+    
+    # 분류 계획 (원본 파일을 읽지 않고 파일명만으로 계산)
+    if plan_path or (dry_run and output_folder):
+        with measure_stage(metrics, 'plan') as stage:
+            plan = build_plan(shard_groups if shard is not None else analysis_groups(analysis), output_format, large_group_route)
+            if plan_path:
+                summary['plan_path'] = save_plan(plan, plan_path)
+            if dry_run and output_folder:
+                summary['plan_diff'] = {key: len(files) for key, files in diff_plan(plan, output_folder).items()}
+            stage['files'] = analysis['parsed_count']
+    
+    if not dry_run:
+        os.makedirs(output_folder, exist_ok=True)
+        
+        # 5. 이미지 처리
+        input_base = analysis['input_base']
+        groups = shard_groups if shard is not None else analysis_groups(analysis)
+        
+        def copy_progress(done, total):
+            if progress_callback:
+                progress_callback(done, total)
+            report('copy', done, total)
+        
+        duplicate_log = []
+        folder_counts = count_target_folders(())
+        with measure_stage(metrics, 'copy', track_memory) as stage:
+            # 그룹별 처리 결과는 처리하는 대로 실행 매니페스트에 기록
+            manifest_writer = open_run_manifest(log_folder, manifest_formats)
+            try:
+                if analysis.get('source_archive'):
+                    run_records = iter_archive_records(analysis['source_archive'], output_folder, groups, copy_progress, stage, should_stop, output_format, quality, transcode_processes, large_group_route)
+                elif incremental:
+                    run_records, summary['skipped_groups'] = process_images_incremental(input_base, output_folder, groups, max_workers, copy_progress, output_mode, stage, should_stop, fingerprint, output_format, quality, transcode_processes, large_group_route)
+                else:
+                    run_records = iter_processed_records(input_base, output_folder, groups, max_workers, copy_progress, output_mode, stage, should_stop, fingerprint, output_format, quality, transcode_processes, large_group_route)
+                for run_record in run_records:
+                    write_run_record(manifest_writer, run_record)
+                    count_target_folders((run_record,), folder_counts)
+                    if run_record.get('duplicates'):
+                        duplicate_log.append(format_duplicate_log(run_record))
+            finally:
+                manifest_paths = close_run_manifest(manifest_writer)
+        # 폴더별 파일 수는 실제로 저장한 항목 기준 (취소한 경우 저장이 끝난 그룹까지)
+        summary['deposition_count'] = folder_counts['Deposition']
+        summary['scanning_count'] = folder_counts['Scanning']
+        summary['unknown_count'] = folder_counts['Unknown']
+        summary['cancelled'] = bool(should_stop and should_stop())
+        summary['unchanged_file_count'] = stage.get('unchanged') or 0
+        summary['duplicate_group_count'] = len(duplicate_log)
+        if fingerprint:
+            add_stage_metrics(metrics, 'fingerprint', stage.get('fingerprint_seconds', 0.0), stage.get('fingerprint_files', 0))
+        if output_format:
+            transcode_stage = add_transcode_metrics(metrics, stage)
+            summary['transcoded_file_count'] = transcode_stage['files']
+            summary['transcode_bytes_saved'] = transcode_stage['bytes_saved']
+        
+        # 비정상 그룹 로그 (중복 촬영은 처리 중 확인하므로 처리 후 저장)
+        abnormal_log = abnormal_log + duplicate_log
+        summary['abnormal_log'] = abnormal_log
+        if abnormal_log:
+            summary['abnormal_log_path'] = save_log(abnormal_log, log_folder, "abnormal_groups_log")
+        
+        # 6. 처리 로그 저장 (실행 매니페스트에서 생성)
+        report('save_log')
+        with measure_stage(metrics, 'save_log') as stage:
+            if 'parquet' in manifest_formats:
+                manifest_paths['parquet'] = export_run_manifest_parquet(manifest_paths['jsonl'])
+            summary['processing_log_path'] = write_processing_log(manifest_paths['jsonl'], log_folder, output_mode != 'copy' or fingerprint or bool(output_format))
+            stage['files'] = manifest_writer['count']
+        summary['run_record_count'] = manifest_writer['count']
+        summary['run_manifest_path'] = manifest_paths.pop('jsonl')
+        summary['run_manifest_exports'] = manifest_paths
+        
+        # 7. 볼륨 스택 내보내기 (취소한 경우 제외)
+        if export_volume and not summary['cancelled']:
+            report('volume')
+            with measure_stage(metrics, 'volume') as stage:
+                def volume_progress(done, total):
+                    stage['files'] = done
+                    report('volume', done, total)
+                
+                summary['volume_index_path'] = export_volumes(output_folder, expected_range, transcode_processes, progress_callback=volume_progress)
+    
+    summary['metrics'] = finish_run_metrics(metrics, time.perf_counter() - start_time)
+    summary['elapsed_seconds'] = round(metrics['total_seconds'], 3)
+    if not dry_run:
+        summary['run_metrics_path'] = save_run_metrics(metrics, log_folder)
+        if shard is not None:
+            save_shard_summary(summary, expected_range, log_folder)
+    return summary
+
+def save_shard_summary(summary, expected_range, log_folder):
+    """merge_shards가 읽는 샤드 실행 요약 저장 (같은 샤드를 다시 실행하면 마지막 실행으로 교체)"""
+    shard_summary = {
+        'shard': summary['shard'],
+        'input_folders': summary['input_folders'],
+        'expected_range': list(expected_range) if expected_range else None,
+        'show_modes': summary['output_mode'] != 'copy' or summary['fingerprint'] or bool(summary['output_format']),
+        'file_count': summary['file_count'],
+        'failed_files': summary['failed_files'],
+        'run_manifest': os.path.basename(summary['run_manifest_path']),
+        'run_record_count': summary['run_record_count'],
+        'duplicate_group_count': summary['duplicate_group_count'],
+        'elapsed_seconds': summary['elapsed_seconds'],
+        'cancelled': summary['cancelled'],
+        'completed_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    summary_path = os.path.join(log_folder, SHARD_SUMMARY_FILENAME)
+    temp_path = summary_path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(shard_summary, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, summary_path)
+    return summary_path
+
+def load_shard_summaries(output_folder):
+    """출력 폴더의 샤드 실행 요약 목록 (샤드 번호 순)"""
+    shards_path = os.path.join(output_folder, SHARD_FOLDER)
+    summaries = []
+    if os.path.isdir(shards_path):
+        with os.scandir(shards_path) as entries:
+            for entry in entries:
+                summary_path = os.path.join(entry.path, SHARD_SUMMARY_FILENAME)
+                if entry.is_dir() and os.path.exists(summary_path):
+                    with open(summary_path, 'r', encoding='utf-8') as f:
+                        shard_summary = json.load(f)
+                    shard_summary['log_folder'] = entry.path
+                    summaries.append(shard_summary)
+    return sorted(summaries, key=lambda shard_summary: (shard_summary['shard']['count'], shard_summary['shard']['index']))
+
+def merge_shards(output_folder, expected_range=None):
+    """
+    모든 샤드 실행이 끝난 출력 폴더에서 샤드별 실행 매니페스트를 합쳐 한 번에 실행한 것과 같은 로그 작성 후 요약 dict 반환
+    실행 매니페스트, 처리 로그, 비정상 그룹 로그(중복 촬영 포함)를 출력 폴더에 저장하고 누락/이상값/그룹 개수는 전체 그룹 기준으로 다시 계산
+    expected_range를 지정하지 않으면 샤드 실행에 사용한 예상 레이어 범위 사용
+    빠진 샤드나 취소된 샤드가 있으면 ValueError
+    """
+    start_time = time.perf_counter()
+    metrics = new_run_metrics("shard_merge")
+    
+    shard_summaries = load_shard_summaries(output_folder)
+    if not shard_summaries:
+        raise ValueError(f"샤드 실행 결과가 없습니다: {os.path.join(output_folder, SHARD_FOLDER)}")
+    # 샤드 개수를 바꿔 다시 실행한 경우 가장 최근 실행의 샤드 개수 기준
+    shard_count = max(shard_summaries, key=lambda shard_summary: shard_summary['completed_at'])['shard']['count']
+    shard_summaries = [shard_summary for shard_summary in shard_summaries if shard_summary['shard']['count'] == shard_count]
+    missing_shards = sorted(set(range(shard_count)) - {shard_summary['shard']['index'] for shard_summary in shard_summaries})
+    if missing_shards:
+        raise ValueError(f"{shard_count}개 중 끝나지 않은 샤드가 있습니다: {', '.join(map(str, missing_shards))}")
+    cancelled_shards = [shard_summary['shard']['index'] for shard_summary in shard_summaries if shard_summary['cancelled']]
+    if cancelled_shards:
+        raise ValueError(f"취소된 샤드가 있습니다: {', '.join(map(str, cancelled_shards))}")
+    if expected_range is None and shard_summaries[0]['expected_range']:
+        expected_range = tuple(shard_summaries[0]['expected_range'])
+    
+    # 그룹 개수 분석은 항목의 개수만 필요하므로 전체 그룹 항목은 메모리에 올리지 않음
+    group_analysis = {1: [], 2: [], 3: [], 4: [], 'other': []}
+    large_group_sizes = {}
+    duplicate_log = []
+    folder_counts = count_target_folders(())
+    with measure_stage(metrics, 'merge') as stage:
+        manifest_writer = open_run_manifest(output_folder)
+        try:
+            # 샤드별 실행 매니페스트는 레이어 순이므로 k-way 병합하면 한 번에 실행한 것과 같은 레이어 순
+            shard_records = [iter_run_records(os.path.join(shard_summary['log_folder'], shard_summary['run_manifest'])) for shard_summary in shard_summaries]
+            for record in heapq.merge(*shard_records, key=lambda record: record['first_num']):
+                write_run_record(manifest_writer, record)
+                count_target_folders((record,), folder_counts)
+                count = record['group_size']
+                if count in group_analysis:
+                    group_analysis[count].append(record['first_num'])
+                else:
+                    group_analysis['other'].append(record['first_num'])
+                    large_group_sizes[record['first_num']] = count
+                if record.get('duplicates'):
+                    duplicate_log.append(format_duplicate_log(record))
+        finally:
+            manifest_path = close_run_manifest(manifest_writer)['jsonl']
+        stage['files'] = manifest_writer['count']
+    
+    with measure_stage(metrics, 'missing') as stage:
+        first_numbers = [first_num for first_nums in group_analysis.values() for first_num in first_nums]
+        missing_ranges = find_missing_ranges(first_numbers, expected_range)
+        _, outlier_numbers = split_outliers(first_numbers, expected_range)
+        stage['files'] = len(first_numbers)
+    
+    with measure_stage(metrics, 'save_log') as stage:
+        abnormal_log = build_abnormal_log(None, group_analysis, large_group_sizes) + duplicate_log
+        abnormal_log_path = save_log(abnormal_log, output_folder, "abnormal_groups_log") if abnormal_log else None
+        processing_log_path = write_processing_log(manifest_path, output_folder, any(shard_summary['show_modes'] for shard_summary in shard_summaries))
+        stage['files'] = manifest_writer['count']
+    
+    # 모든 샤드가 같은 입력을 탐색하므로 규칙에 맞지 않는 파일은 중복 없이 합침
+    failed_files = list(dict.fromkeys(filename for shard_summary in shard_summaries for filename in shard_summary['failed_files']))
+    metrics['shards'] = [{'index': shard_summary['shard']['index'], 'elapsed_seconds': shard_summary['elapsed_seconds'], 'run_record_count': shard_summary['run_record_count']} for shard_summary in shard_summaries]
+    finish_run_metrics(metrics, time.perf_counter() - start_time)
+    
+    return {
+        'output_folder': output_folder,
+        'shard_count': shard_count,
+        'input_folders': shard_summaries[0]['input_folders'],
+        'file_count': shard_summaries[0]['file_count'],
+        'failed_files': failed_files,
+        'missing_ranges': missing_ranges,
+        'missing_count': count_missing(missing_ranges),
+        'outlier_numbers': outlier_numbers,
+        'group_count': len(first_numbers),
+        'group_sizes': {str(key): len(value) for key, value in group_analysis.items()},
+        'abnormal_log': abnormal_log,
+        'duplicate_group_count': len(duplicate_log),
+        'deposition_count': folder_counts['Deposition'],
+        'scanning_count': folder_counts['Scanning'],
+        'unknown_count': folder_counts['Unknown'],
+        'abnormal_log_path': abnormal_log_path,
+        'processing_log_path': processing_log_path,
+        'run_manifest_path': manifest_path,
+        'run_record_count': manifest_writer['count'],
+        'run_metrics_path': save_run_metrics(metrics, output_folder),
+        'metrics': metrics,
+    }
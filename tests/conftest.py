@@ -0,0 +1,5 @@
+"""테스트 공통 설정: 저장소 최상위 모듈(pipeline 등)을 가져올 수 있도록 경로 추가"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
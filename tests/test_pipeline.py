@@ -0,0 +1,811 @@
+"""
+pipeline과 cli/batch/catalog/jobs/thumbnails 모듈의 회귀 테스트
+작은 합성 빌드(레이어별 1~5개 촬영, 누락 레이어 포함)를 실제로 처리하여 결과 파일과 로그를 확인
+"""
+import csv
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+import zipfile
+
+import pytest
+
+import batch
+import benchmark
+import cli
+import jobs
+from catalog import open_catalog, query_groups, query_runs, record_run
+from pipeline import (
+    LARGE_GROUP_RULES, analysis_groups, analyze_input_folders, build_plan, diff_plan, find_missing_ranges,
+    folder_state_key, format_ranges, get_cached_analysis, group_by_first_number, iter_image_files, iter_run_records,
+    load_volume, merge_shards, parse_filename, parse_layer_range, plan_group, process_images, process_uploaded_files,
+    run_pipeline, split_outliers, store_analysis, watch_and_process,
+)
+from thumbnails import THUMBNAIL_SIZE, abnormal_groups, get_thumbnails, prune_thumbnail_cache, review_entries
+
+# 레이어별 촬영 수 (1~4개 그룹과 처리 규칙이 없는 5개 그룹을 섞음), 17번 레이어는 누락
+GROUP_SIZES = [2, 1, 3, 4, 2, 5, 2]
+LAYER_COUNT = 60
+MISSING_LAYER = 17
+
+def shot_filename(first_num, second_num):
+    return f"{first_num}-Layer Shot_{second_num}-trigger_count.jpg"
+
+def make_build(folder):
+    """테스트용 빌드 폴더 생성 후 파일명 목록 반환 (파일마다 내용이 다름)"""
+    os.makedirs(folder, exist_ok=True)
+    filenames = []
+    for first_num in range(1, LAYER_COUNT + 1):
+        if first_num == MISSING_LAYER:
+            continue
+        for index in range(GROUP_SIZES[first_num % len(GROUP_SIZES)]):
+            # 뒤 숫자 자릿수가 달라도 숫자 순으로 정렬되는지 확인하도록 9, 10, 11... 사용
+            filename = shot_filename(first_num, first_num * 10 + 9 + index)
+            with open(os.path.join(folder, filename), 'wb') as f:
+                f.write(f"{filename}\n".encode('utf-8') * (first_num + index))
+            filenames.append(filename)
+    return filenames
+
+def baseline_process_images(input_folder, output_folder, groups):
+    """처음 구현(app.py의 순차 shutil.copy2)과 같은 규칙으로 복사하고 처리 로그 반환"""
+    for folder in ("Deposition", "Scanning", "Unknown"):
+        os.makedirs(os.path.join(output_folder, folder), exist_ok=True)
+    
+    processing_log = []
+    for first_num, items in groups.items():
+        count = len(items)
+        new_filename = f"{first_num}{os.path.splitext(items[0][1])[1]}"
+        names = [item[1] for item in items]
+        
+        if count == 1:
+            shutil.copy2(os.path.join(input_folder, names[0]), os.path.join(output_folder, "Unknown", new_filename))
+            processing_log.append(f"[1개] {first_num}: {names[0]} -> Unknown/{new_filename}")
+            continue
+        if count > 4:
+            processing_log.append(f"[{count}개] {first_num}: 처리 규칙 없음 - {', '.join(names)}")
+            continue
+        
+        # 뒤에서 두 번째 -> Deposition, 마지막 -> Scanning
+        deposition, scanning = names[-2], names[-1]
+        shutil.copy2(os.path.join(input_folder, deposition), os.path.join(output_folder, "Deposition", new_filename))
+        shutil.copy2(os.path.join(input_folder, scanning), os.path.join(output_folder, "Scanning", new_filename))
+        line = f"[{count}개] {first_num}: {deposition} -> Deposition/{new_filename}, {scanning} -> Scanning/{new_filename}"
+        if count > 2:
+            line += f" (미사용: {', '.join(names[:-2])})"
+        processing_log.append(line)
+    return processing_log
+
+def read_tree(folder, subfolders=("Deposition", "Scanning", "Unknown")):
+    """출력 폴더별 {상대 경로: 내용}"""
+    tree = {}
+    for subfolder in subfolders:
+        for name in os.listdir(os.path.join(folder, subfolder)):
+            with open(os.path.join(folder, subfolder, name), 'rb') as f:
+                tree[f"{subfolder}/{name}"] = f.read()
+    return tree
+
+class UploadedFile(io.BytesIO):
+    """Streamlit 업로드 파일과 같은 형태 (이름과 크기가 있는 메모리 버퍼)"""
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+def upload_folder(folder):
+    """폴더의 파일을 업로드 파일 목록으로 변환"""
+    uploads = []
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name), 'rb') as f:
+            uploads.append(UploadedFile(name, f.read()))
+    return uploads
+
+def read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+@pytest.fixture
+def build_folder(tmp_path):
+    folder = str(tmp_path / "build")
+    make_build(folder)
+    return folder
+
+@pytest.mark.parametrize("max_workers", [1, 8])
+def test_process_images_matches_baseline(tmp_path, build_folder, max_workers):
+    groups = group_by_first_number({filename: parse_filename(filename) for filename in os.listdir(build_folder)})
+    
+    expected_log = baseline_process_images(build_folder, str(tmp_path / "baseline"), groups)
+    progress = []
+    processing_log = process_images(build_folder, str(tmp_path / "out"), groups, max_workers=max_workers, progress_callback=lambda done, total: progress.append((done, total)))
+    
+    assert processing_log == expected_log
+    baseline_tree = read_tree(str(tmp_path / "baseline"))
+    assert read_tree(str(tmp_path / "out")) == baseline_tree
+    # 진행률은 저장한 파일 수까지 늘어남
+    assert progress[-1] == (len(baseline_tree), len(baseline_tree))
+    assert [done for done, _ in progress] == sorted(done for done, _ in progress)
+
+@pytest.mark.parametrize("output_mode", ["hardlink", "symlink", "reflink"])
+def test_link_output_modes(tmp_path, build_folder, output_mode):
+    output_folder = str(tmp_path / "out")
+    summary = run_pipeline([build_folder], output_folder, output_mode=output_mode)
+    records = [json.loads(line) for line in read_text(summary['run_manifest_path']).splitlines()]
+    targets = [target for record in records for target in record['targets']]
+    assert targets
+    
+    for target in targets:
+        src = os.path.join(build_folder, target['source'])
+        dst = os.path.join(output_folder, target['destination'])
+        if output_mode == 'hardlink':
+            assert target['mode'] == 'hardlink' and os.path.samefile(src, dst)
+        elif output_mode == 'symlink':
+            assert target['mode'] == 'symlink' and os.readlink(dst) == os.path.abspath(src)
+        else:
+            # CoW 복제를 지원하지 않는 파일시스템은 복사로 대체하며, 어느 쪽이든 원본과 다른 파일
+            assert target['mode'] in ('reflink', 'copy') and not os.path.islink(dst) and not os.path.samefile(src, dst)
+            with open(src, 'rb') as fsrc, open(dst, 'rb') as fdst:
+                assert fsrc.read() == fdst.read()
+
+@pytest.mark.parametrize("link_mode", ["hardlink", "symlink"])
+def test_copy_over_link_output_keeps_source(tmp_path, build_folder, link_mode):
+    output_folder = str(tmp_path / "out")
+    run_pipeline([build_folder], output_folder, output_mode=link_mode)
+    old_scanning = os.path.join(build_folder, shot_filename(7, 80))
+    with open(old_scanning, 'rb') as f:
+        old_content = f.read()
+    
+    # 7번 레이어에 촬영을 추가하면 Scanning/7.jpg는 새 파일 -> 이전 링크를 통해 이전 원본에 덮어쓰면 안 됨
+    with open(os.path.join(build_folder, shot_filename(7, 81)), 'wb') as f:
+        f.write(b"new scanning shot")
+    run_pipeline([build_folder], output_folder, output_mode='copy')
+    
+    with open(old_scanning, 'rb') as f:
+        assert f.read() == old_content
+    scanning = os.path.join(output_folder, "Scanning", "7.jpg")
+    assert not os.path.islink(scanning)
+    with open(scanning, 'rb') as f:
+        assert f.read() == b"new scanning shot"
+
+def test_upload_zip_stores_compressed_formats(tmp_path):
+    uploads = [
+        UploadedFile(shot_filename(1, 10), b"jpeg 1" * 100),
+        UploadedFile(shot_filename(1, 11), b"jpeg 2" * 100),
+        UploadedFile(shot_filename(2, 20).replace(".jpg", ".bmp"), b"\0" * 5000),
+        UploadedFile(shot_filename(2, 21).replace(".jpg", ".bmp"), b"\1" * 5000),
+        UploadedFile(shot_filename(3, 30).replace(".jpg", ".png"), b"png" * 100),
+    ]
+    zip_path, results, error = process_uploaded_files(uploads)
+    assert error is None
+    try:
+        # 결과 ZIP은 메모리가 아니라 디스크의 임시 파일
+        assert os.path.isfile(zip_path)
+        with zipfile.ZipFile(zip_path) as zip_file:
+            infos = {info.filename: info for info in zip_file.infolist()}
+            images = {name: info.compress_type for name, info in infos.items() if name.split("/")[0] in ("Deposition", "Scanning", "Unknown")}
+            assert images == {
+                "Deposition/1.jpg": zipfile.ZIP_STORED,
+                "Scanning/1.jpg": zipfile.ZIP_STORED,
+                "Deposition/2.bmp": zipfile.ZIP_DEFLATED,
+                "Scanning/2.bmp": zipfile.ZIP_DEFLATED,
+                "Unknown/3.png": zipfile.ZIP_STORED,
+            }
+            assert zip_file.read("Scanning/2.bmp") == b"\1" * 5000
+            assert zip_file.read("Unknown/3.png") == b"png" * 100
+            logs = [info for name, info in infos.items() if name not in images]
+            assert logs and all(info.compress_type == zipfile.ZIP_DEFLATED for info in logs)
+            assert any(name.startswith("processing_log") for name in infos)
+    finally:
+        os.remove(zip_path)
+
+def test_discovery_recursive_and_multiple_folders(tmp_path, build_folder):
+    single = run_pipeline([build_folder], str(tmp_path / "single_out"))
+    
+    # 같은 빌드를 두 카메라 폴더(하나는 하위 폴더 안)로 나눔
+    root = tmp_path / "dump"
+    cam_a = root / "cam_a"
+    cam_b = root / "cam_b"
+    (cam_b / "nested").mkdir(parents=True)
+    cam_a.mkdir()
+    for name in os.listdir(build_folder):
+        target = cam_a if parse_filename(name)[0] % 2 == 0 else cam_b / "nested"
+        shutil.copy2(os.path.join(build_folder, name), str(target / name))
+    (cam_a / "notes.txt").write_text("not an image")
+    os.symlink(build_folder, str(root / "linked"), target_is_directory=True)
+    
+    assert list(iter_image_files(str(cam_b))) == []
+    nested = sorted(iter_image_files(str(cam_b), recursive=True))
+    assert nested and all(path.startswith("nested" + os.sep) for path in nested)
+    # 심볼릭 링크 폴더와 제외 폴더는 탐색하지 않음
+    found = sorted(iter_image_files(str(root), recursive=True, exclude_dirs=[str(cam_a)]))
+    assert found == sorted(os.path.join("cam_b", path) for path in nested)
+    
+    combined = run_pipeline([str(cam_a), str(cam_b)], str(tmp_path / "combined_out"), recursive=True)
+    assert combined['file_count'] == single['file_count']
+    assert read_tree(str(tmp_path / "combined_out")) == read_tree(str(tmp_path / "single_out"))
+    
+    # 입력 폴더 안의 출력 폴더는 다음 실행에서 입력으로 다시 읽지 않음
+    inner_output = str(root / "out")
+    first = run_pipeline([str(root)], inner_output, recursive=True)
+    second = run_pipeline([str(root)], inner_output, recursive=True)
+    assert first['file_count'] == second['file_count'] == single['file_count']
+
+def test_incremental_reprocesses_changed_groups(tmp_path, build_folder):
+    output_folder = str(tmp_path / "out")
+    first = run_pipeline([build_folder], output_folder, incremental=True)
+    assert first['skipped_groups'] == 0
+    assert first['run_record_count'] == first['group_count']
+    
+    # 2개 그룹(7번 레이어)의 Scanning 원본 내용 변경, 1개 그룹(8번 레이어)에 촬영 추가 -> 2개 그룹으로 바뀌어 Unknown 대신 Deposition/Scanning
+    changed = os.path.join(build_folder, shot_filename(7, 80))
+    with open(changed, 'wb') as f:
+        f.write(b"rescanned")
+    stat = os.stat(changed)
+    os.utime(changed, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    with open(os.path.join(build_folder, shot_filename(8, 99)), 'wb') as f:
+        f.write(b"extra shot")
+    
+    second = run_pipeline([build_folder], output_folder, incremental=True)
+    assert second['skipped_groups'] == second['group_count'] - 2
+    assert second['run_record_count'] == second['group_count']
+    
+    tree = read_tree(output_folder)
+    assert tree["Scanning/7.jpg"] == b"rescanned"
+    assert tree["Scanning/8.jpg"] == b"extra shot"
+    assert "Unknown/8.jpg" not in tree
+    
+    # 증분 처리 결과는 처음부터 다시 처리한 결과와 같음
+    full = run_pipeline([build_folder], str(tmp_path / "full"))
+    assert tree == read_tree(str(tmp_path / "full"))
+    assert read_text(second['processing_log_path']) == read_text(full['processing_log_path'])
+
+def test_watch_matches_batch_run(tmp_path, build_folder):
+    batch = run_pipeline([build_folder], str(tmp_path / "batch_out"))
+    
+    # 프린터처럼 레이어 순서대로 파일을 조금씩 기록
+    live_folder = tmp_path / "live"
+    live_folder.mkdir()
+    layers = group_by_first_number({name: parse_filename(name) for name in os.listdir(build_folder)})
+    
+    def write_layers():
+        for first_num in sorted(layers):
+            for _, filename in layers[first_num]:
+                shutil.copy2(os.path.join(build_folder, filename), str(live_folder / filename))
+            time.sleep(0.02)
+    
+    writer = threading.Thread(target=write_layers)
+    writer.start()
+    try:
+        states = list(watch_and_process(str(live_folder), str(tmp_path / "watch_out"), poll_interval=0.02, settle_time=0.1, idle_timeout=0.5))
+    finally:
+        writer.join()
+    
+    # 쓰는 중에도 완료된 그룹을 처리하고, 끝나면 모든 그룹을 처리
+    assert any(state['routed_count'] and not state['finished'] for state in states)
+    final = states[-1]
+    assert final['finished'] and final['waiting_count'] == 0
+    assert final['file_count'] == batch['file_count']
+    assert final['routed_count'] == batch['group_count']
+    assert read_tree(str(tmp_path / "watch_out")) == read_tree(str(tmp_path / "batch_out"))
+    assert read_text(final['abnormal_log_path']).count("\n") == final['abnormal_count']
+
+def test_cli_runs_without_streamlit(tmp_path, build_folder):
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    
+    # 명령줄 실행은 Streamlit을 가져오지 않고 결과 요약 JSON을 표준 출력에 기록
+    result = subprocess.run(
+        [sys.executable, os.path.join(repo_root, "cli.py"), build_folder, "-o", str(tmp_path / "out"), "--no-catalog"],
+        capture_output=True, text=True, check=True,
+    )
+    summary = json.loads(result.stdout)
+    assert summary['file_count'] == len(os.listdir(build_folder))
+    run_pipeline([build_folder], str(tmp_path / "library_out"))
+    assert read_tree(str(tmp_path / "out")) == read_tree(str(tmp_path / "library_out"))
+    
+    check = "import sys, cli, batch, catalog, pipeline; print('streamlit' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", check], cwd=repo_root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+def test_batch_matches_single_runs(tmp_path, build_folder):
+    # 상위 폴더 안의 빌드 폴더 2개와 같은 이름의 ZIP 빌드 1개
+    builds_root = tmp_path / "builds"
+    shutil.copytree(build_folder, str(builds_root / "build_a"))
+    make_build(str(builds_root / "build_b"))
+    os.remove(str(builds_root / "build_b" / shot_filename(30, 309)))
+    with zipfile.ZipFile(str(builds_root / "build_a.zip"), 'w') as zip_file:
+        for name in os.listdir(build_folder):
+            zip_file.write(os.path.join(build_folder, name), name)
+    
+    build_folders = batch.find_build_folders([str(builds_root)])
+    assert [os.path.basename(path) for path in build_folders] == ["build_a", "build_a.zip", "build_b"]
+    
+    catalog_path = str(tmp_path / "catalog.sqlite3")
+    output_root = str(tmp_path / "batch_out")
+    results, summary = batch.run_batch(build_folders, output_root, processes=2, catalog_path=catalog_path)
+    assert [os.path.basename(result['output_folder']) for result in results] == ["build_a", "build_a_2", "build_b"]
+    assert summary['succeeded_count'] == 3 and summary['failed_count'] == 0
+    assert summary['file_count'] == sum(result['summary']['file_count'] for result in results)
+    assert summary['builds_with_missing'][2]['missing_ranges'] == "17"
+    
+    # 빌드별 결과는 빌드를 하나씩 처리한 결과와 같음
+    for result in results:
+        single_output = str(tmp_path / "single" / os.path.basename(result['output_folder']))
+        single = run_pipeline([result['build_folder']], single_output)
+        assert result['summary']['group_sizes'] == single['group_sizes']
+        assert read_tree(result['output_folder']) == read_tree(single_output)
+    
+    connection = open_catalog(catalog_path)
+    try:
+        assert sorted(run['build'] for run in query_runs(connection)) == ["build_a", "build_a_2", "build_b"]
+    finally:
+        connection.close()
+
+def test_missing_ranges_and_outliers(tmp_path, build_folder):
+    # 잘못 기록된 매우 큰 번호도 번호 하나씩 펼치지 않고 구간으로 계산
+    assert find_missing_ranges([1, 2, 5, 10 ** 12]) == [(3, 4), (6, 10 ** 12 - 1)]
+    assert find_missing_ranges([3, 5, 10 ** 12], expected_range=(1, 8)) == [(1, 2), (4, 4), (6, 8)]
+    assert find_missing_ranges([4, 5], expected_range=(None, 7)) == [(1, 3), (6, 7)]
+    assert split_outliers([0, 3, 10 ** 12], (1, 100)) == ({3}, [0, 10 ** 12])
+    assert format_ranges([(3, 4), (6, 6), (9, 12)]) == "3-4, 6, 9-12"
+    assert format_ranges([(3, 4), (6, 6), (9, 12)], limit=2) == "3-4, 6 ... 외 1개 구간"
+    assert parse_layer_range("1-5000") == (1, 5000)
+    assert parse_layer_range("-5000") == (None, 5000)
+    with pytest.raises(ValueError):
+        parse_layer_range("5000-1")
+    
+    with open(os.path.join(build_folder, shot_filename(10 ** 12, 1)), 'wb') as f:
+        f.write(b"typo")
+    summary = run_pipeline([build_folder], None, dry_run=True, expected_range=(1, LAYER_COUNT + 2))
+    assert summary['missing_ranges'] == [(MISSING_LAYER, MISSING_LAYER), (LAYER_COUNT + 1, LAYER_COUNT + 2)]
+    assert summary['missing_count'] == 3
+    assert summary['outlier_numbers'] == [10 ** 12]
+
+def test_numpy_analysis_matches_dict(tmp_path, build_folder):
+    pytest.importorskip("numpy")
+    with open(os.path.join(build_folder, "broken_name.jpg"), 'wb') as f:
+        f.write(b"unparsed")
+    
+    by_dict = analyze_input_folders([build_folder], expected_range=(1, LAYER_COUNT + 2))
+    by_numpy = analyze_input_folders([build_folder], expected_range=(1, LAYER_COUNT + 2), use_numpy=True)
+    assert by_numpy['groups'] is None
+    for key in ('file_count', 'parsed_count', 'failed_files', 'missing_ranges', 'outlier_numbers', 'group_count', 'group_analysis', 'abnormal_log'):
+        assert by_numpy[key] == by_dict[key], key
+    assert analysis_groups(by_numpy) == by_dict['groups']
+    
+    dict_summary = run_pipeline([build_folder], str(tmp_path / "dict_out"))
+    numpy_summary = run_pipeline([build_folder], str(tmp_path / "numpy_out"), use_numpy=True)
+    assert read_tree(str(tmp_path / "numpy_out")) == read_tree(str(tmp_path / "dict_out"))
+    assert read_text(numpy_summary['processing_log_path']) == read_text(dict_summary['processing_log_path'])
+    assert read_text(numpy_summary['abnormal_log_path']) == read_text(dict_summary['abnormal_log_path'])
+
+def test_benchmark_generator_and_stages(tmp_path):
+    # 같은 시드는 같은 빌드를 만들고, 생성 통계는 분석 결과와 맞음
+    first = benchmark.generate_build(str(tmp_path / "first"), file_count=500, missing_rate=0.05, malformed_rate=0.02, file_size=64, seed=3)
+    second = benchmark.generate_build(str(tmp_path / "second"), file_count=500, missing_rate=0.05, malformed_rate=0.02, file_size=64, seed=3)
+    assert first == second
+    assert sorted(os.listdir(str(tmp_path / "first"))) == sorted(os.listdir(str(tmp_path / "second")))
+    analysis = analyze_input_folders([str(tmp_path / "first")])
+    assert analysis['file_count'] == first['file_count'] == 500
+    assert len(analysis['failed_files']) == first['malformed_files'] > 0
+    
+    stats = benchmark.generate_build(str(tmp_path / "clean"), file_count=500, missing_rate=0.05, malformed_rate=0, file_size=64, seed=3)
+    analysis = analyze_input_folders([str(tmp_path / "clean")])
+    assert sum(end - start + 1 for start, end in analysis['missing_ranges']) == stats['missing_layers'] > 0
+    assert analysis['group_count'] == stats['layer_count']
+    
+    stages = benchmark.run_benchmark(str(tmp_path / "clean"), str(tmp_path / "work"), max_workers=2, include_numpy=False)
+    assert {'get_image_files', 'parse_filename', 'group_by_first_number', 'process_images', 'upload_zip'} <= set(stages)
+    assert stages['get_image_files']['items'] == 500
+    assert stages['process_images']['bytes'] == stages['process_images']['items'] * 64
+    
+    comparison = benchmark.compare_results({'stages': stages}, {'stages': stages, 'environment': {'git_commit': "abc123"}})
+    assert comparison['baseline_commit'] == "abc123"
+    assert all(stage['speedup'] == 1.0 for stage in comparison['stages'].values())
+
+def test_run_metrics_stages(tmp_path, build_folder):
+    output_folder = str(tmp_path / "out")
+    summary = run_pipeline([build_folder], output_folder, track_memory=True)
+    metrics = summary['metrics']
+    assert list(metrics['stages']) == ['listing', 'parse', 'grouping', 'missing', 'copy', 'save_log']
+    
+    # 저장 단계의 파일 수/바이트는 실제로 저장한 파일과 같고, 요청한 경우에만 최대 메모리 기록
+    tree = read_tree(output_folder)
+    copy_stage = metrics['stages']['copy']
+    assert copy_stage['files'] == len(tree)
+    assert copy_stage['bytes'] == sum(len(data) for data in tree.values())
+    assert copy_stage['peak_memory_bytes'] > 0
+    assert metrics['stages']['listing']['files'] == summary['file_count']
+    assert metrics['total_seconds'] >= sum(stage['seconds'] for stage in metrics['stages'].values()) - 0.001
+    
+    with open(summary['run_metrics_path'], 'r', encoding='utf-8') as f:
+        assert json.load(f) == metrics
+    
+    untracked = run_pipeline([build_folder], str(tmp_path / "untracked"))
+    assert 'peak_memory_bytes' not in untracked['metrics']['stages']['copy']
+    assert run_pipeline([build_folder], None, dry_run=True)['run_metrics_path'] is None
+
+def test_run_manifest_records_and_csv(tmp_path, build_folder):
+    summary = run_pipeline([build_folder], str(tmp_path / "out"), manifest_formats=['csv'])
+    records = list(iter_run_records(summary['run_manifest_path']))
+    assert len(records) == summary['run_record_count'] == summary['group_count']
+    assert [record['first_num'] for record in records] == sorted(record['first_num'] for record in records)
+    
+    # 처리 로그는 매니페스트 항목마다 한 줄
+    assert len(read_text(summary['processing_log_path']).splitlines()) == len(records)
+    assert list(iter_run_records(summary['run_manifest_path'], offset=5, limit=3)) == records[5:8]
+    assert list(iter_run_records(summary['run_manifest_path'], offset=len(records) - 2)) == records[-2:]
+    
+    # 8번 레이어(1개 그룹)는 Unknown, 7번 레이어(2개 그룹)는 Deposition/Scanning
+    by_layer = {record['first_num']: record for record in records}
+    assert [target['folder'] for target in by_layer[8]['targets']] == ["Unknown"]
+    assert [target['source'] for target in by_layer[7]['targets']] == [shot_filename(7, 79), shot_filename(7, 80)]
+    
+    with open(summary['run_manifest_exports']['csv'], 'r', encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == len(records)
+    row = next(row for row in rows if row['first_num'] == "7")
+    assert row['deposition_source'] == shot_filename(7, 79)
+    assert row['scanning_destination'] == "Scanning/7.jpg"
+    assert row['unknown_source'] == ""
+
+def test_analysis_cache_key_and_eviction(tmp_path, build_folder):
+    key = folder_state_key([build_folder], recursive=True)
+    assert folder_state_key([build_folder], recursive=True) == key
+    
+    # 파일 추가와 하위 폴더의 파일 추가는 키를 바꿈 (하위 폴더는 recursive일 때만)
+    with open(os.path.join(build_folder, shot_filename(LAYER_COUNT + 1, 1)), 'wb') as f:
+        f.write(b"new layer")
+    added_key = folder_state_key([build_folder], recursive=True)
+    assert added_key != key
+    os.makedirs(os.path.join(build_folder, "nested"))
+    with open(os.path.join(build_folder, "nested", shot_filename(LAYER_COUNT + 2, 1)), 'wb') as f:
+        f.write(b"nested layer")
+    nested_key = folder_state_key([build_folder], recursive=True)
+    assert nested_key != added_key
+    assert folder_state_key([build_folder]) == folder_state_key([build_folder])
+    
+    # 캐시한 분석 결과로 실행해도 결과는 같음
+    cache = {}
+    store_analysis(cache, nested_key, analyze_input_folders([build_folder]))
+    cached = get_cached_analysis(cache, nested_key)
+    assert cached is not None and get_cached_analysis(cache, key) is None
+    run_pipeline([build_folder], str(tmp_path / "cached_out"), analysis=cached)
+    run_pipeline([build_folder], str(tmp_path / "fresh_out"))
+    assert read_tree(str(tmp_path / "cached_out")) == read_tree(str(tmp_path / "fresh_out"))
+    
+    # 항목 수와 전체 파일 수 한도를 넘으면 가장 오래 사용하지 않은 항목부터 삭제
+    cache = {}
+    for name in ("a", "b", "c"):
+        store_analysis(cache, name, {'file_count': 10}, max_entries=2, max_files=25)
+    assert list(cache) == ["b", "c"]
+    get_cached_analysis(cache, "b")
+    store_analysis(cache, "d", {'file_count': 10}, max_entries=2, max_files=25)
+    assert list(cache) == ["b", "d"]
+    store_analysis(cache, "e", {'file_count': 20}, max_entries=2, max_files=25)
+    assert list(cache) == ["e"]
+    store_analysis(cache, "huge", {'file_count': 30}, max_entries=2, max_files=25)
+    assert list(cache) == ["e"]
+
+def wait_job(job, timeout=30):
+    """백그라운드 작업이 끝날 때까지 기다린 뒤 작업 dict 반환"""
+    deadline = time.monotonic() + timeout
+    while job['status'] == 'running' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+def test_jobs_owner_scoping_and_cancel(tmp_path, build_folder):
+    catalog_path = str(tmp_path / "catalog.sqlite3")
+    job = jobs.start_job('local', "build", jobs.run_local_job, [build_folder], str(tmp_path / "out"), owner="session-a", catalog_path=catalog_path)
+    wait_job(job)
+    assert job['status'] == 'done' and job['error'] is None
+    assert job['result']['file_count'] == len(os.listdir(build_folder))
+    
+    # 다른 세션에서는 조회하거나 정리할 수 없음
+    assert jobs.get_job(job['id'], owner="session-a") is job
+    assert jobs.get_job(job['id'], owner="session-b") is None
+    assert job in jobs.find_jobs('local', owner="session-a")
+    assert job not in jobs.find_jobs('local', owner="session-b")
+    assert not jobs.discard_job(job['id'], owner="session-b")
+    
+    connection = open_catalog(catalog_path)
+    try:
+        assert len(query_runs(connection)) == 1
+    finally:
+        connection.close()
+    
+    # 취소 요청은 실행 중인 작업에만 전달되고, 끝난 작업의 임시 파일은 정리할 때 삭제
+    temp_path = tmp_path / "result.zip"
+    temp_path.write_bytes(b"zip")
+    
+    def wait_for_cancel(running_job):
+        running_job['temp_files'].append(str(temp_path))
+        running_job['cancel_event'].wait(10)
+    
+    running = jobs.start_job('upload', "upload", wait_for_cancel, owner="session-a")
+    assert running in jobs.find_jobs(running_only=True, owner="session-a")
+    assert not jobs.discard_job(running['id'], owner="session-a")
+    assert jobs.cancel_job(running['id'])
+    assert wait_job(running)['status'] == 'cancelled'
+    assert not jobs.cancel_job(running['id'])
+    assert jobs.discard_job(running['id'], owner="session-a")
+    assert not temp_path.exists()
+    assert jobs.get_job(running['id']) is None
+    
+    def fail(failing_job):
+        raise ValueError("broken build")
+    
+    failed = wait_job(jobs.start_job('local', "broken", fail, owner="session-a"))
+    assert failed['status'] == 'failed' and failed['error'] == "ValueError: broken build"
+    for finished in (job, failed):
+        assert jobs.discard_job(finished['id'], owner="session-a")
+
+def test_fingerprint_skips_unchanged_and_reports_duplicates(tmp_path, build_folder):
+    # 9번 레이어(3개 그룹)의 앞 두 촬영을 같은 내용으로 만듦
+    shutil.copyfile(os.path.join(build_folder, shot_filename(9, 99)), os.path.join(build_folder, shot_filename(9, 100)))
+    output_folder = str(tmp_path / "out")
+    first = run_pipeline([build_folder], output_folder, fingerprint=True)
+    assert first['unchanged_file_count'] == 0
+    assert first['duplicate_group_count'] == 1
+    assert f"중복 촬영 3개: 9 - {shot_filename(9, 99)} = {shot_filename(9, 100)}" in read_text(first['abnormal_log_path'])
+    assert "동일 파일" in read_text(first['processing_log_path'])
+    
+    # 다시 실행하면 이미 같은 파일은 쓰지 않고, 바뀐 원본만 다시 씀
+    written = read_tree(output_folder)
+    deposition_path = os.path.join(output_folder, "Deposition", "7.jpg")
+    stat = os.stat(deposition_path)
+    second = run_pipeline([build_folder], output_folder, fingerprint=True)
+    assert second['unchanged_file_count'] == len(written)
+    assert os.stat(deposition_path).st_mtime_ns == stat.st_mtime_ns
+    
+    with open(os.path.join(build_folder, shot_filename(7, 80)), 'wb') as f:
+        f.write(b"rescanned")
+    third = run_pipeline([build_folder], output_folder, fingerprint=True)
+    assert third['unchanged_file_count'] == len(written) - 1
+    assert read_tree(output_folder)["Scanning/7.jpg"] == b"rescanned"
+
+def test_thumbnail_cache_and_review_entries(tmp_path, build_folder):
+    Image = pytest.importorskip("PIL.Image")
+    image_folder = tmp_path / "images"
+    image_folder.mkdir()
+    paths = []
+    for index in range(3):
+        path = str(image_folder / f"{index}.jpg")
+        Image.new('RGB', (800, 600), (index * 80, 0, 0)).save(path, 'JPEG')
+        paths.append(path)
+    broken_path = str(image_folder / "broken.jpg")
+    with open(broken_path, 'wb') as f:
+        f.write(b"not a jpeg")
+    
+    cache_dir = str(tmp_path / "cache")
+    thumbnails = get_thumbnails(paths + [broken_path], cache_dir, processes=2)
+    assert thumbnails[broken_path] is None
+    for path in paths:
+        with Image.open(thumbnails[path]) as thumbnail:
+            assert max(thumbnail.size) == THUMBNAIL_SIZE
+    
+    # 캐시에 있는 썸네일은 다시 만들지 않고, 원본이 바뀌면 새 썸네일을 만듦
+    inodes = {path: os.stat(thumbnails[path]).st_ino for path in paths}
+    assert get_thumbnails(paths, cache_dir, processes=2) == {path: thumbnails[path] for path in paths}
+    assert all(os.stat(thumbnails[path]).st_ino == inodes[path] for path in paths)
+    Image.new('RGB', (800, 600), (0, 255, 0)).save(paths[0], 'JPEG')
+    assert get_thumbnails(paths[:1], cache_dir)[paths[0]] != thumbnails[paths[0]]
+    
+    # 캐시 크기 한도를 넘으면 가장 오래 쓰지 않은 썸네일부터 삭제
+    lru_cache_dir = str(tmp_path / "lru_cache")
+    cached = get_thumbnails(paths, lru_cache_dir, max_cache_bytes=None)
+    os.utime(cached[paths[1]], ns=(0, 0))
+    cache_size = sum(os.path.getsize(path) for path in cached.values())
+    assert prune_thumbnail_cache(lru_cache_dir, cache_size) == 0
+    assert prune_thumbnail_cache(lru_cache_dir, cache_size - 1) == 1
+    assert not os.path.exists(cached[paths[1]])
+    
+    groups = analysis_groups(analyze_input_folders([build_folder]))
+    abnormal = abnormal_groups(groups)
+    assert [first_num for first_num, _ in abnormal] == sorted(first_num for first_num, items in groups.items() if len(items) != 2)
+    assert review_entries(8, groups[8]) == [(89, shot_filename(8, 89), "Unknown", plan_group(8, groups[8])['routes'][0]['reason'])]
+    # 5개 그룹은 규칙에 따라 모두 미사용이거나 가장 높은 두 숫자만 저장
+    assert all(folder is None for _, _, folder, _ in review_entries(12, groups[12]))
+    assert [folder for _, _, folder, _ in review_entries(12, groups[12], "highest_pair")] == [None, None, None, "Deposition", "Scanning"]
+
+def test_transcode_mixed_extension_group(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    build = tmp_path / "build"
+    build.mkdir()
+    # 5번 레이어: JPG -> Deposition, BMP -> Scanning / 6번 레이어: BMP -> Deposition, JPG -> Scanning
+    for first_num, extensions in ((5, (".jpg", ".bmp")), (6, (".bmp", ".jpg"))):
+        for index, ext in enumerate(extensions):
+            path = build / shot_filename(first_num, first_num * 10 + index).replace(".jpg", ext)
+            if ext == ".bmp":
+                Image.new('RGB', (8, 8), (first_num, index, 0)).save(str(path), 'BMP')
+            else:
+                path.write_bytes(b"jpeg bytes %d" % first_num)
+    
+    items = [(50, "5-Layer Shot_50-trigger_count.jpg"), (51, "5-Layer Shot_51-trigger_count.bmp")]
+    routes = plan_group(5, items, output_format='png')['routes']
+    assert [(route['folder'], route['new_filename'], route['transcode']) for route in routes] == [
+        ("Deposition", "5.jpg", False),
+        ("Scanning", "5.png", True),
+    ]
+    
+    output_folder = str(tmp_path / "out")
+    summary = run_pipeline([str(build)], output_folder, output_format='png', transcode_processes=1)
+    tree = read_tree(output_folder)
+    assert sorted(tree) == ["Deposition/5.jpg", "Deposition/6.png", "Scanning/5.png", "Scanning/6.jpg"]
+    # 이미 압축된 JPG는 그대로, BMP만 PNG로 변환
+    assert tree["Deposition/5.jpg"] == b"jpeg bytes 5"
+    assert tree["Scanning/6.jpg"] == b"jpeg bytes 6"
+    for name in ("Scanning/5.png", "Deposition/6.png"):
+        with Image.open(os.path.join(output_folder, name)) as image:
+            assert image.format == 'PNG'
+    assert summary['transcoded_file_count'] == 2
+
+def test_export_volume_layers_and_mask(tmp_path):
+    np = pytest.importorskip("numpy")
+    Image = pytest.importorskip("PIL.Image")
+    
+    # 레이어 3은 누락, 레이어 5는 1개 그룹(Unknown)이라 볼륨에 없음
+    build = tmp_path / "build"
+    build.mkdir()
+    for first_num in (1, 2, 4, 5, 6):
+        shots = [first_num * 10 + 1] if first_num == 5 else [first_num * 10, first_num * 10 + 1]
+        for second_num in shots:
+            Image.new('L', (4, 3), second_num).save(str(build / f"{first_num}-Layer Shot_{second_num}-trigger_count.png"))
+    
+    output_folder = str(tmp_path / "out")
+    summary = run_pipeline([str(build)], output_folder, export_volume=True, expected_range=(1, 7), transcode_processes=2)
+    assert summary['volume_index_path'] == os.path.join(output_folder, "volume_index.json")
+    
+    stack, mask, first_layer = load_volume(output_folder, 'Deposition')
+    assert first_layer == 1
+    assert stack.shape == (7, 3, 4) and stack.dtype == np.uint8
+    assert mask.tolist() == [True, True, False, True, False, True, False]
+    assert [int(stack[layer - 1, 0, 0]) for layer in (1, 2, 4, 6)] == [10, 20, 40, 60]
+    assert not stack[2].any() and not stack[6].any()
+    
+    scanning, scanning_mask, _ = load_volume(output_folder, 'Scanning')
+    assert scanning_mask.tolist() == mask.tolist()
+    assert int(scanning[3, 0, 0]) == 41
+
+@pytest.mark.parametrize("archive_name, tar_mode", [("build.zip", None), ("build.tar", 'w'), ("build.tar.gz", 'w:gz'), ("build.tar.xz", 'w:xz')])
+def test_archive_input_matches_folder(tmp_path, build_folder, archive_name, tar_mode):
+    folder_summary = run_pipeline([build_folder], str(tmp_path / "folder_out"))
+    
+    # 압축 파일 안에서는 하위 폴더에 두고, 항목 순서는 파일명 역순 (그룹 순서와 다르게)
+    archive_path = str(tmp_path / archive_name)
+    names = sorted(os.listdir(build_folder), reverse=True)
+    if tar_mode is None:
+        with zipfile.ZipFile(archive_path, 'w') as zip_file:
+            for name in names:
+                zip_file.write(os.path.join(build_folder, name), f"dump/{name}")
+    else:
+        with tarfile.open(archive_path, tar_mode) as tar_file:
+            for name in names:
+                tar_file.add(os.path.join(build_folder, name), f"dump/{name}")
+    
+    archive_summary = run_pipeline([archive_path], str(tmp_path / "archive_out"))
+    assert read_tree(str(tmp_path / "archive_out")) == read_tree(str(tmp_path / "folder_out"))
+    assert archive_summary['abnormal_log'] == folder_summary['abnormal_log']
+    assert archive_summary['missing_ranges'] == folder_summary['missing_ranges']
+    assert archive_summary['unknown_count'] == folder_summary['unknown_count']
+    
+    # 압축 파일 항목은 'extract' 방식으로 기록
+    records = [json.loads(line) for line in read_text(archive_summary['run_manifest_path']).splitlines()]
+    assert [record['first_num'] for record in records] == sorted(record['first_num'] for record in records)
+    assert {target['mode'] for record in records for target in record['targets']} == {'extract'}
+    
+    # 업로드 모드도 압축 파일 안의 이미지를 같은 위치에 저장
+    with open(archive_path, 'rb') as f:
+        zip_path, results, error = process_uploaded_files([UploadedFile(archive_name, f.read())])
+    assert error is None and results['name_conflicts'] == []
+    try:
+        with zipfile.ZipFile(zip_path) as zip_file:
+            uploaded_tree = {name: zip_file.read(name) for name in zip_file.namelist() if name.split("/")[0] in ("Deposition", "Scanning", "Unknown")}
+        assert uploaded_tree == read_tree(str(tmp_path / "folder_out"))
+    finally:
+        os.remove(zip_path)
+
+def test_plan_large_group_rule_matches_outputs(tmp_path, build_folder):
+    groups = analysis_groups(analyze_input_folders([build_folder]))
+    large_first_nums = [first_num for first_num, items in groups.items() if len(items) >= 5]
+    assert large_first_nums
+    assert 'highest_pair' in LARGE_GROUP_RULES
+    
+    # 규칙이 없으면 5개 이상 그룹은 모두 미사용, highest_pair는 가장 높은 두 숫자를 3/4개 그룹처럼 저장
+    assert all(record['status'] == 'no_rule' and not record['routes'] for record in build_plan(groups) if record['first_num'] in large_first_nums)
+    plan = build_plan(groups, large_group_rule='highest_pair')
+    for record in plan:
+        if record['first_num'] in large_first_nums:
+            items = groups[record['first_num']]
+            assert [(route['source'], route['folder']) for route in record['routes']] == [(items[-2][1], "Deposition"), (items[-1][1], "Scanning")]
+            assert [entry['source'] for entry in record['unused']] == [filename for _, filename in items[:-2]]
+    planned = sorted(f"{route['folder']}/{route['new_filename']}" for record in plan for route in record['routes'])
+    
+    # 분석만 하면 출력 폴더에 쓰지 않고 모두 새로 만들 파일
+    output_folder = str(tmp_path / "out")
+    dry = run_pipeline([build_folder], output_folder, dry_run=True, large_group_rule='highest_pair')
+    assert not os.path.exists(output_folder)
+    assert dry['plan_diff'] == {'new': len(planned), 'existing': 0, 'stale': 0}
+    
+    summary = run_pipeline([build_folder], output_folder, large_group_rule='highest_pair')
+    assert sorted(read_tree(output_folder)) == planned
+    diff = diff_plan(plan, output_folder)
+    assert sorted(diff['existing']) == planned and diff['new'] == [] and diff['stale'] == []
+    
+    # 폴더별 파일 수는 실제 저장한 파일 기준 (5개 이상 그룹 포함), 업로드 모드도 같음
+    counts = {folder: sum(name.startswith(folder + "/") for name in planned) for folder in ("Deposition", "Scanning", "Unknown")}
+    assert (summary['deposition_count'], summary['scanning_count'], summary['unknown_count']) == (counts["Deposition"], counts["Scanning"], counts["Unknown"])
+    zip_path, results, error = process_uploaded_files(upload_folder(build_folder), large_group_rule='highest_pair')
+    assert error is None
+    try:
+        assert (results['deposition_count'], results['scanning_count'], results['unknown_count']) == (counts["Deposition"], counts["Scanning"], counts["Unknown"])
+        with zipfile.ZipFile(zip_path) as zip_file:
+            assert sorted(name for name in zip_file.namelist() if name.split("/")[0] in counts) == planned
+    finally:
+        os.remove(zip_path)
+
+def test_merge_shards_matches_single_run(tmp_path, build_folder):
+    single = run_pipeline([build_folder], str(tmp_path / "single"), fingerprint=True)
+    
+    # 샤드를 끝내는 순서와 상관없이 합친 결과는 같아야 함
+    sharded_folder = str(tmp_path / "sharded")
+    for index in (2, 0, 1):
+        run_pipeline([build_folder], sharded_folder, fingerprint=True, shard=(index, 3))
+    merged = merge_shards(sharded_folder)
+    
+    assert read_text(merged['run_manifest_path']) == read_text(single['run_manifest_path'])
+    assert read_text(merged['processing_log_path']) == read_text(single['processing_log_path'])
+    assert merged['abnormal_log'] == single['abnormal_log']
+    assert merged['missing_ranges'] == single['missing_ranges']
+    assert merged['group_sizes'] == single['group_sizes']
+    assert (merged['deposition_count'], merged['scanning_count'], merged['unknown_count']) == (single['deposition_count'], single['scanning_count'], single['unknown_count'])
+    assert read_tree(sharded_folder) == read_tree(str(tmp_path / "single"))
+
+def test_catalog_ratio_filter(tmp_path, build_folder):
+    catalog_path = str(tmp_path / "catalog.sqlite3")
+    # 모든 그룹이 2개인 빌드
+    even_folder = tmp_path / "even"
+    even_folder.mkdir()
+    for first_num in range(1, 11):
+        for second_num in (1, 2):
+            (even_folder / shot_filename(first_num, second_num)).write_bytes(b"x")
+    
+    mixed = run_pipeline([build_folder], str(tmp_path / "mixed_out"))
+    even = run_pipeline([str(even_folder)], str(tmp_path / "even_out"))
+    mixed_id = record_run(mixed, catalog_path)
+    even_id = record_run(even, catalog_path)
+    assert mixed_id is not None and even_id is not None
+    
+    connection = open_catalog(catalog_path)
+    try:
+        ratio_3 = 100.0 * mixed['group_sizes']['3'] / mixed['group_count']
+        runs = query_runs(connection, group_size=3, min_ratio=1)
+        assert [run['id'] for run in runs] == [mixed_id]
+        assert runs[0]['ratio'] == pytest.approx(ratio_3, abs=0.001)
+        assert query_runs(connection, group_size=3, min_ratio=ratio_3 + 1) == []
+        # 비정상 그룹은 개수가 2개가 아닌 그룹
+        assert runs[0]['abnormal_count'] == mixed['group_count'] - mixed['group_sizes']['2']
+        assert {run['id']: run['abnormal_count'] for run in query_runs(connection)}[even_id] == 0
+        
+        large_groups = query_groups(connection, 5, build="build")
+        assert sorted(group['first_num'] for group in large_groups) == sorted(
+            first_num for first_num in range(1, LAYER_COUNT + 1) if first_num != MISSING_LAYER and GROUP_SIZES[first_num % len(GROUP_SIZES)] == 5
+        )
+        assert all(len(group['sources'].split(';')) == 5 for group in large_groups)
+    finally:
+        connection.close()
+
+def test_cli_records_catalog_by_default(tmp_path, build_folder):
+    catalog_path = str(tmp_path / "catalog.sqlite3")
+    assert cli.main([build_folder, "-o", str(tmp_path / "out"), "--catalog", catalog_path]) == 0
+    assert cli.main([build_folder, "-o", str(tmp_path / "out2"), "--catalog", catalog_path, "--no-catalog"]) == 0
+    
+    connection = open_catalog(catalog_path)
+    try:
+        assert len(query_runs(connection)) == 1
+    finally:
+        connection.close()
+    assert cli.build_parser().parse_args([build_folder, "-o", "out"]).catalog == cli.DEFAULT_CATALOG_PATH
@@ -0,0 +1,158 @@
+"""
+비정상 그룹 검토용 썸네일 생성과 디스크 캐시
+썸네일은 프로세스 풀에서 축소 디코딩(JPEG draft 모드)으로 만들고, 원본 경로+수정 시각을 키로 캐시에 저장하여 다시 열 때는 디코딩하지 않음
+캐시는 THUMBNAIL_CACHE_MAX_BYTES를 넘으면 가장 오래 쓰지 않은 썸네일부터 지움 (LRU, 사용할 때마다 수정 시각을 갱신)
+"""
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from pipeline import plan_group
+
+# 썸네일 생성에만 사용 (선택)
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# 썸네일 긴 변 길이 (픽셀)
+THUMBNAIL_SIZE = 256
+
+# 썸네일 캐시 폴더 기본값
+THUMBNAIL_CACHE_DIR = os.path.join(tempfile.gettempdir(), "image_sorter_thumbnails")
+
+# 썸네일 캐시 최대 크기 (바이트, 256px 썸네일 약 1만 장)
+THUMBNAIL_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# 썸네일 생성 프로세스 수 기본값 (디코딩은 CPU 위주)
+DEFAULT_THUMBNAIL_PROCESSES = os.cpu_count() or 1
+
+def thumbnail_cache_path(path, cache_dir=THUMBNAIL_CACHE_DIR, size=THUMBNAIL_SIZE):
+    """원본 경로, 크기, 수정 시각과 썸네일 크기로 만든 캐시 파일 경로 (원본이 바뀌면 경로도 바뀜)"""
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{size}"
+    name = hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+    # 한 폴더에 파일이 너무 많아지지 않도록 앞 두 글자로 나눔
+    return os.path.join(cache_dir, name[:2], name + ".jpg")
+
+def make_thumbnail(path, cache_path, size=THUMBNAIL_SIZE):
+    """
+    원본을 축소 디코딩하여 썸네일을 cache_path에 저장 (프로세스 풀 작업 단위)
+    JPEG은 draft 모드로 필요한 해상도까지만 디코딩하며, 임시 파일에 쓴 뒤 교체
+    """
+    with Image.open(path) as image:
+        image.draft('RGB', (size, size))
+        image.thumbnail((size, size), reducing_gap=2.0)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        image.save(temp_path, 'JPEG', quality=85)
+    os.replace(temp_path, cache_path)
+    return cache_path
+
+def prune_thumbnail_cache(cache_dir=THUMBNAIL_CACHE_DIR, max_bytes=THUMBNAIL_CACHE_MAX_BYTES):
+    """
+    캐시 전체 크기가 max_bytes 이하가 되도록 수정 시각(마지막 사용 시각)이 오래된 썸네일부터 삭제하고 삭제한 파일 수 반환
+    다른 프로세스가 이미 지운 파일은 건너뜀
+    """
+    entries = []
+    total = 0
+    try:
+        subdirs = [entry.path for entry in os.scandir(cache_dir) if entry.is_dir()]
+    except FileNotFoundError:
+        return 0
+    for subdir in subdirs:
+        try:
+            with os.scandir(subdir) as it:
+                for entry in it:
+                    if not entry.name.endswith(".jpg"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    total += stat.st_size
+        except OSError:
+            continue
+    
+    if total <= max_bytes:
+        return 0
+    
+    removed = 0
+    for _, file_size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= file_size
+        removed += 1
+    return removed
+
+def get_thumbnails(paths, cache_dir=THUMBNAIL_CACHE_DIR, size=THUMBNAIL_SIZE, processes=DEFAULT_THUMBNAIL_PROCESSES, max_cache_bytes=THUMBNAIL_CACHE_MAX_BYTES):
+    """
+    원본 경로별 썸네일 경로 {원본 경로: 썸네일 경로 또는 None} 반환
+    캐시에 없는 썸네일만 프로세스 풀로 생성하며, 열 수 없는 이미지는 None
+    캐시에 있는 썸네일은 수정 시각을 갱신하고, 새로 만든 뒤에는 캐시를 max_cache_bytes 이하로 정리 (None이면 정리하지 않음)
+    """
+    if not PIL_AVAILABLE:
+        raise RuntimeError("썸네일 생성에는 Pillow가 필요합니다. (pip install pillow)")
+    
+    thumbnails = {}
+    missing = {}
+    for path in paths:
+        try:
+            cache_path = thumbnail_cache_path(path, cache_dir, size)
+        except OSError:
+            thumbnails[path] = None
+            continue
+        # 사용한 썸네일은 수정 시각을 갱신하여 캐시 정리 때 나중에 지워지도록 함 (atime은 기록하지 않는 파일시스템이 많음)
+        try:
+            os.utime(cache_path)
+        except FileNotFoundError:
+            missing[path] = cache_path
+            continue
+        except OSError:
+            pass
+        thumbnails[path] = cache_path
+    
+    if not missing:
+        return thumbnails
+    
+    if processes <= 1 or len(missing) == 1:
+        for path, cache_path in missing.items():
+            try:
+                thumbnails[path] = make_thumbnail(path, cache_path, size)
+            except Exception:
+                thumbnails[path] = None
+    else:
+        with ProcessPoolExecutor(max_workers=min(processes, len(missing))) as executor:
+            futures = {executor.submit(make_thumbnail, path, cache_path, size): path for path, cache_path in missing.items()}
+            for future, path in futures.items():
+                try:
+                    thumbnails[path] = future.result()
+                except Exception:
+                    thumbnails[path] = None
+    
+    if max_cache_bytes is not None:
+        prune_thumbnail_cache(cache_dir, max_cache_bytes)
+    return thumbnails
+
+def abnormal_groups(groups):
+    """개수가 2개가 아닌 그룹을 앞 숫자 순으로 [(앞 숫자, 그룹 항목)] 반환"""
+    return sorted(((first_num, items) for first_num, items in groups.items() if len(items) != 2), key=lambda group: group[0])
+
+def review_entries(first_num, items, large_group_rule=None):
+    """
+    검토 화면의 그룹 파일별 (뒤 숫자, 파일명, 분류 결과, 사유) 목록 (분류 계획 plan_group 기준)
+    분류 결과는 'Deposition'/'Scanning'/'Unknown' 또는 사용하지 않는 파일은 None
+    """
+    plan = plan_group(first_num, items, large_group_rule=large_group_rule)
+    folders = {route['source']: (route['folder'], route['reason']) for route in plan['routes']}
+    folders.update((entry['source'], (None, entry['reason'])) for entry in plan['unused'])
+    return [(second_num, filename) + folders[filename] for second_num, filename in items]